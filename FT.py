@@ -1,19 +1,4416 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
+from tkinter import font as tkfont
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+from collections import Counter, OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+import argparse
+import base64
+import copy
+import csv
+import getpass
+import hashlib
+import heapq
+import hmac
 import json
+import math
+import lzma
+import mmap
+import operator
 import os
+import re
+import struct
+import sys
+import threading
+import time
+import traceback
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: run without advisory locking
+    fcntl = None
+
+RULE_CATEGORIES = ["Growth", "Stability", "Essentials", "Rewards"]
+UNDO_LIMIT = 200
+
+# Money is stored as integer minor units (cents) of the account's currency;
+# ledger reports (totals, allocation, chart, exports, API) are in major units
+CURRENCY_DECIMALS = {'LKR': 2, 'USD': 2}
+
+# Ledger data layout, versioned separately from the binary container below.
+# Files are upgraded by running every step newer than their 'schema' in
+# order; files saved before versioning count as version 0.
+DATA_MIGRATIONS = [
+    (1, 'migrate_transaction_ids'),
+    (2, 'migrate_settings'),
+    (3, 'migrate_account_ids'),
+    (4, 'migrate_money'),
+    (5, 'migrate_budget_counters'),
+]
+DATA_SCHEMA_VERSION = DATA_MIGRATIONS[-1][0]
+ACCOUNT_CATEGORIES = ['Cash & Bank', 'Crypto & Investments', 'Upcoming']
+
+# Top-level containers and their types; the required ones are created when
+# missing, optional settings stay absent until first set
+DATA_LAYOUT = {
+    'categories': dict, 'transactions': list, 'accounts': dict, 'budgets': dict,
+    'budget_counters': dict, 'archive': dict, 'rule_percentages': dict,
+    'reconciliations': dict, 'holdings': dict, 'goals': dict, 'rejected_transactions': list
+}
+DATA_REQUIRED = ['categories', 'transactions', 'accounts', 'budgets', 'archive']
+
+# Field types every transaction is coerced to on load; missing text fields
+# get a default. A row with a missing id, date, account or amount or a value
+# that can't be converted is set aside in data['rejected_transactions'],
+# saved unchanged for the integrity check to report and repair
+TRANSACTION_FIELDS = {'id': int, 'date': str, 'account_id': str, 'description': str,
+                      'amount': int, 'rule_category': str}
+TRANSACTION_DEFAULTS = {'description': '', 'rule_category': '-'}
+
+LEDGER_MAGIC = b'FTPL'
+LEDGER_FORMAT_VERSION = 1
+LEDGER_SCHEMA_VERSION = 2  # 2: integer columns packed as int64
+LEDGER_HEADER = '<4sHHI'
+LEDGER_FLAG_ENCRYPTED = 1
+LEDGER_BLOCK_ROWS = 4096
+LEDGER_KDF_ITERATIONS = 200000
+
+# Months (including the current one) kept in the main ledger file; older
+# transactions live in per-month archive partitions loaded on demand.
+ARCHIVE_HOT_MONTHS = 2
+
+# Incremental backups: content-addressed, compressed chunks under
+# <ledger>.backups/. Transactions are chunked by month and id range, so a
+# snapshot only writes the blocks that changed since the last one.
+BACKUP_INTERVAL = 600  # seconds between automatic snapshots
+BACKUP_BLOCK_IDS = 4096
+# Retention: the newest snapshot of each of the last N minutes, hours, days
+# and months (automatic snapshots are BACKUP_INTERVAL apart)
+BACKUP_RETENTION = [('%Y-%m-%d %H:%M', 6), ('%Y-%m-%d %H', 24), ('%Y-%m-%d', 30), ('%Y-%m', 12)]
+
+# Number of profile ledgers kept open at once; older ones are unloaded
+PROFILE_CACHE_SIZE = 3
+
+# How often the GUI stats the ledger file for changes made by another instance
+LEDGER_POLL_MS = 2000
+# How often the GUI picks up events and work handed to it from other threads
+EVENT_PUMP_MS = 50
+
+# Exports hand control back to the Tk mainloop after this much work (seconds)
+EXPORT_SLICE = 0.02
+EXPORT_CHUNK_ROWS = 500
+
+# Local JSON API (off unless started from Settings or with --api)
+API_PORT = 8765
+API_WORKERS = 4
+API_CACHE_SIZE = 64
+API_PAGE_LIMIT = 1000
+
+# Auto-categorization: keyword/regex rules tried before the naive Bayes
+# model, as [pattern, rule category]; editable from Settings
+DEFAULT_CATEGORY_RULES = [
+    [r'grocer|supermarket|rent|electricity|water bill|utilit|fuel|petrol|bus|train|pharmacy|medical|insurance',
+     'Essentials'],
+    [r'restaurant|cafe|movie|cinema|netflix|spotify|game|travel|hotel|gift|party', 'Rewards'],
+    [r'invest|stock|shares|crypto|bitcoin|dividend|\bcse\b|\bcal\b|unit trust', 'Growth'],
+    [r'saving|emergency|fixed deposit|\bfd\b', 'Stability']
+]
+CATEGORY_CACHE_SIZE = 100000
+
+# Duplicate/anomaly flags: same account, amount and description within
+# DUPLICATE_WINDOW_DAYS, or an amount ANOMALY_SIGMAS standard deviations
+# from the account's mean once it has ANOMALY_MIN_SAMPLES transactions
+DUPLICATE_WINDOW_DAYS = 3
+ANOMALY_MIN_SAMPLES = 10
+ANOMALY_SIGMAS = 3.0
+
+# Dashboard account rows switch from widgets to a single drawn Canvas
+# above this many accounts (unless a renderer is chosen in Settings)
+DASHBOARD_CANVAS_ACCOUNTS = 40
+
+# Transaction list columns: Treeview column -> (heading, ledger sort column)
+TRACKER_COLUMNS = {
+    'Date': ('DATE', 'date'),
+    'Account': ('ACCOUNT', 'account'),
+    'Description': ('DESCRIPTION', 'description'),
+    'Category': ('RULE CATEGORY', 'rule_category'),
+    'Amount': ('AMOUNT', 'amount')
+}
+
+# Sort orders of the transaction list kept as maintained indexes (least
+# recently used ones are dropped and rebuilt on demand)
+SORT_INDEX_CACHE = 4
+
+# Top-level keys merged specially when another instance changed the file;
+# every other key is a setting taken whole from whichever side changed it
+LEDGER_MERGED_KEYS = ('transactions', 'categories', 'accounts', 'archive', 'budget_counters',
+                      'next_transaction_id', 'next_account_id')
+
+# --- Money ---
+
+def to_minor(amount, currency='LKR'):
+    """Convert an amount in major units (number or decimal string) to integer minor units"""
+    decimals = CURRENCY_DECIMALS.get(currency, 2)
+    if isinstance(amount, str):
+        try:
+            value = Decimal(amount.strip().replace(',', ''))
+        except InvalidOperation:
+            raise ValueError(f"Invalid amount: {amount!r}")
+        if not value.is_finite():
+            raise ValueError(f"Invalid amount: {amount!r}")
+        return int(value.scaleb(decimals).to_integral_value(ROUND_HALF_EVEN))
+    if isinstance(amount, float) and not math.isfinite(amount):
+        raise ValueError(f"Invalid amount: {amount!r}")
+    # round() is half-even, and exact for any float that was entered in cents
+    return round(amount * 10 ** decimals)
+
+
+def from_minor(units, currency='LKR'):
+    """Convert integer minor units to a float in major units, for display"""
+    return units / 10 ** CURRENCY_DECIMALS.get(currency, 2)
+
+
+# --- Ledger data schema ---
+
+def coerce_value(value, kind):
+    """Convert a JSON value to int, float or str without losing information (None if it can't be)"""
+    if isinstance(value, bool):
+        return None
+    if kind is int:
+        if isinstance(value, float):
+            return int(value) if value.is_integer() else None
+        if isinstance(value, str):
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    elif kind is float:
+        if isinstance(value, int):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    elif kind is str and isinstance(value, (int, float)):
+        return str(value)
+    return None
+
+
+def invalid_field(trans, field, kind):
+    """ValueError naming a transaction and a field that is missing or can't be a kind"""
+    tid = trans.get('id', '?')
+    if trans.get(field) is None:
+        return ValueError(f"transaction {tid!r} has no {field!r}")
+    expected = {int: 'an integer', float: 'a number', str: 'text'}[kind]
+    return ValueError(f"transaction {tid!r}: {field!r} should be {expected}, not {trans[field]!r}")
+
+
+def major_amount(trans):
+    """The amount of a transaction saved before minor units, as a float"""
+    amount = trans.get('amount')
+    if type(amount) not in (int, float):
+        amount = coerce_value(amount, float)
+        if amount is None:
+            raise invalid_field(trans, 'amount', float)
+    return amount
+
+
+def coerce_transactions(rows, rejected=None):
+    """Bring transaction fields to the types in TRANSACTION_FIELDS; returns rows.
+
+    Each field is checked a whole column at a time (map and set run in C),
+    so a clean ledger costs a few passes at C speed. Rows are only visited
+    one by one for a column that turns out to hold other types. A row that
+    is not an object, misses a field without a default or has a value that
+    can't be converted raises ValueError, or, when a rejected list is
+    given, is taken out of rows and appended to it.
+    """
+    if not isinstance(rows, list):
+        raise ValueError("Transactions must be a list of objects")
+    bad = []
+    original = None if rejected is None else rows[:]
+    if not set(map(type, rows)) <= {dict}:
+        if rejected is None:
+            raise ValueError("Transactions must be a list of objects")
+        bad = [trans for trans in rows if not isinstance(trans, dict)]
+        rows[:] = [trans for trans in rows if isinstance(trans, dict)]
+    for field, kind in TRANSACTION_FIELDS.items():
+        try:
+            if set(map(type, map(operator.itemgetter(field), rows))) <= {kind}:
+                continue
+        except KeyError:
+            pass
+        default = TRANSACTION_DEFAULTS.get(field)
+        unreadable = set()
+        for i, trans in enumerate(rows):
+            value = trans.get(field)
+            if type(value) is kind:
+                continue
+            if value is None and default is not None:
+                trans[field] = default
+                continue
+            value = coerce_value(value, kind)
+            if value is None:
+                if rejected is None:
+                    raise invalid_field(trans, field, kind)
+                unreadable.add(i)
+                continue
+            trans[field] = value
+        if unreadable:
+            bad += [trans for i, trans in enumerate(rows) if i in unreadable]
+            rows[:] = [trans for i, trans in enumerate(rows) if i not in unreadable]
+    if bad:
+        rejected.extend(sorted(bad, key=original.index))
+    return rows
+
+
+# --- Binary ledger file format ---
+# Layout: header | index (JSON) | blocks
+#   header: magic, format version, flags, index length
+#   index:  schema version, codec, optional key-derivation parameters and
+#           one entry per block (offset, length, row count, period, id range)
+#   blocks: one metadata block with everything except the transactions,
+#           then columnar transaction blocks grouped by month
+# Blocks are compressed and, when a passphrase is set, encrypted, so the
+# reader only has to decode the blocks it is asked for.
+#
+# Encryption uses only the standard library: PBKDF2-HMAC-SHA256 derives the
+# keys, a SHAKE-256 keystream keyed with a per-block nonce encrypts, and an
+# HMAC-SHA256 tag authenticates each block. It protects the file at rest but
+# is not a substitute for an audited cipher.
+
+@lru_cache(maxsize=4096)
+def date_period(date):
+    """Parse a transaction date into 'YYYY-MM' (None if unparseable).
+
+    Cached because a ledger only has one distinct date string per day.
+    """
+    for fmt in ('%B %d, %Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(date, fmt).strftime('%Y-%m')
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+@lru_cache(maxsize=4096)
+def date_ordinal(date):
+    """Parse a transaction date into a day number (None if unparseable)"""
+    for fmt in ('%B %d, %Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(date, fmt).toordinal()
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+class LedgerPassphraseError(Exception):
+    """Raised when an encrypted ledger needs a (different) passphrase"""
+
+
+class LedgerReadOnlyError(Exception):
+    """Raised when a read-only viewer tries to change the ledger"""
+
+
+class LedgerLock:
+    """Advisory exclusive lock on a ledger's .lock file, held while writing.
+
+    Readers never take it: every file is replaced atomically, so a reader
+    always sees either the old or the new version.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+        self.file.close()
+        self.file = None
+
+
+@lru_cache(maxsize=64)
+def derive_keys(passphrase, salt, iterations):
+    """Derive the encryption and MAC keys from a passphrase"""
+    key = hashlib.pbkdf2_hmac('sha256', passphrase.encode('utf-8'), salt, iterations, dklen=64)
+    return key[:32], key[32:]
+
+
+def encrypt_block(payload, keys):
+    """Encrypt and authenticate one block: nonce | ciphertext | tag"""
+    enc_key, mac_key = keys
+    nonce = os.urandom(16)
+    stream = hashlib.shake_256(enc_key + nonce).digest(len(payload))
+    cipher = (int.from_bytes(payload, 'little') ^ int.from_bytes(stream, 'little')).to_bytes(len(payload), 'little')
+    tag = hmac.new(mac_key, nonce + cipher, hashlib.sha256).digest()
+    return nonce + cipher + tag
+
+
+def decrypt_block(block, keys):
+    """Verify and decrypt a block produced by encrypt_block"""
+    enc_key, mac_key = keys
+    nonce, cipher, tag = block[:16], block[16:-32], block[-32:]
+    if not hmac.compare_digest(tag, hmac.new(mac_key, nonce + cipher, hashlib.sha256).digest()):
+        raise LedgerPassphraseError("Ledger block failed authentication")
+    stream = hashlib.shake_256(enc_key + nonce).digest(len(cipher))
+    return (int.from_bytes(cipher, 'little') ^ int.from_bytes(stream, 'little')).to_bytes(len(cipher), 'little')
+
+
+def pack_int_column(values):
+    """Pack integers as little-endian int64 (array('q')), base64 encoded for the JSON block"""
+    column = array('q', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return base64.b64encode(column.tobytes()).decode('ascii')
+
+
+def unpack_int_column(text):
+    """Inverse of pack_int_column"""
+    column = array('q', base64.b64decode(text))
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tolist()
+
+
+def encode_transaction_block(rows):
+    """Pack rows column by column; keys missing from some rows go to 'extra'.
+
+    Integer columns (ids, amounts) are stored densely as int64 arrays.
+    """
+    dense = set(rows[0])
+    for row in rows:
+        dense &= row.keys()
+    columns = {key: [row[key] for row in rows] for key in sorted(dense)}
+    packed = []
+    for key, values in columns.items():
+        if all(type(v) is int for v in values):
+            try:
+                columns[key] = pack_int_column(values)
+            except OverflowError:
+                continue
+            packed.append(key)
+    extra = [{k: v for k, v in row.items() if k not in dense} or None for row in rows]
+    return {'columns': columns, 'packed': packed, 'extra': extra if any(extra) else None}
+
+
+def decode_transaction_block(block):
+    """Rebuild row dicts from a columnar block"""
+    columns = block['columns']
+    for key in block.get('packed', ()):
+        columns[key] = unpack_int_column(columns[key])
+    keys = list(columns)
+    rows = [dict(zip(keys, values)) for values in zip(*columns.values())]
+    if block['extra']:
+        for row, extra in zip(rows, block['extra']):
+            if extra:
+                row.update(extra)
+    return rows
+
+
+def write_ledger_file(path, meta, transactions, period_of, codec='zlib', passphrase=None, salt=None):
+    """Write a binary ledger file atomically and return its SHA-256 digest.
+
+    Passing the same salt for several files lets them share the derived
+    keys instead of running the key derivation once per file.
+    """
+    compress = zlib.compress if codec == 'zlib' else lzma.compress
+    flags = 0
+    kdf = None
+    keys = None
+    if passphrase:
+        flags |= LEDGER_FLAG_ENCRYPTED
+        salt = salt or os.urandom(16)
+        keys = derive_keys(passphrase, salt, LEDGER_KDF_ITERATIONS)
+        kdf = {
+            'salt': salt.hex(),
+            'iterations': LEDGER_KDF_ITERATIONS,
+            'check': hmac.new(keys[1], b'ledger', hashlib.sha256).hexdigest()
+        }
+
+    def pack(obj):
+        payload = compress(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
+        return encrypt_block(payload, keys) if keys else payload
+
+    by_period = {}
+    for trans in transactions:
+        by_period.setdefault(period_of(trans), []).append(trans)
+
+    entries = []
+    blobs = []
+    meta_blob = pack(meta)
+    entries.append({'kind': 'meta', 'length': len(meta_blob)})
+    blobs.append(meta_blob)
+    for period in sorted(by_period):
+        rows = by_period[period]
+        for start in range(0, len(rows), LEDGER_BLOCK_ROWS):
+            chunk = rows[start:start + LEDGER_BLOCK_ROWS]
+            blob = pack(encode_transaction_block(chunk))
+            entries.append({
+                'kind': 'transactions',
+                'length': len(blob),
+                'count': len(chunk),
+                'period': period,
+                'first_id': chunk[0]['id'],
+                'last_id': chunk[-1]['id']
+            })
+            blobs.append(blob)
+
+    index = {'schema': LEDGER_SCHEMA_VERSION, 'codec': codec, 'kdf': kdf, 'blocks': entries}
+    # Offsets depend on the index length, which depends on the offsets;
+    # reserve room by measuring the index with placeholder offsets first.
+    for entry in entries:
+        entry['offset'] = 0
+    base = struct.calcsize(LEDGER_HEADER) + len(json.dumps(index).encode('utf-8')) + 16 * len(entries)
+    offset = base
+    for entry, blob in zip(entries, blobs):
+        entry['offset'] = offset
+        offset += len(blob)
+    index_bytes = json.dumps(index).encode('utf-8')
+    assert len(index_bytes) <= base - struct.calcsize(LEDGER_HEADER)
+    index_bytes = index_bytes.ljust(base - struct.calcsize(LEDGER_HEADER))
+
+    digest = hashlib.sha256()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        for chunk in [struct.pack(LEDGER_HEADER, LEDGER_MAGIC, LEDGER_FORMAT_VERSION, flags, len(index_bytes)),
+                      index_bytes, *blobs]:
+            f.write(chunk)
+            digest.update(chunk)
+    os.replace(tmp_path, path)
+    return digest.digest()
+
+
+def is_ledger_file(path):
+    """True if path is a binary ledger (as opposed to a JSON file)"""
+    with open(path, 'rb') as f:
+        return f.read(len(LEDGER_MAGIC)) == LEDGER_MAGIC
+
+
+class LedgerFileReader:
+    """Memory-mapped reader that decodes binary ledger blocks on demand"""
+
+    def __init__(self, path, passphrase=None):
+        self.file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise
+
+        header_size = struct.calcsize(LEDGER_HEADER)
+        magic, version, flags, index_len = struct.unpack(LEDGER_HEADER, self.map[:header_size])
+        if magic != LEDGER_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a binary ledger file")
+        if version > LEDGER_FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} uses ledger format {version}, newer than this app supports")
+
+        self.index = json.loads(self.map[header_size:header_size + index_len])
+        if self.index['schema'] > LEDGER_SCHEMA_VERSION:
+            self.close()
+            raise ValueError(f"{path} uses ledger schema {self.index['schema']}, newer than this app supports")
+        self.decompress = zlib.decompress if self.index['codec'] == 'zlib' else lzma.decompress
+        self.encrypted = bool(flags & LEDGER_FLAG_ENCRYPTED)
+        self.keys = None
+        if self.encrypted:
+            kdf = self.index['kdf']
+            if not passphrase:
+                self.close()
+                raise LedgerPassphraseError("This ledger is encrypted")
+            self.keys = derive_keys(passphrase, bytes.fromhex(kdf['salt']), kdf['iterations'])
+            check = hmac.new(self.keys[1], b'ledger', hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(check, kdf['check']):
+                self.close()
+                raise LedgerPassphraseError("Wrong passphrase")
+
+    def read_block(self, entry):
+        """Decode one block described by an index entry"""
+        raw = self.map[entry['offset']:entry['offset'] + entry['length']]
+        if self.keys:
+            raw = decrypt_block(raw, self.keys)
+        return json.loads(self.decompress(raw))
+
+    def read_meta(self):
+        """Decode the metadata block"""
+        return self.read_block(self.index['blocks'][0])
+
+    def transaction_blocks(self):
+        """Index entries of the transaction blocks"""
+        return [entry for entry in self.index['blocks'] if entry['kind'] == 'transactions']
+
+    def read_transactions(self):
+        """Decode the transaction blocks, returned in id order"""
+        rows = []
+        for entry in self.transaction_blocks():
+            rows.extend(decode_transaction_block(self.read_block(entry)))
+        rows.sort(key=lambda t: t['id'])
+        return rows
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+# --- Export ---
+# Each dataset is a header plus a row generator; each format is a writer
+# that emits one row at a time, so exports run in constant memory.
+
+def export_rows(ledger, dataset):
+    """Return (header, row generator, row count) for an export dataset"""
+    if dataset == 'transactions':
+        header = ['id', 'date', 'account', 'description', 'rule_category', 'amount', 'timestamp', 'group']
+        rows = ([trans['id'], trans['date'], ledger.account_name(trans['account_id']),
+                 trans['description'], trans.get('rule_category', '-'),
+                 from_minor(trans['amount'], ledger.account_currency(trans['account_id'])),
+                 trans.get('timestamp', ''), trans.get('group', '')]
+                for trans in ledger.iter_transactions())
+        return header, rows, ledger.transaction_count()
+
+    if dataset == 'balances':
+        header = ['category', 'account', 'balance', 'balance_lkr']
+        rows = [[category, ledger.account_name(aid), from_minor(balance, ledger.account_currency(aid)),
+                 ledger.to_lkr(balance, aid)]
+                for category, accounts in ledger.data['categories'].items()
+                for aid, balance in accounts.items()]
+    elif dataset == 'allocation':
+        header = ['rule', 'percent', 'target', 'current', 'difference', 'percent_current']
+        rows = [[rule, row['percent'], row['target'], row['current'], row['difference'], row['percent_current']]
+                for rule, row in ledger.rule_allocation().items()]
+    elif dataset == 'chart':
+        header = ['date', 'real_total']
+        rows = [[date.isoformat(), value] for date, value in ledger.chart_series()]
+    else:
+        raise ValueError(f"Unknown export dataset: {dataset}")
+    return header, iter(rows), len(rows)
+
+
+def csv_writer(f, header):
+    """Row writer for CSV"""
+    writer = csv.writer(f)
+    writer.writerow(header)
+    return writer.writerow, lambda: None
+
+
+def jsonl_writer(f, header):
+    """Row writer for JSON Lines, one object per row"""
+    def write(row):
+        f.write(json.dumps(dict(zip(header, row))) + '\n')
+    return write, lambda: None
+
+
+def spreadsheet_xml_writer(f, header):
+    """Row writer for Excel's XML Spreadsheet 2003 format"""
+    def cell(value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<Cell><Data ss:Type="Number">{value}</Data></Cell>'
+        return f'<Cell><Data ss:Type="String">{escape(str(value))}</Data></Cell>'
+
+    def write(row):
+        f.write('<Row>' + ''.join(cell(value) for value in row) + '</Row>\n')
+
+    def finish():
+        f.write('</Table></Worksheet></Workbook>\n')
+
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n<?mso-application progid="Excel.Sheet"?>\n'
+            '<Workbook xmlns="urn:schemas-microsoft-com:office:spreadsheet" '
+            'xmlns:ss="urn:schemas-microsoft-com:office:spreadsheet">\n'
+            '<Worksheet ss:Name="Export"><Table>\n')
+    write(header)
+    return write, finish
+
+
+# format -> (label, file extension, writer)
+EXPORT_FORMATS = {
+    'csv': ("CSV", '.csv', csv_writer),
+    'jsonl': ("JSON Lines", '.jsonl', jsonl_writer),
+    'xml': ("Excel XML", '.xml', spreadsheet_xml_writer)
+}
+
+
+def export_dataset(ledger, dataset, fmt, path):
+    """Stream a dataset to path, yielding (rows written, total) as it goes.
+
+    The file is written under a temporary name and only replaces path once
+    complete; closing the generator early cancels the export.
+    """
+    header, rows, total = export_rows(ledger, dataset)
+    tmp_path = path + '.tmp'
+    done = False
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            write, finish = EXPORT_FORMATS[fmt][2](f, header)
+            written = 0
+            for row in rows:
+                write(row)
+                written += 1
+                if written % EXPORT_CHUNK_ROWS == 0:
+                    yield written, total
+            finish()
+        os.replace(tmp_path, path)
+        done = True
+        yield written, total
+    finally:
+        if not done and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# --- Auto-categorization ---
+
+class Categorizer:
+    """Suggests a rule category for a transaction description.
+
+    Keyword/regex rules are tried first; otherwise a multinomial naive
+    Bayes model trained on already tagged transactions decides. Answers
+    are memoized per normalized description, and training is incremental
+    (a negative weight forgets a transaction).
+    """
+
+    TOKEN = re.compile(r'[a-z][a-z0-9&]+')
+
+    def __init__(self, rules):
+        self.word_counts = {category: {} for category in RULE_CATEGORIES}
+        self.word_totals = dict.fromkeys(RULE_CATEGORIES, 0)
+        self.doc_counts = dict.fromkeys(RULE_CATEGORIES, 0)
+        self.vocabulary = {}
+        self.model = None
+        self.set_rules(rules)
+
+    def set_rules(self, rules):
+        """Replace the keyword/regex rules"""
+        self.rules = [(re.compile(pattern, re.IGNORECASE), category) for pattern, category in rules]
+        self.cache = {}
+
+    def normalize(self, description):
+        """Lower-cased words of a description, joined by single spaces"""
+        return ' '.join(self.TOKEN.findall(description.lower()))
+
+    def learn(self, description, category, weight=1):
+        """Count a tagged description towards the model"""
+        if category not in self.word_counts:
+            return
+        words = self.TOKEN.findall(description.lower())
+        counts = self.word_counts[category]
+        for word in words:
+            counts[word] = counts.get(word, 0) + weight
+            seen = self.vocabulary.get(word, 0) + weight
+            if seen > 0:
+                self.vocabulary[word] = seen
+            else:
+                self.vocabulary.pop(word, None)
+        self.word_totals[category] += weight * len(words)
+        self.doc_counts[category] += weight
+        self.model = None
+        if self.cache:
+            self.cache = {}
+
+    def build_model(self):
+        """Log prior, word log-likelihoods and unseen-word log-likelihood per category"""
+        docs = sum(self.doc_counts.values())
+        vocabulary = len(self.vocabulary) or 1
+        self.model = {}
+        for category, count in self.doc_counts.items():
+            if count <= 0:
+                continue
+            denominator = self.word_totals[category] + vocabulary
+            likelihoods = {word: math.log((n + 1) / denominator)
+                           for word, n in self.word_counts[category].items() if n > 0}
+            self.model[category] = (math.log(count / docs), likelihoods, math.log(1 / denominator))
+        return self.model
+
+    def classify(self, description):
+        """Best rule category for a description, or '-' when nothing applies"""
+        key = self.normalize(description)
+        category = self.cache.get(key)
+        if category is not None:
+            return category
+
+        category = '-'
+        for pattern, rule_category in self.rules:
+            if pattern.search(key):
+                category = rule_category
+                break
+        else:
+            words = [word for word in key.split() if word in self.vocabulary]
+            if words:
+                model = self.model or self.build_model()
+                best = -math.inf
+                for candidate, (prior, likelihoods, unseen) in model.items():
+                    score = prior + sum(likelihoods.get(word, unseen) for word in words)
+                    if score > best:
+                        best, category = score, candidate
+
+        if len(self.cache) >= CATEGORY_CACHE_SIZE:
+            self.cache = {}
+        self.cache[key] = category
+        return category
+
+    def classify_many(self, descriptions):
+        """Classify a batch; repeated descriptions are answered from the cache"""
+        return [self.classify(description) for description in descriptions]
+
+
+def read_import_csv(ledger, path):
+    """Parse a CSV of transactions for import; returns (transactions, skipped rows).
+
+    Needs date, account, description and amount columns; rule_category
+    and timestamp are optional. Rows without a rule category are left for
+    the categorizer; rows with an unknown account or bad values are skipped.
+    """
+    accounts = {ledger.account_name(aid): aid
+                for group in ledger.data['categories'].values() for aid in group}
+    rows = []
+    skipped = 0
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        for record in csv.DictReader(f):
+            try:
+                date = record['date'].strip()
+                aid = accounts[record['account'].strip()]
+                trans = {
+                    'date': date,
+                    'account_id': aid,
+                    'description': record['description'].strip(),
+                    'amount': to_minor(record['amount'], ledger.account_currency(aid)),
+                    'timestamp': (record.get('timestamp') or '').strip() or datetime.now().isoformat()
+                }
+            except (KeyError, ValueError, AttributeError):
+                skipped += 1
+                continue
+            if date_period(date) is None:
+                skipped += 1
+                continue
+            rule_category = (record.get('rule_category') or '').strip()
+            if rule_category:
+                trans['rule_category'] = rule_category
+            rows.append(trans)
+    return rows, skipped
+
+
+# --- Duplicate and anomaly detection ---
+
+class AnomalyDetector:
+    """Flags likely double-posted and unusually large transactions.
+
+    Near-duplicates are found through a hash index keyed by account,
+    amount in cents and normalized description, holding the ids seen on
+    each day, probed over the date window. Each account keeps running
+    mean/variance of its income and of its spend (Welford's method, which
+    also supports removal). Checking, adding and removing a transaction
+    are all O(1).
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.stats = {}
+        self.flags = {}
+
+    @staticmethod
+    @lru_cache(maxsize=65536)
+    def normalize(description):
+        """Lower-cased words and numbers of a description"""
+        return ' '.join(re.findall(r'[a-z0-9]+', description.lower()))
+
+    def key(self, trans):
+        """Index key: (account, cents, normalized description)"""
+        return trans['account_id'], trans['amount'], self.normalize(trans['description'])
+
+    def check(self, trans, key=None):
+        """Flags ('duplicate', 'unusual') a transaction would get against what is indexed"""
+        flags = set()
+        days = self.index.get(key or self.key(trans))
+        day = date_ordinal(trans['date'])
+        if days and day is not None:
+            for probe in range(day - DUPLICATE_WINDOW_DAYS, day + DUPLICATE_WINDOW_DAYS + 1):
+                ids = days.get(probe)
+                if ids and (len(ids) > 1 or trans.get('id') not in ids):
+                    flags.add('duplicate')
+                    break
+
+        count, mean, m2 = self.stats.get((trans['account_id'], trans['amount'] < 0), (0, 0.0, 0.0))
+        if count >= ANOMALY_MIN_SAMPLES:
+            deviation = (m2 / (count - 1)) ** 0.5
+            if deviation > 0 and abs(trans['amount'] - mean) > ANOMALY_SIGMAS * deviation:
+                flags.add('unusual')
+        return flags
+
+    def add(self, trans):
+        """Check a transaction, then index it and count it in its account's statistics"""
+        key = self.key(trans)
+        flags = self.check(trans, key)
+        if flags:
+            self.flags[trans['id']] = flags
+        else:
+            self.flags.pop(trans['id'], None)
+
+        self.index.setdefault(key, {}).setdefault(date_ordinal(trans['date']), set()).add(trans['id'])
+        side = (trans['account_id'], trans['amount'] < 0)
+        count, mean, m2 = self.stats.get(side, (0, 0.0, 0.0))
+        count += 1
+        delta = trans['amount'] - mean
+        mean += delta / count
+        self.stats[side] = (count, mean, m2 + delta * (trans['amount'] - mean))
+        return flags
+
+    def remove(self, trans):
+        """Undo add() for a transaction"""
+        self.flags.pop(trans['id'], None)
+        key = self.key(trans)
+        days = self.index.get(key)
+        if days:
+            day = date_ordinal(trans['date'])
+            ids = days.get(day)
+            if ids:
+                ids.discard(trans['id'])
+                if not ids:
+                    del days[day]
+                    if not days:
+                        del self.index[key]
+
+        side = (trans['account_id'], trans['amount'] < 0)
+        count, mean, m2 = self.stats.get(side, (0, 0.0, 0.0))
+        if count <= 1:
+            self.stats.pop(side, None)
+            return
+        new_mean = (count * mean - trans['amount']) / (count - 1)
+        self.stats[side] = (count - 1, new_mean, max(m2 - (trans['amount'] - mean) * (trans['amount'] - new_mean), 0.0))
+
+    def scan(self, transactions):
+        """Rebuild everything from a transaction stream in one pass"""
+        self.index.clear()
+        self.stats.clear()
+        self.flags.clear()
+        for trans in transactions:
+            self.add(trans)
+        return self.flags
+
+
+# --- Investment holdings ---
+# data['holdings'] = {account id: {symbol: [[date 'YYYY-MM-DD', quantity, unit cost], ...]}}
+# with lots oldest first; prices and costs are in the account's currency.
+
+def read_price_csv(path):
+    """Read a date,symbol,price CSV into {symbol: (day numbers, prices)}, oldest first"""
+    rows = {}
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        for record in csv.DictReader(f):
+            try:
+                day = date_ordinal(record['date'].strip())
+                price = float(record['price'])
+                symbol = record['symbol'].strip().upper()
+            except (KeyError, ValueError, AttributeError):
+                continue
+            if day is not None and symbol and price > 0:
+                rows.setdefault(symbol, []).append((day, price))
+
+    table = {}
+    for symbol, history in rows.items():
+        history.sort()
+        table[symbol] = ([day for day, _ in history], [price for _, price in history])
+    return table
+
+
+def price_on(table, symbol, day):
+    """Latest price of a symbol on or before a day (None if unknown)"""
+    history = table.get(symbol)
+    if not history:
+        return None
+    i = bisect_right(history[0], day)
+    return history[1][i - 1] if i else None
+
+
+# --- Quick entry ---
+
+class PrefixTrie:
+    """Case-insensitive prefix tree of strings with use counts, for autocomplete.
+
+    Adding or removing a string only walks its own path, so the tries
+    behind quick entry are built once and then kept current one
+    transaction at a time. Each string can carry a value (an account id).
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def add(self, text, value=None, count=1):
+        """Count count more uses of text"""
+        node = self.root
+        for char in text.lower():
+            node = node.setdefault(char, {})
+        entry = node.get(None)
+        if entry is None:
+            node[None] = [text, value, count]
+        else:
+            entry[2] += count
+
+    def remove(self, text):
+        """Count one use of text less, pruning it from the tree at zero"""
+        key = text.lower()
+        path = [self.root]
+        for char in key:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        entry = path[-1].get(None)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2] > 0:
+            return
+        del path[-1][None]
+        for i in range(len(key), 0, -1):
+            if path[i]:
+                break
+            del path[i - 1][key[i - 1]]
+
+    def lookup(self, text):
+        """(text, value) of an exact (case-insensitive) match, or None"""
+        node = self.root
+        for char in text.lower():
+            node = node.get(char)
+            if node is None:
+                return None
+        entry = node.get(None)
+        return (entry[0], entry[1]) if entry else None
+
+    def complete(self, prefix, limit=5):
+        """Up to limit (text, value) pairs starting with prefix, most used first"""
+        node = self.root
+        for char in prefix.lower():
+            node = node.get(char)
+            if node is None:
+                return []
+        entries = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for key, child in node.items():
+                if key is None:
+                    entries.append(child)
+                else:
+                    stack.append(child)
+        return [(entry[0], entry[1]) for entry in heapq.nsmallest(limit, entries, key=lambda e: (-e[2], e[0]))]
+
+
+# --- Savings goals ---
+# data['goals'] = {goal id: {'name', 'target' (LKR minor units), 'deadline' 'YYYY-MM-DD',
+#                            'start' 'YYYY-MM-DD', and 'accounts' [ids] or 'rule_category'}}
+
+class GoalTracker:
+    """Running progress of every savings goal.
+
+    An account goal's progress is the balance of its accounts; a rule
+    category goal's is the sum of the transactions tagged with it since
+    the goal started. Sums are kept per currency in minor units, so a
+    balance edit or transaction change only touches the goals linked to
+    it and a rate change needs no rescan.
+    """
+
+    def __init__(self, goals):
+        self.sums = {gid: {} for gid in goals}
+        self.by_account = {}
+        self.by_rule = {}
+        for gid, goal in goals.items():
+            if goal.get('rule_category'):
+                start = date_ordinal(goal.get('start')) or 0
+                self.by_rule.setdefault(goal['rule_category'], []).append((gid, start))
+            else:
+                for aid in goal.get('accounts', []):
+                    self.by_account.setdefault(aid, []).append(gid)
+
+    def earliest_start(self):
+        """Day number of the earliest rule category goal start (None without any)"""
+        starts = [start for goals in self.by_rule.values() for _, start in goals]
+        return min(starts) if starts else None
+
+    def add(self, gid, currency, units):
+        """Add units of a currency to one goal"""
+        sums = self.sums[gid]
+        sums[currency] = sums.get(currency, 0) + units
+
+    def balance(self, aid, currency, delta):
+        """Count a change in an account's balance"""
+        for gid in self.by_account.get(aid, ()):
+            self.add(gid, currency, delta)
+
+    def transaction(self, trans, currency, sign=1):
+        """Count (sign=1) or uncount (sign=-1) a transaction towards rule category goals"""
+        goals = self.by_rule.get(trans.get('rule_category', '-'))
+        if not goals or trans.get('adjustment'):
+            return
+        day = date_ordinal(trans['date'])
+        for gid, start in goals:
+            if day is not None and day >= start:
+                self.add(gid, currency, sign * trans['amount'])
+
+
+# --- Ledger events ---
+# Every primitive op publishes one of these; a command (or undo/redo) is
+# delivered to subscribers as one batch.
+
+TransactionAdded = namedtuple('TransactionAdded', 'transaction')
+TransactionDeleted = namedtuple('TransactionDeleted', 'transaction')
+TransactionUpdated = namedtuple('TransactionUpdated', 'transaction changes previous')
+BalanceEdited = namedtuple('BalanceEdited', 'account_id old new')
+AccountAdded = namedtuple('AccountAdded', 'account_id')
+AccountDeleted = namedtuple('AccountDeleted', 'account_id')
+AccountRenamed = namedtuple('AccountRenamed', 'account_id old new')
+BudgetChanged = namedtuple('BudgetChanged', 'kind key limit')
+RateChanged = namedtuple('RateChanged', 'old new')
+RulesChanged = namedtuple('RulesChanged', 'rules')
+SettingChanged = namedtuple('SettingChanged', 'key value')
+# Changes merged in from another instance ({'added', 'removed', 'modified'} ids)
+LedgerReloaded = namedtuple('LedgerReloaded', 'changes')
+
+MUTATION_EVENTS = (TransactionAdded, TransactionDeleted, TransactionUpdated, BalanceEdited,
+                   AccountAdded, AccountDeleted, AccountRenamed, BudgetChanged,
+                   RateChanged, RulesChanged, SettingChanged)
+
+
+class EventBus:
+    """Delivers batches of ledger events to subscribers.
+
+    UI subscribers run on the Tk thread through ui_dispatch; batches
+    published before it gets to run are merged into one call. Worker
+    subscribers run in publish order on a background thread. Batches
+    published on other threads (and calls queued with call_on_ui) wait
+    for the GUI's next deliver_ui, since Tk may only be called from its
+    own thread.
+    """
+
+    def __init__(self):
+        self.subscribers = []
+        self.ui_dispatch = None
+        self.ui_pending = []
+        self.ui_calls = []
+        self.ui_scheduled = False
+        self.lock = threading.Lock()
+        self.worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ledger-events')
+
+    def subscribe(self, handler, types=MUTATION_EVENTS + (LedgerReloaded,), worker=False):
+        """Call handler(events) with the events of the given types"""
+        self.subscribers.append((handler, types, worker))
+
+    def publish(self, events):
+        """Hand a batch to worker subscribers now and to UI subscribers soon"""
+        if not events:
+            return
+        for handler, types, worker in self.subscribers:
+            if worker:
+                batch = [event for event in events if isinstance(event, types)]
+                if batch:
+                    self.worker.submit(self.call, handler, batch)
+
+        with self.lock:
+            self.ui_pending.extend(events)
+            schedule = not self.ui_scheduled and threading.current_thread() is threading.main_thread()
+            if schedule:
+                self.ui_scheduled = True
+        if self.ui_dispatch is None:
+            self.deliver_ui()
+        elif schedule:
+            self.ui_dispatch(self.deliver_ui)
+
+    def call_on_ui(self, fn):
+        """Run fn() on the Tk thread with the next delivery (at once when there is no UI)"""
+        if self.ui_dispatch is None:
+            self.call(fn)
+            return
+        with self.lock:
+            self.ui_calls.append(fn)
+
+    def deliver_ui(self):
+        """Run queued calls, then pass pending events to UI subscribers; must run on the Tk thread"""
+        with self.lock:
+            calls, self.ui_calls = self.ui_calls, []
+        for fn in calls:
+            self.call(fn)
+        with self.lock:
+            events, self.ui_pending = self.ui_pending, []
+            self.ui_scheduled = False
+        if not events:
+            return
+        for handler, types, worker in self.subscribers:
+            if not worker:
+                batch = [event for event in events if isinstance(event, types)]
+                if batch:
+                    self.call(handler, batch)
+
+    @staticmethod
+    def call(handler, *args):
+        """Run one subscriber or queued call, reporting rather than propagating its errors"""
+        try:
+            handler(*args)
+        except Exception:
+            traceback.print_exc()
+
+    def close(self):
+        """Wait for worker subscribers to finish queued batches"""
+        self.worker.shutdown(wait=True)
+
+
+# Sortable transaction columns: (ledger, transaction) -> key component
+SORT_COLUMNS = {
+    'date': lambda ledger, trans: date_ordinal(trans['date']) or 0,
+    'account': lambda ledger, trans: ledger.account_name(trans['account_id']).lower(),
+    'description': lambda ledger, trans: trans['description'].lower(),
+    'rule_category': lambda ledger, trans: trans.get('rule_category', '-'),
+    # In LKR, so USD amounts sort among the rest at the current rate
+    'amount': lambda ledger, trans: ledger.to_lkr(trans['amount'], trans['account_id'])
+}
+
+
+class Ledger:
+    """Ledger data, persistence and the undoable mutation layer"""
+
+    def __init__(self, data_file, passphrase=None, read_only=False):
+        self.data_file = data_file
+        self.binary_file = os.path.splitext(data_file)[0] + '.ftl'
+        self.lock_file = os.path.splitext(data_file)[0] + '.lock'
+        self.repair_file = os.path.splitext(data_file)[0] + '.repair.json'
+        self.backup_dir = os.path.splitext(data_file)[0] + '.backups'
+        self.passphrase = passphrase
+        self.read_only = read_only
+        self.storage_format = 'json'
+        self.codec = 'zlib'
+        self.kdf_salt = os.urandom(16)
+        self.usd_to_lkr = 290.0
+
+        # Monthly archive partitions: periods older than hot_cutoff live in
+        # archive_dir and are only read into self.data['transactions'] on demand
+        self.archive_dir = os.path.splitext(data_file)[0] + '.archive'
+        today = datetime.now()
+        months = today.year * 12 + today.month - ARCHIVE_HOT_MONTHS
+        self.hot_cutoff = f"{months // 12:04d}-{months % 12 + 1:02d}"
+        self.loaded_periods = set()
+        self.dirty_periods = set()
+
+        # What the main file held when this instance last read or wrote it:
+        # (mtime, size), content hash and a snapshot used as the merge base
+        self.synced_signature = None
+        self.synced_hash = None
+        self.base = None
+        # A save on the worker found the file changed and left the merge to the Tk thread
+        self.merge_queued = False
+
+        # Bumped on every change to the in-memory data; the mutex keeps
+        # API worker threads from reading while the GUI thread mutates
+        self.version = 0
+        self.mutex = threading.RLock()
+        self.events = EventBus()
+        self.pending_events = []
+        self.category_model = None
+        self.detector = None
+        self.sum_index = None
+        self.group_index = None
+        self.sort_indexes = OrderedDict()
+        self.price_cache = (None, {})
+        self.valuation_cache = (None, None)
+        self.history_cache = (None, None)
+        self.completion_tries = None
+        self.goal_tracker = None
+
+        # Chunk ids of the last snapshot by (period, id block), the blocks
+        # changed since (None: rebuild all) and the partition files they came from
+        self.backup_chunks = None
+        self.stale_blocks = None
+        self.backup_partitions = {}
+        self.backup_chunk_keys = None
+        self.last_backup = 0
+
+        # Bounded ring buffers of (label, inverse ops)
+        self.undo_log = deque(maxlen=UNDO_LIMIT)
+        self.redo_log = deque(maxlen=UNDO_LIMIT)
+
+        self.data = self.load_data()
+        self.record_sync(self.data['transactions'], self.synced_hash)
+        if not read_only:
+            self.archive_cold_transactions()
+            self.events.subscribe(self.persist, MUTATION_EVENTS, worker=True)
+
+    def load_data(self):
+        """Load data from the binary ledger, falling back to the JSON file"""
+        data = self.read_main_file()
+        if data is None:
+            data = {
+                'exchange_rate': 290.0,
+                'rule_percentages': {
+                    'growth': 25,
+                    'stability': 15,
+                    'essentials': 50,
+                    'rewards': 10
+                },
+                'categories': {
+                    'Cash & Bank': {
+                        'Com Bank Main Acc': 0.00,
+                        'MM Acc': 0.00,
+                        'Boc Bank Main Acc': 0.00,
+                        'Sampath Acc': 0.00,
+                        'On Hand': 0.00
+                    },
+                    'Crypto & Investments': {
+                        'Crypto $': 0.00,
+                        'CAL': 0.00,
+                        'CSE': 0.00,
+                        'Ez Cash': 0.00,
+                        'Paynoree Skrill': 0.00
+                    },
+                    'Upcoming': {}
+                },
+                'transactions': []
+            }
+        data = self.upgrade_data(data)
+        self.usd_to_lkr = data['exchange_rate']
+        return data
+
+    def read_main_file(self):
+        """Read the main file (None if there is none yet), noting its signature and hash"""
+        self.synced_signature = self.file_signature()
+        if os.path.exists(self.binary_file):
+            data, self.synced_hash = self.read_binary()
+        elif os.path.exists(self.data_file):
+            with open(self.data_file, 'rb') as f:
+                raw = f.read()
+            self.synced_hash = hashlib.sha256(raw).digest()
+            data = json.loads(raw)
+        else:
+            return None
+        return data
+
+    def upgrade_data(self, data):
+        """Migrate data read from any file to DATA_SCHEMA_VERSION and validate it.
+
+        Raises ValueError for a file from a newer version of the app or one
+        whose layout is not a ledger; single transactions that can't be read
+        are set aside instead (see set_aside_transactions).
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"{self.data_file} does not contain a ledger")
+        version = data.get('schema', 0)
+        if not isinstance(version, int) or version > DATA_SCHEMA_VERSION:
+            raise ValueError(f"{self.data_file} uses data schema {version!r}, newer than this app supports")
+        self.check_layout(data)
+        data.setdefault('categories', {})
+        data.setdefault('transactions', [])
+        rows = data['transactions']
+        if not set(map(type, rows)) <= {dict}:
+            self.set_aside_transactions(data, [trans for trans in rows if not isinstance(trans, dict)])
+            data['transactions'] = [trans for trans in rows if isinstance(trans, dict)]
+
+        for step, method in DATA_MIGRATIONS:
+            if step > version:
+                getattr(self, method)(data)
+        data['schema'] = DATA_SCHEMA_VERSION
+        return self.validate_data(data)
+
+    def check_layout(self, data):
+        """Raise ValueError if a top-level container has the wrong type"""
+        for key, kind in DATA_LAYOUT.items():
+            if key in data and not isinstance(data[key], kind):
+                raise ValueError(f"{self.data_file}: {key!r} should be a{'n object' if kind is dict else ' list'}")
+
+    def validate_data(self, data):
+        """Fill in missing parts of a migrated ledger and coerce its values to their types; returns data"""
+        self.check_layout(data)
+        for key in DATA_REQUIRED:
+            data.setdefault(key, DATA_LAYOUT[key]())
+        for category in ACCOUNT_CATEGORIES:
+            data['categories'].setdefault(category, {})
+        for category, balances in data['categories'].items():
+            for aid in balances:
+                data['accounts'].setdefault(aid, {'name': aid, 'category': category})
+        for kind in ('rule_categories', 'accounts'):
+            data['budgets'].setdefault(kind, {})
+
+        def coerce(container, key, kind):
+            value = container[key]
+            if type(value) is not kind:
+                value = coerce_value(value, kind)
+                if value is None:
+                    raise ValueError(f"{self.data_file}: {key!r} should be a number, not {container[key]!r}")
+                container[key] = value
+
+        data.setdefault('exchange_rate', 290.0)
+        data.setdefault('next_account_id', len(data['accounts']) + 1)
+        coerce(data, 'exchange_rate', float)
+        coerce(data, 'next_account_id', int)
+        for balances in data['categories'].values():
+            for aid in balances:
+                coerce(balances, aid, int)
+        for limits in data['budgets'].values():
+            for key in limits:
+                coerce(limits, key, int)
+        rejected = []
+        coerce_transactions(data['transactions'], rejected)
+        self.set_aside_transactions(data, rejected)
+        if 'next_transaction_id' not in data:
+            ids = [trans['id'] for trans in data['transactions'] + data.get('rejected_transactions', [])
+                   if isinstance(trans, dict) and type(trans.get('id')) is int]
+            data['next_transaction_id'] = max(ids, default=0) + 1
+        coerce(data, 'next_transaction_id', int)
+        if not {'period', 'rule_categories', 'accounts'} <= data.get('budget_counters', {}).keys():
+            self.recount_budget_counters(data)
+        return data
+
+    def set_aside_transactions(self, data, rows):
+        """Keep transactions that can't be loaded in data['rejected_transactions'].
+
+        They are saved with the ledger as they were read, so nothing is lost
+        before check_integrity reports them and apply_repairs fixes or drops
+        them. A row already set aside is not added twice.
+        """
+        if not rows:
+            return
+        kept = data.setdefault('rejected_transactions', [])
+        seen = set(map(self.fingerprint, kept))
+        for trans in rows:
+            key = self.fingerprint(trans)
+            if key not in seen:
+                seen.add(key)
+                kept.append(trans)
+
+    def migrate_transaction_ids(self, data):
+        """Older files have no transaction ids; number them in list order"""
+        if 'next_transaction_id' in data:
+            return
+        for i, trans in enumerate(data['transactions']):
+            trans['id'] = i + 1
+        data['next_transaction_id'] = len(data['transactions']) + 1
+
+    def migrate_settings(self, data):
+        """Add the settings and containers introduced after the first release"""
+        data.setdefault('exchange_rate', 290.0)
+        data.setdefault('budgets', {'rule_categories': {}, 'accounts': {}})
+        data.setdefault('archive', {})
+
+    def migrate_budget_counters(self, data):
+        """One-time seed for files created before budgets existed.
+
+        validate_data counts them once the transactions are coerced and any
+        unreadable rows set aside; afterwards the counters are only updated
+        incrementally.
+        """
+
+    def migrate_account_ids(self, data):
+        """Give every account a stable id and point transactions at it.
+
+        Balances stay under data['categories'], now keyed by account id,
+        while data['accounts'] is the single id -> name/category table.
+        Transactions whose account no longer exists keep a table entry
+        with no category so their history still shows a name.
+        """
+        if 'accounts' in data:
+            return
+        accounts = {}
+        by_name = {}
+        for category, balances in data['categories'].items():
+            renamed = {}
+            for name, balance in balances.items():
+                aid = f"a{len(accounts) + 1}"
+                accounts[aid] = {'name': name, 'category': category}
+                by_name.setdefault(name, aid)
+                renamed[aid] = balance
+            data['categories'][category] = renamed
+
+        for trans in data['transactions']:
+            if not isinstance(trans.get('account'), str):
+                continue  # left without an account_id, so validate_data sets it aside
+            name = trans.pop('account')
+            if name not in by_name:
+                aid = f"a{len(accounts) + 1}"
+                accounts[aid] = {'name': name, 'category': None}
+                by_name[name] = aid
+            trans['account_id'] = by_name[name]
+
+        data['accounts'] = accounts
+        data['next_account_id'] = len(accounts) + 1
+
+        budgets = data['budgets']['accounts']
+        data['budgets']['accounts'] = {by_name[name]: limit for name, limit in budgets.items()
+                                       if name in by_name}
+        counters = data.get('budget_counters')
+        if counters:
+            counters['accounts'] = {by_name[name]: spent for name, spent in counters['accounts'].items()
+                                    if name in by_name}
+
+    def migrate_money(self, data):
+        """Convert float balances and amounts to integer minor units.
+
+        Archived partitions are converted when they are read (their
+        manifest entry is marked legacy_amounts) and written back in minor
+        units the next time the month is saved.
+        """
+        if data.get('money_units') == 'minor':
+            return
+        def currency(aid):
+            # Same rule as is_usd_account; self.data is not set up yet
+            return 'USD' if data['accounts'].get(aid, {}).get('name') == 'Crypto $' else 'LKR'
+
+        for balances in data['categories'].values():
+            for aid, balance in balances.items():
+                balances[aid] = to_minor(balance, currency(aid))
+        for trans in data['transactions']:
+            try:
+                trans['amount'] = to_minor(major_amount(trans), currency(trans.get('account_id')))
+            except (TypeError, ValueError):
+                pass  # kept as it was, so validate_data sets it aside
+        for kind in ('rule_categories', 'accounts'):
+            limits = data['budgets'][kind]
+            for key, limit in limits.items():
+                limits[key] = to_minor(limit)
+        counters = data.get('budget_counters')
+        if counters:
+            for kind in ('rule_categories', 'accounts'):
+                for key, spent in counters[kind].items():
+                    counters[kind][key] = to_minor(spent)
+        for entry in data['archive'].values():
+            entry['total'] = to_minor(entry['total'])
+            entry['accounts'] = {aid: to_minor(total, currency(aid)) for aid, total in entry['accounts'].items()}
+            entry['legacy_amounts'] = True
+        for aid, record in data.get('reconciliations', {}).items():
+            record['statement'] = to_minor(record['statement'], currency(aid))
+        data['money_units'] = 'minor'
+
+    def read_binary(self):
+        """Read the binary ledger through a memory-mapped reader; returns (data, hash)"""
+        reader = LedgerFileReader(self.binary_file, self.passphrase)
+        try:
+            data = reader.read_meta()
+            data['transactions'] = reader.read_transactions()
+            digest = hashlib.sha256(reader.map).digest()
+            self.codec = reader.index['codec']
+        finally:
+            reader.close()
+        self.storage_format = 'binary'
+        return data, digest
+
+    def save_data(self):
+        """Save the main file and any changed archive partitions.
+
+        Runs under the ledger lock; if another instance wrote the file since
+        we last read it, its changes are merged in before ours are written.
+        """
+        if self.read_only:
+            return
+        with self.mutex, LedgerLock(self.lock_file):
+            if self.file_signature() != self.synced_signature:
+                if self.events.ui_dispatch is not None and threading.current_thread() is not threading.main_thread():
+                    # The Tk thread reads self.data without the mutex (and turns
+                    # what it read into absolute balances), so the merge must not
+                    # replace it from here: merge there, then save again
+                    if not self.merge_queued:
+                        self.merge_queued = True
+                        self.events.call_on_ui(self.merge_then_save)
+                    return
+                changes = self.merge_external_changes()
+                if changes is not None:
+                    self.events.publish([LedgerReloaded(changes)])
+            self.data['exchange_rate'] = self.usd_to_lkr
+
+            hot = []
+            dirty = {period: [] for period in self.dirty_periods}
+            for trans in self.data['transactions']:
+                period = self.transaction_period(trans)
+                if period in dirty:
+                    dirty[period].append(trans)
+                elif not self.is_cold(period):
+                    hot.append(trans)
+            for period, rows in dirty.items():
+                self.write_partition(period, rows)
+            self.dirty_periods.clear()
+
+            if self.storage_format == 'binary':
+                meta = {key: value for key, value in self.data.items() if key != 'transactions'}
+                digest = write_ledger_file(self.binary_file, meta, hot, self.transaction_period,
+                                           self.codec, self.passphrase, self.kdf_salt)
+            else:
+                raw = json.dumps({**self.data, 'transactions': hot}, indent=2).encode('utf-8')
+                with open(self.data_file + '.tmp', 'wb') as f:
+                    f.write(raw)
+                os.replace(self.data_file + '.tmp', self.data_file)
+                digest = hashlib.sha256(raw).digest()
+            self.record_sync(hot, digest)
+
+    def merge_then_save(self):
+        """Tk-thread half of a save that found the file changed: merge, then save on the worker"""
+        with self.mutex:
+            self.merge_queued = False
+        self.check_external_changes()
+        self.events.worker.submit(self.events.call, self.persist, [])
+
+    def persist(self, events):
+        """Save after a batch of changes and take a snapshot if one is due; runs on the event worker thread"""
+        self.save_data()
+        self.backup()
+
+    # --- Concurrent access ---
+
+    def main_file(self):
+        """Path of the file holding the hot transactions and settings"""
+        return self.binary_file if self.storage_format == 'binary' else self.data_file
+
+    def file_signature(self):
+        """Cheap change check: (mtime, size) of the main file, None if missing"""
+        for path in (self.binary_file, self.data_file):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            return (path, st.st_mtime_ns, st.st_size)
+        return None
+
+    @staticmethod
+    def fingerprint(trans):
+        """Comparable form of a transaction for spotting edits"""
+        return json.dumps(trans, sort_keys=True)
+
+    def record_sync(self, hot, digest):
+        """Remember what the main file now holds as the base for later merges"""
+        self.synced_signature = self.file_signature()
+        self.synced_hash = digest
+        self.base = {
+            'transactions': {trans['id']: self.fingerprint(trans) for trans in hot},
+            'balances': {aid: balance for accounts in self.data['categories'].values()
+                         for aid, balance in accounts.items()},
+            'accounts': copy.deepcopy(self.data['accounts']),
+            'settings': copy.deepcopy({key: value for key, value in self.data.items()
+                                       if key not in LEDGER_MERGED_KEYS})
+        }
+
+    def check_external_changes(self):
+        """Merge in changes another instance saved since we last synced.
+
+        Only stats the file unless it changed. Returns the per-transaction
+        changes as {'added', 'removed', 'modified'} id lists, or None.
+        """
+        if self.file_signature() == self.synced_signature:
+            return None
+        with self.mutex:
+            if self.read_only:
+                changes = self.merge_external_changes()
+            else:
+                with LedgerLock(self.lock_file):
+                    changes = self.merge_external_changes()
+        if changes is not None:
+            self.events.publish([LedgerReloaded(changes)])
+        return changes
+
+    def merge_external_changes(self):
+        """Three-way merge of the main file on disk into memory.
+
+        Our changes since the last sync (memory vs base) are replayed on top
+        of the disk version: transactions by id, balances by delta, account
+        names and settings by whichever side changed them. New rows or
+        accounts whose id the other instance also used are renumbered.
+        """
+        old_hash = self.synced_hash
+        disk = self.read_main_file()
+        if disk is None or self.synced_hash == old_hash:
+            return None
+        disk = self.upgrade_data(disk)
+        base = self.base
+        local = self.data
+
+        # Accounts: keep our renames and new accounts, renumbering clashes
+        accounts = disk['accounts']
+        next_aid = max(disk['next_account_id'], local['next_account_id'])
+        account_map = {}
+        for aid, entry in local['accounts'].items():
+            if aid not in base['accounts']:
+                if aid in accounts and accounts[aid] != entry:
+                    account_map[aid] = f"a{next_aid}"
+                    next_aid += 1
+                accounts[account_map.get(aid, aid)] = dict(entry)
+            elif entry != base['accounts'][aid] and aid in accounts:
+                accounts[aid] = dict(entry)
+        disk['next_account_id'] = next_aid
+
+        # Balances: disk value plus our delta; drop accounts we deleted
+        balances = {aid: balance for group in disk['categories'].values()
+                    for aid, balance in group.items()}
+        local_balances = {aid: balance for group in local['categories'].values()
+                          for aid, balance in group.items()}
+        for group in disk['categories'].values():
+            for aid in list(group):
+                if aid in base['balances'] and aid not in local_balances:
+                    del group[aid]
+        for aid, balance in local_balances.items():
+            new_aid = account_map.get(aid, aid)
+            if aid not in base['balances']:
+                disk['categories'].setdefault(accounts[new_aid]['category'], {})[new_aid] = balance
+            elif aid in balances:
+                group = disk['categories'][accounts[aid]['category']]
+                group[aid] = balances[aid] + balance - base['balances'][aid]
+
+        # Transactions: only the hot rows are in the main file
+        cold = []
+        local_hot = {}
+        for trans in local['transactions']:
+            if self.is_cold(self.transaction_period(trans)):
+                cold.append(trans)
+            else:
+                local_hot[trans['id']] = trans
+        before = {tid: self.fingerprint(trans) for tid, trans in local_hot.items()}
+        for trans in local['transactions']:
+            if trans['account_id'] in account_map:
+                trans['account_id'] = account_map[trans['account_id']]
+
+        rows = {trans['id']: trans for trans in disk['transactions']}
+        next_id = max(disk['next_transaction_id'], local['next_transaction_id'])
+        for tid in base['transactions']:
+            if tid not in local_hot:
+                rows.pop(tid, None)
+        for tid, trans in local_hot.items():
+            if tid not in base['transactions']:
+                if tid in rows:
+                    trans['id'] = next_id
+                    next_id += 1
+                rows[trans['id']] = trans
+            elif tid in rows and before[tid] != base['transactions'][tid]:
+                rows[tid] = trans
+        disk['next_transaction_id'] = next_id
+        hot = sorted(rows.values(), key=lambda t: t['id'])
+        disk['transactions'] = list(heapq.merge(cold, hot, key=lambda t: t['id']))
+
+        changes = {
+            'added': [tid for tid in rows if tid not in before],
+            'removed': [tid for tid in before if tid not in rows],
+            'modified': [tid for tid in rows if tid in before and self.fingerprint(rows[tid]) != before[tid]]
+        }
+
+        # Settings: whichever side changed a key since the last sync wins
+        for key in set(local) | set(base['settings']):
+            if key in LEDGER_MERGED_KEYS or local.get(key) == base['settings'].get(key):
+                continue
+            if key in local:
+                disk[key] = local[key]
+            else:
+                disk.pop(key, None)
+        disk['budgets']['accounts'] = {account_map.get(aid, aid): limit
+                                       for aid, limit in disk['budgets']['accounts'].items()}
+        self.usd_to_lkr = disk['exchange_rate']
+
+        # The disk manifest is kept: archived months are written under the
+        # same lock, so it already lists every partition file
+        self.recount_budget_counters(disk)
+        self.data = disk
+        self.category_model = None
+        self.detector = None
+        self.completion_tries = None
+        self.sum_index = None
+        self.group_index = None
+        self.sort_indexes.clear()
+        self.backup_chunks = None
+        self.goal_tracker = None
+        self.record_sync(hot, self.synced_hash)
+        # Undo entries may refer to rows or balances that no longer match
+        self.undo_log.clear()
+        self.redo_log.clear()
+        self.version += 1
+        return changes
+
+    def set_storage(self, storage_format, codec='zlib', passphrase=None):
+        """Switch between JSON and the binary format, keeping the old file as .bak"""
+        if self.read_only:
+            raise LedgerReadOnlyError("This ledger is open read-only")
+        old_file = self.binary_file if self.storage_format == 'binary' else self.data_file
+        old_format, old_passphrase = self.storage_format, self.passphrase
+        self.storage_format = storage_format
+        self.codec = codec
+        self.passphrase = passphrase or None
+
+        # Re-encode the archive one partition at a time
+        for period in list(self.data['archive']):
+            rows = self.read_partition(period, old_format, old_passphrase)
+            old_path = self.partition_path(period, old_format)
+            self.write_partition(period, rows)
+            if old_path != self.partition_path(period):
+                os.remove(old_path)
+
+        self.save_data()
+
+        new_file = self.binary_file if storage_format == 'binary' else self.data_file
+        if old_file != new_file and os.path.exists(old_file):
+            os.replace(old_file, old_file + '.bak')
+
+    # --- Monthly archive partitions ---
+
+    def is_cold(self, period):
+        """True if a period belongs in the archive rather than the main file"""
+        return len(period) == 7 and period[4] == '-' and period < self.hot_cutoff
+
+    def partition_path(self, period, storage_format=None):
+        """Path of an archive partition file"""
+        ext = '.ftl' if (storage_format or self.storage_format) == 'binary' else '.json'
+        return os.path.join(self.archive_dir, period + ext)
+
+    def read_partition(self, period, storage_format=None, passphrase=None, rejected=None):
+        """Read one archived month from disk, in id order.
+
+        Rows that can't be read are appended to rejected or, without it,
+        set aside with the ledger's (see set_aside_transactions), so a month
+        written back from the rows returned loses nothing.
+        """
+        storage_format = storage_format or self.storage_format
+        path = self.partition_path(period, storage_format)
+        if storage_format == 'binary':
+            reader = LedgerFileReader(path, passphrase if passphrase is not None else self.passphrase)
+            try:
+                rows = reader.read_transactions()
+            finally:
+                reader.close()
+        else:
+            with open(path, 'r') as f:
+                rows = json.load(f)
+        if not isinstance(rows, list):
+            raise ValueError(f"{path}: Transactions must be a list of objects")
+        if self.data['archive'].get(period, {}).get('legacy_amounts'):
+            # Written before amounts were stored in minor units
+            for trans in rows:
+                try:
+                    usd = self.data['accounts'].get(trans.get('account_id'), {}).get('name') == 'Crypto $'
+                    trans['amount'] = to_minor(major_amount(trans), 'USD' if usd else 'LKR')
+                except (AttributeError, TypeError, ValueError):
+                    pass  # kept as it was, so coerce_transactions sets it aside
+        found = []
+        coerce_transactions(rows, found)
+        if rejected is not None:
+            rejected.extend(found)
+        elif found:
+            with self.mutex:
+                self.set_aside_transactions(self.data, found)
+        return rows
+
+    def write_partition(self, period, rows):
+        """Write one archived month and refresh its manifest entry"""
+        path = self.partition_path(period)
+        if not rows:
+            if os.path.exists(path):
+                os.remove(path)
+            self.data['archive'].pop(period, None)
+            return
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        if self.storage_format == 'binary':
+            write_ledger_file(path, {'period': period}, rows, self.transaction_period,
+                              self.codec, self.passphrase, self.kdf_salt)
+        else:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(rows, f, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+
+        amounts = array('q', (trans['amount'] for trans in rows))
+        by_account = {}
+        for trans, amount in zip(rows, amounts):
+            by_account[trans['account_id']] = by_account.get(trans['account_id'], 0) + amount
+        self.data['archive'][period] = {
+            'count': len(rows),
+            'total': sum(amounts),
+            'accounts': by_account
+        }
+
+    def recount_budget_counters(self, data):
+        """Rebuild this month's counters in data from its in-memory transactions"""
+        counters = data['budget_counters'] = {
+            'period': datetime.now().strftime('%Y-%m'),
+            'rule_categories': {},
+            'accounts': {}
+        }
+        for trans in data['transactions']:
+            self.update_budget_counters(trans, counters=counters)
+
+    def archive_cold_transactions(self):
+        """Move months that have left the hot window out of the main file"""
+        hot = []
+        cold = {}
+        for trans in self.data['transactions']:
+            period = self.transaction_period(trans)
+            if self.is_cold(period):
+                cold.setdefault(period, []).append(trans)
+            else:
+                hot.append(trans)
+        if not cold:
+            return
+
+        for period, rows in cold.items():
+            if period in self.data['archive']:
+                rows = list(heapq.merge(self.read_partition(period), rows, key=lambda t: t['id']))
+            self.write_partition(period, rows)
+        self.data['transactions'] = hot
+        self.save_data()
+
+    def unloaded_periods(self):
+        """Archived months not yet in memory, newest first"""
+        return sorted((p for p in self.data['archive'] if p not in self.loaded_periods), reverse=True)
+
+    def load_period(self, period):
+        """Merge one archived month into the in-memory transaction list"""
+        if period in self.loaded_periods:
+            return
+        self.loaded_periods.add(period)
+        if period in self.data['archive']:
+            rejected = []
+            rows = self.read_partition(period, rejected=rejected)
+            with self.mutex:
+                self.data['transactions'] = list(heapq.merge(self.data['transactions'], rows,
+                                                             key=lambda t: t['id']))
+                if rejected:
+                    # Kept in the main file from the next save on, which writes the month back without them
+                    self.set_aside_transactions(self.data, rejected)
+                    self.dirty_periods.add(period)
+                self.group_index = None
+                self.sort_indexes.clear()
+                self.track_loaded_rows(rows)
+                self.version += 1
+
+    def track_loaded_rows(self, rows):
+        """Add a month just read from the archive to the models built from the loaded rows"""
+        if self.detector is not None:
+            for trans in rows:
+                self.detector.add(trans)
+        if self.category_model is not None:
+            for trans in rows:
+                self.category_model.learn(trans['description'], trans.get('rule_category', '-'))
+        if self.completion_tries is not None:
+            descriptions = Counter(map(operator.itemgetter('description'), rows))
+            for description, count in descriptions.items():
+                self.completion_tries['description'].add(description, count=count)
+
+    def load_next_period(self):
+        """Load the newest archived month still on disk; returns it or None"""
+        unloaded = self.unloaded_periods()
+        if not unloaded:
+            return None
+        self.load_period(unloaded[0])
+        return unloaded[0]
+
+    def iter_transactions(self):
+        """Yield every transaction, streaming unloaded months from disk one at a time"""
+        yield from self.data['transactions']
+        for period in self.unloaded_periods():
+            yield from self.read_partition(period)
+
+    def touch_period(self, trans):
+        """Make sure a changed transaction's month is loaded and marked for saving"""
+        period = self.transaction_period(trans)
+        if self.is_cold(period):
+            self.load_period(period)
+            self.dirty_periods.add(period)
+
+    def calculate_totals(self):
+        """Calculate all totals, summed exactly in minor units and returned in LKR"""
+        cash_bank = sum(self.data['categories']['Cash & Bank'].values())
+
+        # Accounts with holdings count at market value instead of their balance
+        market = self.valuation()['accounts']
+        investments = {k: to_minor(market[k]['value'], self.account_currency(k)) if k in market else v
+                       for k, v in self.data['categories']['Crypto & Investments'].items()}
+        crypto_lkr = sum(v for k, v in investments.items() if not self.is_usd_account(k))
+        crypto_usd = sum(v for k, v in investments.items() if self.is_usd_account(k))
+        crypto_usd_lkr = to_minor(from_minor(crypto_usd, 'USD') * self.usd_to_lkr)
+        crypto_total = crypto_lkr + crypto_usd_lkr
+
+        upcoming = sum(self.data['categories']['Upcoming'].values())
+
+        real_total = cash_bank + crypto_total
+        total = real_total + upcoming
+
+        return {
+            'cash_bank': from_minor(cash_bank),
+            'crypto': from_minor(crypto_total),
+            'upcoming': from_minor(upcoming),
+            'real_total': from_minor(real_total),
+            'total': from_minor(total)
+        }
+
+    def rule_allocation(self):
+        """Target vs current amount for each allocation rule, keyed by rule"""
+        rules = self.data.get('rule_percentages', {
+            'growth': 25,
+            'stability': 15,
+            'essentials': 50,
+            'rewards': 10
+        })
+        totals = self.calculate_totals()
+        real_total = totals['real_total']
+
+        # Growth is what is already invested; the cash balance is pro-rated
+        # across the other rules by their share of the non-growth percentage
+        current = {'growth': totals['crypto']}
+        non_growth_rule_total = rules['stability'] + rules['essentials'] + rules['rewards']
+        for rule in ('stability', 'essentials', 'rewards'):
+            if non_growth_rule_total == 0:
+                current[rule] = 0
+            else:
+                current[rule] = totals['cash_bank'] * (rules[rule] / non_growth_rule_total)
+
+        allocation = {}
+        for rule in ('growth', 'stability', 'essentials', 'rewards'):
+            target = real_total * (rules[rule] / 100)
+            allocation[rule] = {
+                'percent': rules[rule],
+                'target': target,
+                'current': current[rule],
+                'difference': current[rule] - target,
+                'percent_current': (current[rule] / real_total * 100) if real_total > 0 else 0
+            }
+        return allocation
+
+    def daily_history(self):
+        """Real total (LKR) at the end of every day, oldest first, as (day ordinals, values) arrays.
+
+        Account balances run backwards from today's, undoing each day's
+        transactions. Loaded transactions count on their own date; archived
+        months still on disk are only known by their manifest totals, so
+        each counts on the month's last day. Accounts with holdings count at
+        market value, as in calculate_totals, on every day rather than only
+        today: each lot from its date, at that day's price (its cost before
+        the first price). Starts the day before the first transaction or
+        lot (at least 30 days back) and is cached until the ledger, the rate
+        or the prices change.
+        """
+        today = datetime.now().date().toordinal()
+        table = self.price_table()
+        key = (self.version, today, self.price_cache[0], self.usd_to_lkr)
+        if self.history_cache[0] == key:
+            return self.history_cache[1]
+
+        with self.mutex:
+            market = self.valuation()['accounts']
+            lots = [(date_ordinal(lot[0]) or today, symbol, lot[1], lot[2],
+                     self.usd_to_lkr if self.is_usd_account(aid) else 1.0)
+                    for aid in market for symbol, position in self.data['holdings'][aid].items()
+                    for lot in position]
+            real = {aid for category in ('Cash & Bank', 'Crypto & Investments')
+                    for aid in self.data['categories'][category] if aid not in market}
+            deltas = {}
+            for trans in self.data['transactions']:
+                day = date_ordinal(trans['date'])
+                if day is not None and trans['account_id'] in real:
+                    deltas[day] = deltas.get(day, 0.0) + self.to_lkr(trans['amount'], trans['account_id'])
+            for period in self.unloaded_periods():
+                year, month = int(period[:4]), int(period[5:])
+                day = (datetime(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).toordinal()
+                for aid, total in self.data['archive'][period]['accounts'].items():
+                    if aid in real:
+                        deltas[day] = deltas.get(day, 0.0) + self.to_lkr(total, aid)
+            balance = sum(self.to_lkr(self.data['categories'][self.account_category(aid)][aid], aid)
+                          for aid in real)
+
+        first = min(min(deltas, default=today), min((lot[0] for lot in lots), default=today), today - 29) - 1
+        # Transactions dated in the future are already in today's balances
+        balance -= sum(delta for day, delta in deltas.items() if day > today)
+        values = array('d', bytes(8 * (today - first + 1)))
+        for i in range(today - first, -1, -1):
+            values[i] = balance
+            balance -= deltas.get(first + i, 0.0)
+
+        # Each symbol's price on every day, 0 before its first price
+        prices = {}
+        for symbol in {lot[1] for lot in lots}:
+            days, quotes = table.get(symbol, ([], []))
+            series = prices[symbol] = array('d', bytes(8 * len(values)))
+            j = 0
+            for i in range(len(values)):
+                while j < len(days) and days[j] <= first + i:
+                    j += 1
+                series[i] = quotes[j - 1] if j else 0.0
+        for day, symbol, quantity, unit_cost, fx in lots:
+            series = prices[symbol]
+            for i in range(max(day - first, 0), len(values)):
+                values[i] += quantity * (series[i] or unit_cost) * fx
+        history = (array('l', range(first, today + 1)), values)
+        self.history_cache = (key, history)
+        return history
+
+    def chart_series(self, days=30):
+        """Daily real totals for the last days, oldest first, as (date, value)"""
+        history_days, values = self.daily_history()
+        return [(datetime.fromordinal(day).date(), value)
+                for day, value in zip(history_days[-days:], values[-days:])]
+
+    def transaction_count(self):
+        """Number of transactions, including archived months not yet loaded"""
+        return len(self.data['transactions']) + sum(
+            self.data['archive'][period]['count'] for period in self.unloaded_periods())
+
+    def account_name(self, aid):
+        """Return the display name of an account id"""
+        return self.data['accounts'][aid]['name']
+
+    def account_category(self, aid):
+        """Return the category holding an account, or None if it was deleted"""
+        category = self.data['accounts'][aid]['category']
+        if category is not None and aid in self.data['categories'].get(category, {}):
+            return category
+        return None
+
+    def is_usd_account(self, aid):
+        """The 'Crypto $' account is held in USD"""
+        return self.account_name(aid) == 'Crypto $'
+
+    def account_currency(self, aid):
+        """Currency code of an account's balance and transactions"""
+        return 'USD' if self.is_usd_account(aid) else 'LKR'
+
+    def to_lkr(self, units, aid):
+        """An account's minor units as an LKR amount, at the current rate for USD"""
+        if self.is_usd_account(aid):
+            return from_minor(units, 'USD') * self.usd_to_lkr
+        return from_minor(units)
+
+    def convert_units(self, units, source, target):
+        """Minor units of one account's currency in another account's, at the current rate"""
+        if self.account_currency(source) == self.account_currency(target):
+            return units
+        return to_minor(self.to_lkr(units, source) / (self.usd_to_lkr if self.is_usd_account(target) else 1),
+                        self.account_currency(target))
+
+    def transaction_period(self, trans):
+        """Return the 'YYYY-MM' period a transaction belongs to"""
+        return date_period(trans.get('date')) or trans.get('timestamp', '')[:7]
+
+    def roll_budget_period(self):
+        """Reset the month-to-date counters when a new month starts"""
+        counters = self.data['budget_counters']
+        current = datetime.now().strftime('%Y-%m')
+        if counters['period'] != current:
+            counters['period'] = current
+            counters['rule_categories'] = {}
+            counters['accounts'] = {}
+
+    def update_budget_counters(self, trans, sign=1, counters=None):
+        """Add (sign=1) or remove (sign=-1) a transaction's spend from the counters.
+
+        Uses the ledger's own counters unless others are given.
+        """
+        if counters is None:
+            self.roll_budget_period()
+            counters = self.data['budget_counters']
+        if (trans['amount'] >= 0 or trans.get('adjustment') or trans.get('transfer')
+                or self.transaction_period(trans) != counters['period']):
+            return
+
+        spend = -trans['amount'] * sign
+        rule_cat = trans.get('rule_category', '-')
+        if rule_cat != '-':
+            by_rule = counters['rule_categories']
+            by_rule[rule_cat] = by_rule.get(rule_cat, 0) + spend
+        by_account = counters['accounts']
+        by_account[trans['account_id']] = by_account.get(trans['account_id'], 0) + spend
+
+    def get_budget_status(self):
+        """Return (kind, name, limit, spent) for every budget this month"""
+        self.roll_budget_period()
+        status = []
+        for kind in ('rule_categories', 'accounts'):
+            spent = self.data['budget_counters'][kind]
+            for name, limit in self.data['budgets'][kind].items():
+                status.append((kind, name, limit, spent.get(name, 0)))
+        return status
+
+    # --- Undoable mutation layer ---
+    # Every change to the ledger is expressed as a list of primitive ops.
+    # Applying an op returns the op that reverses it, so the undo/redo logs
+    # only hold small inverse deltas instead of copies of self.data.
+
+    def execute(self, label, ops):
+        """Apply a command and record its inverse for undo"""
+        if self.read_only:
+            raise LedgerReadOnlyError("This ledger is open read-only")
+        self.undo_log.append((label, self.replay(ops)))
+        self.redo_log.clear()
+
+    def undo(self):
+        """Revert the last command, returning its label (None if nothing to undo)"""
+        if not self.undo_log:
+            return None
+        label, ops = self.undo_log.pop()
+        self.redo_log.append((label, self.replay(ops)))
+        return label
+
+    def redo(self):
+        """Re-apply the last undone command, returning its label"""
+        if not self.redo_log:
+            return None
+        label, ops = self.redo_log.pop()
+        self.undo_log.append((label, self.replay(ops)))
+        return label
+
+    def replay(self, ops):
+        """Apply ops in order and return their inverses in reverse order"""
+        with self.mutex:
+            inverse = [self.apply_op(op) for op in ops]
+            self.version += 1
+            events, self.pending_events = self.pending_events, []
+            # Derived models follow each batch here rather than through the
+            # coalesced UI delivery, so every event is applied against the
+            # transaction state it describes
+            self.mark_backup_blocks(events)
+            self.learn_categories(events)
+            self.track_anomalies(events)
+            self.track_completions(events)
+            self.track_goals(events)
+        self.events.publish(events)
+        inverse.reverse()
+        return inverse
+
+    def apply_op(self, op):
+        """Apply one primitive op and return the op that reverses it"""
+        kind = op[0]
+
+        if kind == 'set_balance':
+            _, aid, value = op
+            accounts = self.data['categories'][self.data['accounts'][aid]['category']]
+            old = accounts[aid]
+            accounts[aid] = value
+            self.pending_events.append(BalanceEdited(aid, old, value))
+            return ('set_balance', aid, old)
+
+        if kind == 'insert_transactions':
+            for trans in op[1]:
+                self.touch_period(trans)
+            transactions = self.data['transactions']
+            if len(op[1]) <= 32:
+                for trans in op[1]:
+                    transactions.insert(self.transaction_position(trans['id']), trans)
+            else:
+                # Both runs are id-ordered, so this is a linear merge
+                self.data['transactions'] = list(heapq.merge(transactions, op[1],
+                                                             key=lambda t: t['id']))
+                self.sort_indexes.clear()
+            for trans in op[1]:
+                self.update_budget_counters(trans)
+                self.update_account_sums(trans)
+                self.update_group_index(trans)
+                self.update_sort_indexes(trans)
+                self.pending_events.append(TransactionAdded(trans))
+            return ('remove_transactions', [trans['id'] for trans in op[1]])
+
+        if kind == 'remove_transactions':
+            transactions = self.data['transactions']
+            positions = self.transaction_positions(op[1])
+            removed = [transactions[i] for i in sorted(positions.values())]
+            if len(removed) > 32:
+                self.sort_indexes.clear()
+            for trans in removed:
+                self.touch_period(trans)
+                self.update_budget_counters(trans, -1)
+                self.update_account_sums(trans, -1)
+                self.update_group_index(trans, -1)
+                self.update_sort_indexes(trans, -1)
+                self.pending_events.append(TransactionDeleted(trans))
+            if len(positions) == 1:
+                transactions.pop(next(iter(positions.values())))
+            else:
+                ids = set(positions)
+                self.data['transactions'] = [t for t in transactions if t['id'] not in ids]
+            return ('insert_transactions', removed)
+
+        if kind == 'update_transactions':
+            transactions = self.data['transactions']
+            positions = self.transaction_positions([tid for tid, _ in op[1]])
+            if len(positions) > 32:
+                self.sort_indexes.clear()
+            previous = []
+            for tid, changes in op[1]:
+                trans = transactions[positions[tid]]
+                previous.append((tid, {key: trans.get(key) for key in changes}))
+                self.touch_period(trans)
+                self.update_budget_counters(trans, -1)
+                self.update_account_sums(trans, -1)
+                self.update_sort_indexes(trans, -1)
+                trans.update(changes)
+                self.update_budget_counters(trans)
+                self.update_account_sums(trans)
+                self.update_sort_indexes(trans)
+                self.pending_events.append(TransactionUpdated(trans, changes, previous[-1][1]))
+            return ('update_transactions', previous)
+
+        if kind == 'add_account':
+            _, aid, balance, position = op
+            category = self.data['accounts'][aid]['category']
+            items = list(self.data['categories'][category].items())
+            items.insert(position, (aid, balance))
+            self.data['categories'][category] = dict(items)
+            self.pending_events.append(AccountAdded(aid))
+            return ('remove_account', aid)
+
+        if kind == 'remove_account':
+            aid = op[1]
+            accounts = self.data['categories'][self.data['accounts'][aid]['category']]
+            position = list(accounts).index(aid)
+            balance = accounts.pop(aid)
+            self.pending_events.append(AccountDeleted(aid))
+            return ('add_account', aid, balance, position)
+
+        if kind == 'rename_account':
+            _, aid, new_name = op
+            entry = self.data['accounts'][aid]
+            old_name = entry['name']
+            entry['name'] = new_name
+            self.drop_sort_indexes('account')
+            if 'Crypto $' in (old_name, new_name):
+                # The name decides the currency
+                self.drop_sort_indexes('amount')
+            self.pending_events.append(AccountRenamed(aid, old_name, new_name))
+            return ('rename_account', aid, old_name)
+
+        if kind == 'set_budget':
+            _, budget_kind, name, limit = op
+            budgets = self.data['budgets'][budget_kind]
+            old = budgets.pop(name, None)
+            if limit is not None:
+                budgets[name] = limit
+            self.pending_events.append(BudgetChanged(budget_kind, name, limit))
+            return ('set_budget', budget_kind, name, old)
+
+        if kind == 'set_setting':
+            _, key, value = op
+            old = self.data.get(key)
+            if value is None:
+                self.data.pop(key, None)
+            else:
+                self.data[key] = value
+            if key == 'exchange_rate':
+                self.usd_to_lkr = value
+                self.drop_sort_indexes('amount')
+                self.pending_events.append(RateChanged(old, value))
+            elif key == 'rule_percentages':
+                self.pending_events.append(RulesChanged(value))
+            else:
+                self.pending_events.append(SettingChanged(key, value))
+            return ('set_setting', key, old)
+
+        if kind == 'set_entry':
+            # One entry of a setting keyed by account or goal id, so the
+            # inverse holds that entry rather than a copy of the whole setting
+            _, key, name, value = op
+            entries = self.data.setdefault(key, {})
+            old = entries.get(name)
+            if value is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = value
+            if not entries:
+                del self.data[key]
+            self.pending_events.append(SettingChanged(key, self.data.get(key)))
+            return ('set_entry', key, name, old)
+
+        raise ValueError(f"Unknown ledger op: {kind}")
+
+    def transaction_position(self, tid):
+        """Binary search the id-ordered transaction list for an insert position"""
+        transactions = self.data['transactions']
+        lo, hi = 0, len(transactions)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if transactions[mid]['id'] < tid:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def transaction_positions(self, ids):
+        """Map transaction ids to their list positions"""
+        transactions = self.data['transactions']
+        if len(ids) <= 32:
+            positions = {}
+            for tid in ids:
+                i = self.transaction_position(tid)
+                if i < len(transactions) and transactions[i]['id'] == tid:
+                    positions[tid] = i
+            return positions
+
+        wanted = set(ids)
+        return {trans['id']: i for i, trans in enumerate(transactions) if trans['id'] in wanted}
+
+    def find_transactions(self, ids):
+        """Return the transactions with the given ids, in ledger order"""
+        transactions = self.data['transactions']
+        return [transactions[i] for i in sorted(self.transaction_positions(ids).values())]
+
+    # --- Sort indexes ---
+
+    def sort_key(self, columns, trans):
+        """A transaction's key in the sort index for columns; the id breaks ties"""
+        return tuple(SORT_COLUMNS[column](self, trans) for column in columns) + (trans['id'],)
+
+    def sort_index(self, columns):
+        """Sorted keys of the loaded transactions for a tuple of SORT_COLUMNS.
+
+        Built once per order, then kept current by apply_op with bisect
+        inserts and removals, so re-sorting never rescans the ledger.
+        """
+        index = self.sort_indexes.get(columns)
+        if index is None:
+            transactions = self.data['transactions']
+            keys = [[get(self, trans) for trans in transactions] for get in map(SORT_COLUMNS.get, columns)]
+            index = list(zip(*keys, [trans['id'] for trans in transactions]))
+            index.sort()
+            self.sort_indexes[columns] = index
+            while len(self.sort_indexes) > SORT_INDEX_CACHE:
+                self.sort_indexes.popitem(last=False)
+        else:
+            self.sort_indexes.move_to_end(columns)
+        return index
+
+    def drop_sort_indexes(self, column):
+        """Forget the sort indexes using a column whose keys changed; they are rebuilt on next use"""
+        for columns in [columns for columns in self.sort_indexes if column in columns]:
+            del self.sort_indexes[columns]
+
+    def update_sort_indexes(self, trans, sign=1):
+        """Insert (sign=1) or remove (sign=-1) a transaction in every built sort index"""
+        for columns, index in self.sort_indexes.items():
+            key = self.sort_key(columns, trans)
+            if sign > 0:
+                insort(index, key)
+            else:
+                i = bisect_left(index, key)
+                if i < len(index) and index[i] == key:
+                    del index[i]
+
+    def sorted_transactions(self, columns, descending, start, stop):
+        """Rows start..stop of the loaded transactions in a sort order.
+
+        With no columns the order is by id (newest first when descending).
+        Only the requested window is materialized.
+        """
+        transactions = self.data['transactions']
+        index = self.sort_index(tuple(columns)) if columns else transactions
+        n = len(index)
+        if descending:
+            window = index[max(n - stop, 0):max(n - start, 0)][::-1]
+        else:
+            window = index[start:stop]
+        if not columns:
+            return window
+        return [transactions[self.transaction_position(key[-1])] for key in window]
+
+    def balance_ops(self, deltas):
+        """Turn accumulated per-account balance changes into set_balance ops"""
+        ops = []
+        for aid, delta in deltas.items():
+            category = self.account_category(aid)
+            if category and delta:
+                balance = self.data['categories'][category][aid]
+                ops.append(('set_balance', aid, balance + delta))
+        return ops
+
+    # --- Ledger operations ---
+
+    def allocate_ids(self, count=1):
+        """Reserve count consecutive transaction ids and return the first.
+
+        Under the mutex so a background save never sees the counter
+        half-updated.
+        """
+        with self.mutex:
+            first = self.data['next_transaction_id']
+            self.data['next_transaction_id'] += count
+        return first
+
+    def add_transaction(self, trans):
+        """Add a transaction and apply it to its account; returns False if the account is unknown.
+
+        A transaction without a rule_category is categorized automatically.
+        """
+        category = self.account_category(trans['account_id'])
+        if not category:
+            return False
+        if 'rule_category' not in trans:
+            trans['rule_category'] = self.categorizer().classify(trans['description'])
+
+        trans['id'] = self.allocate_ids()
+
+        balance = self.data['categories'][category][trans['account_id']]
+        self.execute("Add transaction", [
+            ('set_balance', trans['account_id'], balance + trans['amount']),
+            ('insert_transactions', [trans])
+        ])
+        return True
+
+    def import_transactions(self, rows):
+        """Add many transactions as one command, categorizing untagged ones; returns how many were added"""
+        rows = [trans for trans in rows if self.account_category(trans['account_id'])]
+        untagged = [trans for trans in rows if 'rule_category' not in trans]
+        categories = self.categorizer().classify_many([trans['description'] for trans in untagged])
+        for trans, rule_category in zip(untagged, categories):
+            trans['rule_category'] = rule_category
+
+        deltas = {}
+        first = self.allocate_ids(len(rows))
+        for i, trans in enumerate(rows):
+            trans['id'] = first + i
+            deltas[trans['account_id']] = deltas.get(trans['account_id'], 0) + trans['amount']
+        if rows:
+            self.execute("Import transactions", self.balance_ops(deltas) + [('insert_transactions', rows)])
+        return len(rows)
+
+    def delete_transactions(self, ids):
+        """Delete transactions and reverse their amounts in one command.
+
+        Deleting one leg of a transfer or split deletes all of its legs.
+        """
+        ids = self.with_linked_legs(ids)
+        deltas = {}
+        for trans in self.find_transactions(ids):
+            aid = trans['account_id']
+            deltas[aid] = deltas.get(aid, 0) - trans['amount']
+
+        self.execute("Delete transactions",
+                     [('remove_transactions', list(ids))] + self.balance_ops(deltas))
+
+    def retag_transactions(self, ids, rule_category):
+        """Set the rule category of several transactions in one command"""
+        changes = [(tid, {'rule_category': rule_category}) for tid in ids]
+        self.execute("Re-tag transactions", [('update_transactions', changes)])
+
+    def move_transactions(self, ids, target):
+        """Move transactions to another account in one command.
+
+        Moving into an account in another currency converts each amount
+        at the current exchange rate, as a transfer does.
+        """
+        deltas = {}
+        changes = []
+        for trans in self.find_transactions(ids):
+            aid = trans['account_id']
+            if aid != target:
+                amount = self.convert_units(trans['amount'], aid, target)
+                deltas[aid] = deltas.get(aid, 0) - trans['amount']
+                deltas[target] = deltas.get(target, 0) + amount
+                change = {'account_id': target}
+                if amount != trans['amount']:
+                    change['amount'] = amount
+                changes.append((trans['id'], change))
+
+        self.execute("Move transactions",
+                     [('update_transactions', changes)] + self.balance_ops(deltas))
+
+    # --- Multi-leg postings ---
+
+    def add_posting(self, date, description, legs, label="Add posting"):
+        """Post one transaction made of several legs; returns the leg ids.
+
+        Each leg is {'account_id', 'amount', optional 'rule_category'} and is
+        stored as its own row, so per-account and per-category aggregates
+        update leg by leg. The legs share a 'group' id and every balance is
+        applied in the same command. Legs in more than one account form a
+        transfer, which is not income or spending and skips the budgets.
+        """
+        if len(legs) < 2:
+            raise ValueError("A posting needs at least two legs")
+        for leg in legs:
+            if leg['account_id'] not in self.data['accounts'] or not self.account_category(leg['account_id']):
+                raise ValueError(f"Unknown account {leg['account_id']}")
+        transfer = len({leg['account_id'] for leg in legs}) > 1
+
+        # Random rather than counted, so groups from two instances never clash on merge
+        group = os.urandom(8).hex()
+        timestamp = datetime.now().isoformat()
+        rows = []
+        deltas = {}
+        first = self.allocate_ids(len(legs))
+        for i, leg in enumerate(legs):
+            trans = {
+                'id': first + i,
+                'date': date,
+                'account_id': leg['account_id'],
+                'description': description,
+                'amount': leg['amount'],
+                'rule_category': leg.get('rule_category') or '-',
+                'timestamp': timestamp,
+                'group': group
+            }
+            if transfer:
+                trans['transfer'] = True
+            rows.append(trans)
+            deltas[leg['account_id']] = deltas.get(leg['account_id'], 0) + leg['amount']
+
+        self.execute(label, self.balance_ops(deltas) + [('insert_transactions', rows)])
+        return [trans['id'] for trans in rows]
+
+    def transfer(self, source, target, amount, date, description=None):
+        """Move amount (minor units of the source account) between two accounts.
+
+        Between LKR and USD accounts the target leg is converted at the
+        current exchange rate.
+        """
+        if source == target:
+            raise ValueError("Choose two different accounts")
+        received = self.convert_units(amount, source, target)
+        description = description or f"Transfer {self.account_name(source)} → {self.account_name(target)}"
+        return self.add_posting(date, description, [
+            {'account_id': source, 'amount': -amount},
+            {'account_id': target, 'amount': received}
+        ], "Transfer")
+
+    def split(self, aid, date, description, parts):
+        """Post one account's transaction split across rule categories ({category: amount})"""
+        legs = [{'account_id': aid, 'amount': amount, 'rule_category': category}
+                for category, amount in parts.items() if amount]
+        return self.add_posting(date, description, legs, "Split transaction")
+
+    def linked_legs(self, group):
+        """Ids of the loaded legs of a posting"""
+        if self.group_index is None:
+            index = {}
+            for trans in self.data['transactions']:
+                if 'group' in trans:
+                    index.setdefault(trans['group'], set()).add(trans['id'])
+            self.group_index = index
+        return self.group_index.get(group, set())
+
+    def update_group_index(self, trans, sign=1):
+        """Add (sign=1) or remove (sign=-1) a leg from the group index"""
+        if self.group_index is not None and 'group' in trans:
+            legs = self.group_index.setdefault(trans['group'], set())
+            if sign > 0:
+                legs.add(trans['id'])
+            else:
+                legs.discard(trans['id'])
+                if not legs:
+                    del self.group_index[trans['group']]
+
+    def with_linked_legs(self, ids):
+        """The given ids plus every other leg of the postings they belong to"""
+        ids = set(ids)
+        for trans in self.find_transactions(ids):
+            if 'group' in trans:
+                ids |= self.linked_legs(trans['group'])
+        return ids
+
+    def edit_balance(self, aid, value):
+        """Overwrite an account balance"""
+        self.execute("Edit balance", [('set_balance', aid, value)])
+
+    def reconcile(self, aid, statement):
+        """Match an account to its statement balance (minor units); returns the adjustment posted.
+
+        The gap between the statement and the sum of the account's
+        transactions is posted as an adjustment transaction, so the
+        transaction history adds up to the balance again.
+        """
+        adjustment = statement - self.transaction_sums().get(aid, 0)
+        today = datetime.now()
+        ops = [('set_balance', aid, statement)]
+        if adjustment:
+            trans = {
+                'id': self.allocate_ids(),
+                'date': today.strftime('%B %d, %Y'),
+                'account_id': aid,
+                'description': "Reconciliation adjustment",
+                'amount': adjustment,
+                'rule_category': '-',
+                'timestamp': today.isoformat(),
+                'adjustment': True
+            }
+            ops.append(('insert_transactions', [trans]))
+        record = {'date': today.strftime('%Y-%m-%d'), 'statement': statement}
+        ops.append(('set_entry', 'reconciliations', aid, record))
+        self.execute("Reconcile account", ops)
+        return adjustment
+
+    def add_account(self, category, name):
+        """Add an empty account at the end of a category and return its id"""
+        with self.mutex:
+            aid = f"a{self.data['next_account_id']}"
+            self.data['next_account_id'] += 1
+            self.data['accounts'][aid] = {'name': name, 'category': category}
+            position = len(self.data['categories'][category])
+        self.execute("Add account", [('add_account', aid, 0, position)])
+        return aid
+
+    def delete_account(self, aid):
+        """Delete an account together with its budget.
+
+        The id stays in the name table so the account's transactions
+        keep displaying its name.
+        """
+        ops = [('remove_account', aid)]
+        if aid in self.data['budgets']['accounts']:
+            ops.append(('set_budget', 'accounts', aid, None))
+        self.execute("Delete account", ops)
+
+    def rename_account(self, aid, new_name):
+        """Rename an account; transactions reference the id so nothing else changes"""
+        self.execute("Rename account", [('rename_account', aid, new_name)])
+
+    def set_rule_percentages(self, rules):
+        """Replace the allocation rule percentages"""
+        self.execute("Update rule percentages", [('set_setting', 'rule_percentages', rules)])
+
+    def set_exchange_rate(self, rate):
+        """Change the USD to LKR exchange rate"""
+        self.execute("Update exchange rate", [('set_setting', 'exchange_rate', rate)])
+
+    def set_category_rules(self, rules):
+        """Replace the auto-categorization rules ([pattern, rule category] pairs)"""
+        self.execute("Update categorization rules", [('set_setting', 'category_rules', rules)])
+
+    def auto_categorize(self):
+        """Tag every loaded untagged transaction the categorizer can place; returns how many changed"""
+        untagged = [trans for trans in self.data['transactions'] if trans.get('rule_category', '-') == '-']
+        categories = self.categorizer().classify_many([trans['description'] for trans in untagged])
+        updates = [(trans['id'], {'rule_category': rule_category})
+                   for trans, rule_category in zip(untagged, categories) if rule_category != '-']
+        if updates:
+            self.execute("Auto-categorize transactions", [('update_transactions', updates)])
+        return len(updates)
+
+    # --- Auto-categorization ---
+
+    def categorizer(self):
+        """The auto-categorizer, trained on the loaded transactions the first time it is needed.
+
+        Archived months are learned as they load rather than read from
+        disk here, since the first use is usually a quick entry on the Tk
+        thread.
+        """
+        if self.category_model is None:
+            model = Categorizer(self.data.get('category_rules', DEFAULT_CATEGORY_RULES))
+            for trans in self.data['transactions']:
+                model.learn(trans['description'], trans.get('rule_category', '-'))
+            self.category_model = model
+        return self.category_model
+
+    # --- Investment holdings ---
+
+    def set_holdings(self, label, aid, symbol, lots):
+        """Replace one position's lots as an undoable command (no lots removes it)"""
+        positions = copy.deepcopy(self.data.get('holdings', {}).get(aid, {}))
+        if lots:
+            positions[symbol] = lots
+        else:
+            positions.pop(symbol, None)
+        self.execute(label, [('set_entry', 'holdings', aid, positions or None)])
+
+    def buy(self, aid, symbol, quantity, unit_cost, date):
+        """Add a lot to a position"""
+        lots = list(self.data.get('holdings', {}).get(aid, {}).get(symbol, []))
+        lots.append([date, quantity, unit_cost])
+        lots.sort(key=lambda lot: date_ordinal(lot[0]) or 0)
+        self.set_holdings("Buy " + symbol, aid, symbol, lots)
+
+    def sell(self, aid, symbol, quantity):
+        """Sell from a position's oldest lots first; returns the cost basis sold"""
+        lots = copy.deepcopy(self.data.get('holdings', {}).get(aid, {}).get(symbol, []))
+        if quantity > sum(lot[1] for lot in lots) + 1e-9:
+            raise ValueError(f"Only {sum(lot[1] for lot in lots):g} {symbol} held")
+        sold_cost = 0.0
+        while quantity > 1e-12 and lots:
+            used = min(quantity, lots[0][1])
+            sold_cost += used * lots[0][2]
+            lots[0][1] -= used
+            quantity -= used
+            if lots[0][1] <= 1e-12:
+                lots.pop(0)
+        self.set_holdings("Sell " + symbol, aid, symbol, lots)
+        return sold_cost
+
+    def set_dashboard_renderer(self, renderer):
+        """Choose how the dashboard draws account rows: 'auto', 'widgets' or 'canvas'"""
+        self.execute("Set dashboard renderer", [('set_setting', 'dashboard_renderer', renderer)])
+
+    def set_price_file(self, path):
+        """Use a date,symbol,price CSV as the price table"""
+        self.execute("Set price file", [('set_setting', 'price_file', path)])
+
+    def price_signature(self):
+        """(path, mtime, size) of the price CSV, or None without a readable one"""
+        path = self.data.get('price_file')
+        try:
+            st = os.stat(path) if path else None
+        except OSError:
+            st = None
+        return (path, st.st_mtime_ns, st.st_size) if st else None
+
+    def price_table(self):
+        """The price table, re-read only when the CSV changes"""
+        path = self.data.get('price_file')
+        signature = self.price_signature()
+        if signature != self.price_cache[0]:
+            table = {}
+            if signature:
+                try:
+                    table = read_price_csv(path)
+                except (OSError, UnicodeDecodeError, csv.Error):
+                    table = {}
+            self.price_cache = (signature, table)
+        return self.price_cache[1]
+
+    def valuation(self):
+        """Market value, unrealized P/L and time-weighted return of every holding.
+
+        Positions are flattened into columns and valued in one pass; a
+        position without a price counts at cost. Returns per-position
+        rows, per-account sums (account currency) and portfolio totals
+        in LKR. Cached until the ledger or the price file changes.
+        """
+        table = self.price_table()
+        key = (self.version, self.price_cache[0], self.usd_to_lkr)
+        if self.valuation_cache[0] == key:
+            return self.valuation_cache[1]
+
+        # One column entry per position
+        accounts, symbols, first_days = [], [], []
+        quantity, cost = array('d'), array('d')
+        for aid, positions in self.data.get('holdings', {}).items():
+            if self.account_category(aid) != 'Crypto & Investments':
+                continue
+            for symbol, lots in positions.items():
+                accounts.append(aid)
+                symbols.append(symbol)
+                first_days.append(min((date_ordinal(lot[0]) or 0) for lot in lots))
+                quantity.append(sum(lot[1] for lot in lots))
+                cost.append(sum(lot[1] * lot[2] for lot in lots))
+
+        today = datetime.now().toordinal()
+        price = array('d', (price_on(table, symbol, today) or -1.0 for symbol in symbols))
+        start = array('d', (price_on(table, symbol, day) or -1.0 for symbol, day in zip(symbols, first_days)))
+        priced = [p > 0 for p in price]
+        value = array('d', (v if ok else c for v, c, ok in zip(map(operator.mul, quantity, price), cost, priced)))
+        pl = array('d', map(operator.sub, value, cost))
+        fx = array('d', (self.usd_to_lkr if self.is_usd_account(aid) else 1.0 for aid in accounts))
+
+        rows = []
+        by_account = {}
+        for i, aid in enumerate(accounts):
+            twr = price[i] / start[i] - 1 if priced[i] and start[i] > 0 else None
+            rows.append({'account_id': aid, 'symbol': symbols[i], 'quantity': quantity[i], 'cost': cost[i],
+                         'price': price[i] if priced[i] else None, 'value': value[i], 'pl': pl[i], 'twr': twr})
+            totals = by_account.setdefault(aid, {'value': 0.0, 'cost': 0.0, 'pl': 0.0})
+            totals['value'] += value[i]
+            totals['cost'] += cost[i]
+            totals['pl'] += pl[i]
+
+        result = {
+            'holdings': rows,
+            'accounts': by_account,
+            'value': sum(map(operator.mul, value, fx)),
+            'cost': sum(map(operator.mul, cost, fx)),
+            'pl': sum(map(operator.mul, pl, fx)),
+            'twr': self.portfolio_twr(table, fx, today)
+        }
+        self.valuation_cache = (key, result)
+        return result
+
+    def portfolio_twr(self, table, fx, today):
+        """Time-weighted return of the priced holdings, chain-linked between purchases.
+
+        Each lot date starts a sub-period; its return is the change in value
+        of what was held, so the size and timing of purchases do not count.
+        """
+        lots = []
+        for aid, positions in self.data.get('holdings', {}).items():
+            if self.account_category(aid) != 'Crypto & Investments':
+                continue
+            rate = self.usd_to_lkr if self.is_usd_account(aid) else 1.0
+            for symbol, position in positions.items():
+                if symbol in table:
+                    lots.extend((date_ordinal(lot[0]) or 0, symbol, lot[1] * rate) for lot in position)
+        if not lots:
+            return None
+        lots.sort()
+
+        growth = 1.0
+        held = {}
+        i = 0
+        while i < len(lots):
+            day = lots[i][0]
+            while i < len(lots) and lots[i][0] == day:
+                held[lots[i][1]] = held.get(lots[i][1], 0) + lots[i][2]
+                i += 1
+            end = lots[i][0] if i < len(lots) else today
+            begin_value = sum(q * (price_on(table, sym, day) or 0) for sym, q in held.items())
+            end_value = sum(q * (price_on(table, sym, end) or 0) for sym, q in held.items())
+            if begin_value > 0:
+                growth *= end_value / begin_value
+        return growth - 1
+
+    # --- Reconciliation ---
+
+    def transaction_sums(self):
+        """Account id -> sum of its transaction amounts, including archived months.
+
+        Built once from the archive manifest and the loaded rows, then kept
+        current by apply_op, so reading it never rescans the history.
+        """
+        if self.sum_index is None:
+            sums = {}
+            for period, entry in self.data['archive'].items():
+                if period not in self.loaded_periods:
+                    for aid, total in entry['accounts'].items():
+                        sums[aid] = sums.get(aid, 0) + total
+            for trans in self.data['transactions']:
+                sums[trans['account_id']] = sums.get(trans['account_id'], 0) + trans['amount']
+            self.sum_index = sums
+        return self.sum_index
+
+    def update_account_sums(self, trans, sign=1):
+        """Add (sign=1) or remove (sign=-1) a transaction from the running sums"""
+        if self.sum_index is not None:
+            aid = trans['account_id']
+            self.sum_index[aid] = self.sum_index.get(aid, 0) + sign * trans['amount']
+
+    def reconciliation_status(self, aid):
+        """Compare an account's balance with its transactions and last statement"""
+        balance = self.data['categories'][self.account_category(aid)][aid]
+        derived = self.transaction_sums().get(aid, 0)
+        record = self.data.get('reconciliations', {}).get(aid)
+        return {
+            'balance': balance,
+            'derived': derived,
+            'difference': balance - derived,
+            'statement': record['statement'] if record else None,
+            'date': record['date'] if record else None,
+            'reconciled': bool(record) and balance == record['statement'] == derived
+        }
+
+    # --- Backups ---
+
+    def backup_keys(self, passphrase):
+        """Chunk encryption keys for a passphrase (None without one).
+
+        The salt is kept with the backups so every snapshot made with the
+        same passphrase derives the same keys and can share chunks.
+        """
+        if not passphrase:
+            return None
+        salt_file = os.path.join(self.backup_dir, 'salt')
+        if not os.path.exists(salt_file):
+            os.makedirs(self.backup_dir, exist_ok=True)
+            with open(salt_file, 'wb') as f:
+                f.write(os.urandom(16))
+        with open(salt_file, 'rb') as f:
+            return derive_keys(passphrase, f.read(), LEDGER_KDF_ITERATIONS)
+
+    def chunk_path(self, chunk):
+        """Path of a backup chunk, fanned out by its first two hex digits"""
+        return os.path.join(self.backup_dir, 'chunks', chunk[:2], chunk)
+
+    def write_chunk(self, content, keys):
+        """Store content unless an identical chunk exists; returns the chunk id.
+
+        Ids are SHA-256 digests, keyed with the MAC key when encrypting so
+        they reveal nothing about the content.
+        """
+        if keys:
+            chunk = hmac.new(keys[1], content, hashlib.sha256).hexdigest()
+        else:
+            chunk = hashlib.sha256(content).hexdigest()
+        path = self.chunk_path(chunk)
+        if not os.path.exists(path):
+            payload = zlib.compress(content)
+            if keys:
+                payload = encrypt_block(payload, keys)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(payload)
+            os.replace(path + '.tmp', path)
+        return chunk
+
+    def read_chunk(self, chunk, keys):
+        """Read back the content of a chunk"""
+        with open(self.chunk_path(chunk), 'rb') as f:
+            payload = f.read()
+        if keys:
+            payload = decrypt_block(payload, keys)
+        return zlib.decompress(payload)
+
+    def backup_block(self, trans):
+        """Backup block of a transaction: (period, id range)"""
+        return (self.transaction_period(trans), trans['id'] // BACKUP_BLOCK_IDS)
+
+    def mark_backup_blocks(self, events):
+        """Note the blocks a batch of events changed, so the next snapshot rewrites only those"""
+        if self.stale_blocks is None:
+            return
+        for event in events:
+            if isinstance(event, (TransactionAdded, TransactionDeleted)):
+                self.stale_blocks.add(self.backup_block(event.transaction))
+            elif isinstance(event, TransactionUpdated):
+                self.stale_blocks.add(self.backup_block(event.transaction))
+                self.stale_blocks.add(self.backup_block({**event.transaction, **event.previous}))
+
+    def backup(self, force=False, prune=True):
+        """Write a snapshot if BACKUP_INTERVAL has passed (or force); returns its name or None.
+
+        The settings are one chunk and the transactions one chunk per month
+        and id range. Blocks in memory are only serialized again when a
+        change touched them, and unloaded archive months only when their
+        partition file changed, so a snapshot of a large ledger writes a
+        few small chunks.
+        """
+        if self.read_only or not (force or time.time() - self.last_backup >= BACKUP_INTERVAL):
+            return None
+        keys = self.backup_keys(self.passphrase)
+
+        def store(blocks):
+            for key, rows in blocks.items():
+                content = json.dumps(rows, separators=(',', ':')).encode('utf-8')
+                self.backup_chunks[key] = (self.write_chunk(content, keys), len(rows))
+
+        with self.mutex, LedgerLock(self.lock_file):
+            if self.backup_chunks is None or self.stale_blocks is None or keys != self.backup_chunk_keys:
+                self.backup_chunks = {}
+                self.backup_partitions = {}
+                self.backup_chunk_keys = keys
+                blocks = {}
+                for trans in self.data['transactions']:
+                    blocks.setdefault(self.backup_block(trans), []).append(trans)
+                store(blocks)
+            else:
+                transactions = self.data['transactions']
+                for key in self.stale_blocks:
+                    period, block = key
+                    start = bisect_left(transactions, block * BACKUP_BLOCK_IDS, key=operator.itemgetter('id'))
+                    stop = bisect_left(transactions, (block + 1) * BACKUP_BLOCK_IDS, start,
+                                       key=operator.itemgetter('id'))
+                    rows = [trans for trans in transactions[start:stop] if self.transaction_period(trans) == period]
+                    if rows:
+                        store({key: rows})
+                    else:
+                        self.backup_chunks.pop(key, None)
+            self.stale_blocks = set()
+
+            for period in self.unloaded_periods():
+                path = self.partition_path(period)
+                st = os.stat(path)
+                signature = (path, st.st_mtime_ns, st.st_size)
+                if self.backup_partitions.get(period) != signature:
+                    for key in [key for key in self.backup_chunks if key[0] == period]:
+                        del self.backup_chunks[key]
+                    blocks = {}
+                    for trans in self.read_partition(period):
+                        blocks.setdefault(self.backup_block(trans), []).append(trans)
+                    store(blocks)
+                    self.backup_partitions[period] = signature
+
+            meta = {key: value for key, value in self.data.items() if key not in ('transactions', 'archive')}
+            manifest = {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'meta': self.write_chunk(json.dumps(meta, sort_keys=True).encode('utf-8'), keys),
+                'blocks': [[period, block, chunk, count]
+                           for (period, block), (chunk, count) in sorted(self.backup_chunks.items())],
+                'transactions': sum(count for chunk, count in self.backup_chunks.values()),
+                'encrypted': keys is not None
+            }
+            base = name = datetime.now().strftime('%Y%m%d-%H%M%S')
+            snapshots = os.path.join(self.backup_dir, 'snapshots')
+            os.makedirs(snapshots, exist_ok=True)
+            # A second snapshot within the same second (e.g. the one taken
+            # before a restore) gets a suffix instead of replacing the first
+            n = 0
+            while os.path.exists(os.path.join(snapshots, name + '.json')):
+                n += 1
+                name = f"{base}-{n:02d}"
+            path = os.path.join(snapshots, name + '.json')
+            with open(path + '.tmp', 'w') as f:
+                json.dump(manifest, f)
+            os.replace(path + '.tmp', path)
+            self.last_backup = time.time()
+            if prune:
+                self.prune_backups()
+        return name
+
+    def list_backups(self):
+        """Snapshots newest first, as {'name', 'created', 'transactions', 'encrypted'}"""
+        snapshots = os.path.join(self.backup_dir, 'snapshots')
+        if not os.path.isdir(snapshots):
+            return []
+        result = []
+        names = [file[:-5] for file in os.listdir(snapshots) if file.endswith('.json')]
+        for name in sorted(names, reverse=True):
+            with open(os.path.join(snapshots, name + '.json')) as f:
+                manifest = json.load(f)
+            result.append({'name': name, 'created': manifest['created'],
+                           'transactions': manifest['transactions'], 'encrypted': manifest['encrypted']})
+        return result
+
+    def prune_backups(self):
+        """Drop snapshots outside BACKUP_RETENTION and the chunks no snapshot uses any more"""
+        snapshots = os.path.join(self.backup_dir, 'snapshots')
+        names = [backup['name'] for backup in self.list_backups()]
+        keep = set(names[:1])
+        for fmt, count in BACKUP_RETENTION:
+            buckets = set()
+            for name in names:
+                bucket = datetime.strptime(name[:15], '%Y%m%d-%H%M%S').strftime(fmt)
+                if bucket not in buckets and len(buckets) < count:
+                    buckets.add(bucket)
+                    keep.add(name)
+        used = set()
+        for name in names:
+            path = os.path.join(snapshots, name + '.json')
+            if name not in keep:
+                os.remove(path)
+                continue
+            with open(path) as f:
+                manifest = json.load(f)
+            used.add(manifest['meta'])
+            used.update(block[2] for block in manifest['blocks'])
+        for folder, _, files in os.walk(os.path.join(self.backup_dir, 'chunks')):
+            for file in files:
+                if file not in used:
+                    os.remove(os.path.join(folder, file))
+
+    def restore_backup(self, name, passphrase=None):
+        """Replace the whole ledger with a snapshot.
+
+        A snapshot of the current state is taken first, so a restore can be
+        reversed by restoring that one. The undo history is cleared.
+        """
+        if self.read_only:
+            raise LedgerReadOnlyError("This ledger is open read-only")
+        with open(os.path.join(self.backup_dir, 'snapshots', name + '.json')) as f:
+            manifest = json.load(f)
+        keys = None
+        if manifest['encrypted']:
+            keys = self.backup_keys(passphrase or self.passphrase)
+            if keys is None:
+                raise LedgerPassphraseError("This backup is encrypted")
+        data = json.loads(self.read_chunk(manifest['meta'], keys))
+        blocks = [json.loads(self.read_chunk(chunk, keys)) for period, block, chunk, count in manifest['blocks']]
+        data['transactions'] = list(heapq.merge(*blocks, key=lambda t: t['id']))
+        # Not pruned, so the snapshot being restored stays available too
+        self.backup(force=True, prune=False)
+
+        with self.mutex:
+            before = {trans['id'] for trans in self.data['transactions']}
+            for period in self.data['archive']:
+                path = self.partition_path(period)
+                if os.path.exists(path):
+                    os.remove(path)
+            data['archive'] = {}
+            self.data = self.upgrade_data(data)
+            self.usd_to_lkr = self.data['exchange_rate']
+            self.loaded_periods = set()
+            self.dirty_periods = set()
+            self.sum_index = None
+            self.group_index = None
+            self.sort_indexes.clear()
+            self.detector = None
+            self.category_model = None
+            self.completion_tries = None
+            self.backup_chunks = None
+            self.goal_tracker = None
+            self.undo_log.clear()
+            self.redo_log.clear()
+            self.version += 1
+            # Our own file on disk is about to be replaced, not merged
+            self.synced_signature = self.file_signature()
+            self.archive_cold_transactions()
+            self.save_data()
+
+        after = {trans['id'] for trans in self.data['transactions']}
+        self.events.publish([LedgerReloaded({'added': sorted(after - before), 'removed': sorted(before - after),
+                                             'modified': sorted(after & before)})])
+        return manifest['transactions']
+
+    # --- Integrity check ---
+
+    def check_integrity(self):
+        """Verify the whole ledger in one streaming pass; returns a report with a repair plan.
+
+        Safe to run on a background thread: the in-memory state is copied
+        under the mutex and archived months are streamed from disk one at a
+        time. Finds duplicate ids, transactions of unknown or deleted
+        accounts, unparseable dates, non-integer or NaN amounts, an id
+        counter behind the data, archive manifests that disagree with their
+        partitions, and balances that differ from their transactions. Each
+        issue names a repair ('manual' when it cannot be fixed automatically).
+        Issues with a row set aside on load carry that row, as read, in 'row'.
+        """
+        with self.mutex:
+            hot = list(self.data['transactions'])
+            rejected = copy.deepcopy(self.data.get('rejected_transactions', []))
+            accounts = copy.deepcopy(self.data['accounts'])
+            balances = {aid: balance for group in self.data['categories'].values()
+                        for aid, balance in group.items()}
+            archive = copy.deepcopy(self.data['archive'])
+            unloaded = self.unloaded_periods()
+            next_id = self.data['next_transaction_id']
+
+        issues = []
+        seen = set()
+        sums = {}
+        unsummed = set()
+        periods = {}
+        max_id = 0
+        checked = 0
+
+        def stream():
+            """(transaction, row as read if it was set aside else None, archived month it came from)"""
+            for trans in hot:
+                yield trans, None, None
+            for trans in rejected:
+                yield copy.deepcopy(trans), trans, None
+            known = set(map(self.fingerprint, rejected))
+            for period in unloaded:
+                set_aside = []
+                try:
+                    rows = self.read_partition(period, rejected=set_aside)
+                except (OSError, ValueError, LedgerPassphraseError) as e:
+                    issues.append({'kind': 'unreadable_partition', 'severity': 'error', 'period': period,
+                                   'detail': str(e), 'repair': 'manual'})
+                    continue
+                for trans in rows:
+                    yield trans, None, period
+                for trans in set_aside:
+                    if self.fingerprint(trans) not in known:
+                        yield copy.deepcopy(trans), trans, period
+
+        for trans, row, partition in stream():
+            checked += 1
+            if not isinstance(trans, dict):
+                issues.append({'kind': 'bad_row', 'severity': 'error', 'row': row,
+                               'detail': f"Transaction {trans!r} is not an object", 'repair': 'manual'})
+                continue
+            if row is not None:
+                # Lists and objects can't be hashed by the checks below; a bad timestamp can't date the row
+                for key in ('date', 'account_id'):
+                    if isinstance(trans.get(key), (list, dict)):
+                        trans[key] = repr(trans[key])
+                if not isinstance(trans.get('timestamp', ''), str):
+                    del trans['timestamp']
+            tid = trans.get('id')
+            period = partition or self.transaction_period(trans)
+            issue = {'id': tid, 'account_id': trans.get('account_id'), 'period': period}
+            if row is not None:
+                issue['row'] = row
+            if not isinstance(tid, int):
+                # A set-aside row can come back under a fresh id
+                issues.append({**issue, 'kind': 'bad_id', 'severity': 'error',
+                               'detail': f"Id {tid!r} is not an integer",
+                               'repair': 'manual' if row is None else 'renumber'})
+                if row is None:
+                    continue
+            else:
+                if tid in seen:
+                    issues.append({**issue, 'kind': 'duplicate_id', 'severity': 'error',
+                                   'detail': f"Id {tid} is used more than once", 'repair': 'renumber'})
+                seen.add(tid)
+                max_id = max(max_id, tid)
+
+            aid = trans.get('account_id')
+            if aid not in accounts:
+                issues.append({**issue, 'kind': 'unknown_account', 'severity': 'error',
+                               'detail': f"Account {aid!r} does not exist", 'repair': 'manual'})
+            elif aid not in balances:
+                issues.append({**issue, 'kind': 'orphan', 'severity': 'warning',
+                               'detail': f"Account {accounts[aid]['name']!r} was deleted", 'repair': 'remove'})
+
+            if date_ordinal(trans.get('date')) is None:
+                try:
+                    fixed = datetime.fromisoformat(trans['timestamp']).strftime('%B %d, %Y')
+                    repair = {'set': {'date': fixed}}
+                except (KeyError, TypeError, ValueError):
+                    repair = 'manual'
+                issues.append({**issue, 'kind': 'bad_date', 'severity': 'error',
+                               'detail': f"Date {trans.get('date')!r} cannot be parsed", 'repair': repair})
+
+            amount = trans.get('amount')
+            if type(amount) is not int:
+                if isinstance(amount, float) and math.isfinite(amount) and amount.is_integer():
+                    repair = {'set': {'amount': int(amount)}}
+                else:
+                    repair = 'manual'
+                issues.append({**issue, 'kind': 'bad_amount', 'severity': 'error',
+                               'detail': f"Amount {amount!r} is not a whole number of minor units",
+                               'repair': repair})
+                if repair == 'manual':
+                    unsummed.add(aid)
+                    continue
+                amount = int(amount)
+
+            for field, default in TRANSACTION_DEFAULTS.items():
+                value = trans.get(field)
+                if value is not None and type(value) is not str and coerce_value(value, str) is None:
+                    issues.append({**issue, 'kind': 'bad_field', 'severity': 'error',
+                                   'detail': f"{field.capitalize()} {value!r} is not text",
+                                   'repair': {'set': {field: default}}})
+
+            sums[aid] = sums.get(aid, 0) + amount
+            if row is not None:
+                continue  # not part of any partition's manifest
+            counts = periods.setdefault(period, [0, 0])
+            counts[0] += 1
+            counts[1] += amount
+
+        if next_id <= max_id:
+            issues.append({'kind': 'id_counter', 'severity': 'error',
+                           'detail': f"Next id {next_id} is not above the largest id {max_id}",
+                           'repair': {'next_transaction_id': max_id + 1}})
+        for period in unloaded:
+            count, total = periods.get(period, [0, 0])
+            entry = archive[period]
+            if (entry['count'], entry['total']) != (count, total):
+                issues.append({'kind': 'manifest', 'severity': 'warning', 'period': period,
+                               'detail': f"Manifest lists {entry['count']} rows totalling {entry['total']}, "
+                                         f"the partition holds {count} totalling {total}",
+                               'repair': 'rebuild_manifest'})
+        for aid, balance in balances.items():
+            if balance != sums.get(aid, 0):
+                issues.append({'kind': 'balance_mismatch', 'severity': 'warning', 'account_id': aid,
+                               'detail': f"{accounts[aid]['name']}: balance {balance}, "
+                                         f"transactions add up to {sums.get(aid, 0)}",
+                               'repair': 'manual' if aid in unsummed else 'adjust'})
+
+        return {'ledger': self.data_file, 'created': datetime.now().isoformat(timespec='seconds'),
+                'checked': checked, 'issues': issues}
+
+    def write_repair_plan(self, report):
+        """Save a check_integrity report next to the ledger (never touches the ledger itself); returns its path"""
+        with open(self.repair_file + '.tmp', 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(self.repair_file + '.tmp', self.repair_file)
+        return self.repair_file
+
+    def apply_repairs(self, report, remove_orphans=False):
+        """Carry out the automatic repairs of a report; returns how many were applied.
+
+        Transactions of deleted accounts are kept (they still show the
+        account's name) unless remove_orphans is set. Row fixes and
+        removals, including rows set aside on load that the repairs make
+        readable again, are one undoable command, and each balance is matched to its transactions with a
+        reconciliation adjustment. Renumbering duplicate ids, the id
+        counter and archive manifests are fixed in place and saved at once.
+        """
+        issues = [issue for issue in report['issues']
+                  if issue['repair'] != 'manual' and (remove_orphans or issue['kind'] != 'orphan')]
+        for period in {issue['period'] for issue in issues if issue.get('period')}:
+            if self.is_cold(period):
+                self.load_period(period)
+
+        loaded = [issue for issue in issues if 'row' not in issue]
+        removals = [issue['id'] for issue in loaded if issue['repair'] == 'remove']
+        changes = [(issue['id'], issue['repair']['set']) for issue in loaded
+                   if isinstance(issue['repair'], dict) and 'set' in issue['repair']]
+        ops = []
+        if changes:
+            ops.append(('update_transactions', changes))
+        if removals:
+            ops.append(('remove_transactions', removals))
+        restored, rejected = self.repair_rejected_rows(report, issues)
+        if restored:
+            ops.append(('insert_transactions', restored))
+        if rejected != self.data.get('rejected_transactions', []):
+            ops.append(('set_setting', 'rejected_transactions', rejected or None))
+        if ops:
+            self.execute("Repair ledger", ops)
+        still_rejected = set(map(self.fingerprint, rejected))
+        issues = [issue for issue in issues if 'row' not in issue
+                  or self.fingerprint(issue['row']) not in still_rejected]
+
+        in_place = False
+        if any(issue['repair'] == 'renumber' for issue in loaded):
+            self.renumber_duplicate_ids()
+            in_place = True
+        with self.mutex:
+            for issue in issues:
+                repair = issue['repair']
+                if isinstance(repair, dict) and 'next_transaction_id' in repair:
+                    self.data['next_transaction_id'] = max(self.data['next_transaction_id'],
+                                                           repair['next_transaction_id'])
+                    in_place = True
+                elif repair == 'rebuild_manifest' and issue['period'] in self.data['archive']:
+                    # Rows it can't read were set aside when the month was loaded above
+                    self.write_partition(issue['period'], self.read_partition(issue['period'], rejected=[]))
+                    self.sum_index = None
+                    in_place = True
+        if in_place:
+            self.save_data()
+
+        for issue in issues:
+            if issue['repair'] == 'adjust' and self.account_category(issue['account_id']):
+                aid = issue['account_id']
+                self.reconcile(aid, self.data['categories'][self.account_category(aid)][aid])
+        return len(issues)
+
+    def repair_rejected_rows(self, report, issues):
+        """Rows set aside on load that the chosen issues' repairs fix; returns (fixed rows, rows still set aside).
+
+        A row comes back only if every issue the report found with it was
+        chosen: 'set' repairs are applied to it, and it gets a fresh id
+        when its own is unusable or taken. A row whose account was deleted
+        is dropped instead when its 'remove' repair was chosen.
+        """
+        found = {}
+        for issue in report['issues']:
+            if 'row' in issue:
+                found.setdefault(self.fingerprint(issue['row']), []).append(issue)
+        taken = {trans['id'] for trans in self.data['transactions']}
+        restored = []
+        rejected = []
+        for row in self.data.get('rejected_transactions', []):
+            row_issues = found.get(self.fingerprint(row))
+            if not row_issues or any(issue not in issues for issue in row_issues):
+                rejected.append(row)
+                continue
+            repairs = [issue['repair'] for issue in row_issues]
+            if 'remove' in repairs:
+                continue
+            trans = copy.deepcopy(row)
+            for repair in repairs:
+                if isinstance(repair, dict):
+                    trans.update(repair['set'])
+            try:
+                coerce_transactions([trans])
+            except ValueError:
+                rejected.append(row)
+                continue
+            if 'renumber' in repairs or trans['id'] in taken:
+                trans['id'] = self.allocate_ids()
+            taken.add(trans['id'])
+            restored.append(trans)
+        return sorted(restored, key=lambda t: t['id']), rejected
+
+    def renumber_duplicate_ids(self):
+        """Give every repeated id after its first use a fresh id (not undoable)"""
+        with self.mutex:
+            seen = set()
+            for trans in self.data['transactions']:
+                if trans['id'] in seen:
+                    trans['id'] = self.data['next_transaction_id']
+                    self.data['next_transaction_id'] += 1
+                    self.touch_period(trans)
+                seen.add(trans['id'])
+            self.data['transactions'].sort(key=lambda t: t['id'])
+            self.group_index = None
+            self.sort_indexes.clear()
+            self.detector = None
+            self.backup_chunks = None
+            # Undo entries refer to rows by id
+            self.undo_log.clear()
+            self.redo_log.clear()
+            self.version += 1
+
+    # --- Quick entry ---
+
+    def completions(self):
+        """Prefix tries of 'account' names (valued by id), 'description's and 'rule_category's.
+
+        Built on first use from the loaded transactions, then kept current
+        by track_completions and, as archived months load, track_loaded_rows.
+        """
+        if self.completion_tries is None:
+            tries = {'account': PrefixTrie(), 'description': PrefixTrie(), 'rule_category': PrefixTrie()}
+            for accounts in self.data['categories'].values():
+                for aid in accounts:
+                    tries['account'].add(self.account_name(aid), aid)
+            descriptions = Counter(map(operator.itemgetter('description'), self.data['transactions']))
+            for description, count in descriptions.items():
+                tries['description'].add(description, count=count)
+            for rule_category in RULE_CATEGORIES + ['-']:
+                tries['rule_category'].add(rule_category)
+            self.completion_tries = tries
+        return self.completion_tries
+
+    def track_completions(self, events):
+        """Update the quick-entry tries as transactions and accounts change; called from replay"""
+        tries = self.completion_tries
+        if tries is None:
+            return
+        for event in events:
+            if isinstance(event, TransactionAdded):
+                tries['description'].add(event.transaction['description'])
+            elif isinstance(event, TransactionDeleted):
+                tries['description'].remove(event.transaction['description'])
+            elif isinstance(event, TransactionUpdated) and 'description' in event.previous:
+                tries['description'].remove(event.previous['description'])
+                tries['description'].add(event.transaction['description'])
+            elif isinstance(event, AccountAdded):
+                tries['account'].add(self.account_name(event.account_id), event.account_id)
+            elif isinstance(event, AccountDeleted):
+                tries['account'].remove(self.account_name(event.account_id))
+            elif isinstance(event, AccountRenamed):
+                tries['account'].remove(event.old)
+                tries['account'].add(event.new, event.account_id)
+
+    def match_account(self, words):
+        """Account named by the longest run of leading words (a full name or a prefix of just one).
+
+        Returns (account id, number of words used), or (None, 0).
+        """
+        accounts = self.completions()['account']
+        for n in range(len(words), 0, -1):
+            prefix = ' '.join(words[:n])
+            match = accounts.lookup(prefix)
+            if match is None:
+                matches = accounts.complete(prefix, 2)
+                match = matches[0] if len(matches) == 1 else None
+            if match is not None:
+                return match[1], n
+        return None, 0
+
+    def parse_quick_entry(self, text):
+        """Turn a quick-entry line into a transaction dict (not yet added).
+
+        '-1500 Sampath groceries #essentials': a signed amount, an account
+        (its name or a prefix only it has), then the description. Anywhere
+        in the line, '#' picks a rule category by prefix (automatic when
+        left out) and '@' a date (YYYY-MM-DD, 'today' or 'yesterday').
+        Raises ValueError saying what is missing or not understood.
+        """
+        rule_categories = self.completions()['rule_category']
+        amount = rule_category = None
+        day = datetime.now()
+        words = []
+        for token in text.split():
+            if token.startswith('#') and len(token) > 1:
+                match = rule_categories.lookup(token[1:])
+                matches = [match] if match else rule_categories.complete(token[1:], 2)
+                if len(matches) != 1:
+                    raise ValueError(f"Unknown rule category {token!r}")
+                rule_category = matches[0][0]
+            elif token.startswith('@') and len(token) > 1:
+                when = token[1:].lower()
+                if when in ('today', 'yesterday'):
+                    day = datetime.now() - timedelta(days=when == 'yesterday')
+                else:
+                    try:
+                        day = datetime.strptime(when, '%Y-%m-%d')
+                    except ValueError:
+                        raise ValueError(f"Unknown date {token!r}, use @YYYY-MM-DD") from None
+            elif amount is None and re.fullmatch(r'[+-]?(\d[\d,]*(\.\d*)?|\.\d+)', token):
+                amount = token.replace(',', '')
+            else:
+                words.append(token)
+
+        if amount is None:
+            raise ValueError("Start with an amount, e.g. -1500")
+        aid, used = self.match_account(words)
+        if aid is None:
+            raise ValueError(f"No single account matches {words[0]!r}" if words else "Name an account")
+        description = ' '.join(words[used:])
+        if not description:
+            raise ValueError("Add a description after the account")
+        trans = {
+            'date': day.strftime('%B %d, %Y'),
+            'account_id': aid,
+            'description': description,
+            'amount': to_minor(amount, self.account_currency(aid)),
+            'timestamp': datetime.now().isoformat()
+        }
+        if rule_category is not None:
+            trans['rule_category'] = rule_category
+        return trans
+
+    def quick_add(self, text):
+        """Parse a quick-entry line and add it as one undoable command; returns the transaction"""
+        trans = self.parse_quick_entry(text)
+        self.add_transaction(trans)
+        return trans
+
+    # --- Savings goals ---
+
+    def goal_progress(self):
+        """The goal tracker, built on first use and then kept current by track_goals"""
+        with self.mutex:
+            if self.goal_tracker is None:
+                tracker = GoalTracker(self.data.get('goals', {}))
+                for accounts in self.data['categories'].values():
+                    for aid, balance in accounts.items():
+                        tracker.balance(aid, self.account_currency(aid), balance)
+                start = tracker.earliest_start()
+                if start is not None:
+                    since = datetime.fromordinal(start).strftime('%Y-%m')
+                    transactions = [self.data['transactions']]
+                    transactions += [self.read_partition(period) for period in self.unloaded_periods()
+                                     if period >= since]
+                    for trans in (trans for rows in transactions for trans in rows):
+                        tracker.transaction(trans, self.account_currency(trans['account_id']))
+                self.goal_tracker = tracker
+            return self.goal_tracker
+
+    def track_goals(self, events):
+        """Adjust goal progress by a batch of events; called from replay under the mutex"""
+        tracker = self.goal_tracker
+        if tracker is None:
+            return
+        for event in events:
+            if isinstance(event, BalanceEdited):
+                tracker.balance(event.account_id, self.account_currency(event.account_id), event.new - event.old)
+            elif isinstance(event, (TransactionAdded, TransactionDeleted)):
+                trans = event.transaction
+                sign = 1 if isinstance(event, TransactionAdded) else -1
+                tracker.transaction(trans, self.account_currency(trans['account_id']), sign)
+            elif isinstance(event, TransactionUpdated):
+                old = {**event.transaction, **event.previous}
+                tracker.transaction(old, self.account_currency(old['account_id']), -1)
+                tracker.transaction(event.transaction, self.account_currency(event.transaction['account_id']))
+            elif (isinstance(event, SettingChanged) and event.key == 'goals'
+                    or isinstance(event, (AccountAdded, AccountDeleted)) and event.account_id in tracker.by_account
+                    or isinstance(event, AccountRenamed) and 'Crypto $' in (event.old, event.new)):
+                # Goal definitions or an account's currency changed
+                self.goal_tracker = None
+                return
+
+    def goal_status(self):
+        """Every goal's progress, soonest deadline first, in LKR minor units.
+
+        'months_left' counts the calendar months up to the deadline
+        including this one, and 'monthly' is what has to be saved in each
+        of them to reach the target. 'status' is 'reached', 'overdue' or
+        'active'.
+        """
+        with self.mutex:
+            tracker = self.goal_progress()
+            goals = self.data.get('goals', {})
+            today = datetime.now()
+            status = []
+            for gid, goal in goals.items():
+                sums = tracker.sums.get(gid, {})
+                saved = sums.get('LKR', 0) + to_minor(from_minor(sums.get('USD', 0), 'USD') * self.usd_to_lkr)
+                remaining = max(goal['target'] - saved, 0)
+                deadline = datetime.strptime(goal['deadline'], '%Y-%m-%d')
+                months_left = 0
+                if deadline.date() >= today.date():
+                    months_left = (deadline.year - today.year) * 12 + deadline.month - today.month + 1
+                if not remaining:
+                    state = 'reached'
+                elif not months_left:
+                    state = 'overdue'
+                else:
+                    state = 'active'
+                status.append({
+                    'id': gid, 'name': goal['name'], 'target': goal['target'], 'saved': saved,
+                    'remaining': remaining, 'deadline': goal['deadline'], 'start': goal.get('start'),
+                    'accounts': goal.get('accounts'), 'rule_category': goal.get('rule_category'),
+                    'months_left': months_left, 'monthly': -(-remaining // max(months_left, 1)),
+                    'status': state
+                })
+        status.sort(key=lambda g: (g['deadline'], g['name']))
+        return status
+
+    def check_goal(self, goal):
+        """Raise ValueError unless a goal definition is complete and consistent"""
+        if not goal.get('name', '').strip():
+            raise ValueError("Give the goal a name")
+        if not isinstance(goal.get('target'), int) or goal['target'] <= 0:
+            raise ValueError("The target must be a positive amount")
+        deadline = goal.get('deadline')
+        if not (isinstance(deadline, str) and re.fullmatch(r'\d{4}-\d{2}-\d{2}', deadline)
+                and date_ordinal(deadline)):
+            raise ValueError("The deadline must be a YYYY-MM-DD date")
+        if goal.get('rule_category'):
+            if goal['rule_category'] not in RULE_CATEGORIES:
+                raise ValueError(f"Unknown rule category {goal['rule_category']!r}")
+            if goal.get('accounts'):
+                raise ValueError("Track either accounts or a rule category, not both")
+        elif not goal.get('accounts'):
+            raise ValueError("Choose the accounts or the rule category the goal tracks")
+        else:
+            unknown = [aid for aid in goal['accounts'] if aid not in self.data['accounts']]
+            if unknown:
+                raise ValueError(f"Unknown account {unknown[0]!r}")
+
+    def add_goal(self, name, target, deadline, accounts=None, rule_category=None):
+        """Add a savings goal (target in LKR minor units, deadline 'YYYY-MM-DD'); returns its id.
+
+        The goal tracks either the balance of some accounts or what is
+        tagged with a rule category from today on.
+        """
+        goal = {'name': name.strip(), 'target': target, 'deadline': deadline,
+                'start': datetime.now().strftime('%Y-%m-%d')}
+        if rule_category:
+            goal['rule_category'] = rule_category
+        if accounts:
+            goal['accounts'] = list(accounts)
+        self.check_goal(goal)
+        gid = f"g{max((int(key[1:]) for key in self.data.get('goals', {})), default=0) + 1}"
+        self.execute("Add goal", [('set_entry', 'goals', gid, goal)])
+        return gid
+
+    def update_goal(self, gid, **changes):
+        """Change a goal's name, target, deadline, accounts or rule_category"""
+        if gid not in self.data.get('goals', {}):
+            raise ValueError(f"Unknown goal {gid!r}")
+        goal = copy.deepcopy(self.data['goals'][gid])
+        for field, value in changes.items():
+            if field not in ('name', 'target', 'deadline', 'accounts', 'rule_category'):
+                raise ValueError(f"Unknown goal field {field!r}")
+            if value:
+                goal[field] = list(value) if field == 'accounts' else value
+            else:
+                goal.pop(field, None)
+        self.check_goal(goal)
+        self.execute("Update goal", [('set_entry', 'goals', gid, goal)])
+
+    def delete_goal(self, gid):
+        """Remove a savings goal"""
+        if gid not in self.data.get('goals', {}):
+            raise ValueError(f"Unknown goal {gid!r}")
+        self.execute("Delete goal", [('set_entry', 'goals', gid, None)])
+
+    # --- Duplicate and anomaly detection ---
+
+    def anomaly_flags(self):
+        """Transaction id -> {'duplicate', 'unusual'} flags of the loaded transactions.
+
+        The first call scans what is in memory; archived months are added
+        as they load, so the Transactions tab never reads the archive just
+        to show its flags.
+        """
+        if self.detector is None:
+            self.detector = AnomalyDetector()
+            self.detector.scan(self.data['transactions'])
+        return self.detector.flags
+
+    def track_anomalies(self, events):
+        """Check new and changed transactions against the detector as they happen; called from replay"""
+        detector = self.detector
+        if detector is None:
+            return
+        for event in events:
+            if isinstance(event, TransactionAdded):
+                detector.add(event.transaction)
+            elif isinstance(event, TransactionDeleted):
+                detector.remove(event.transaction)
+            elif isinstance(event, TransactionUpdated):
+                detector.remove({**event.transaction, **event.previous})
+                detector.add(event.transaction)
+
+    def learn_categories(self, events):
+        """Keep the categorizer in step with tagged transactions and its rules; called from replay"""
+        model = self.category_model
+        if model is None:
+            return
+        for event in events:
+            if isinstance(event, TransactionAdded):
+                model.learn(event.transaction['description'], event.transaction.get('rule_category', '-'))
+            elif isinstance(event, TransactionDeleted):
+                model.learn(event.transaction['description'], event.transaction.get('rule_category', '-'), -1)
+            elif isinstance(event, TransactionUpdated):
+                old = {**event.transaction, **event.previous}
+                model.learn(old['description'], old.get('rule_category') or '-', -1)
+                model.learn(event.transaction['description'], event.transaction.get('rule_category', '-'))
+            elif isinstance(event, SettingChanged) and event.key == 'category_rules':
+                model.set_rules(event.value or DEFAULT_CATEGORY_RULES)
+
+    def set_budget(self, kind, name, limit):
+        """Set a monthly budget, or remove it when limit is None"""
+        self.execute("Set budget", [('set_budget', kind, name, limit)])
+
+# --- Local JSON API ---
+
+class PooledHTTPServer(HTTPServer):
+    """HTTP server that handles requests on a fixed pool of worker threads"""
+
+    def __init__(self, address, handler, workers):
+        super().__init__(address, handler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ledger-api')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False)
+
+
+class LedgerAPI:
+    """Read-only JSON API over the active ledger, served on localhost.
+
+    Every response carries an ETag made from the ledger's version counter,
+    its price file and the date, so a client polling with If-None-Match
+    gets a bodiless 304 until any of them changes. Encoded bodies are
+    cached per URL and ETag.
+    """
+
+    def __init__(self, get_ledger, port=API_PORT, workers=API_WORKERS):
+        self.get_ledger = get_ledger
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.routes = {
+            '/': self.index,
+            '/totals': self.totals,
+            '/accounts': self.accounts,
+            '/transactions': self.transactions,
+            '/allocation': self.allocation,
+            '/chart': self.chart,
+            '/goals': self.goals
+        }
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                api.handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = PooledHTTPServer(('127.0.0.1', port), Handler, workers)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving and release the port"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handle(self, request):
+        """Answer one GET request"""
+        url = urlsplit(request.path)
+        route = self.routes.get(url.path.rstrip('/') or '/')
+        if route is None:
+            self.send(request, 404, json.dumps({'error': f"Unknown endpoint {url.path}"}).encode('utf-8'))
+            return
+
+        ledger = self.get_ledger()
+        # Prices and today's date (chart, budgets, goals) change responses
+        # without bumping the ledger version
+        state = f"{ledger.price_signature()}|{datetime.now().date()}"
+        etag = (f'"{zlib.crc32(ledger.data_file.encode("utf-8")):08x}-{ledger.version}'
+                f'-{zlib.crc32(state.encode("utf-8")):08x}"')
+        if etag in request.headers.get('If-None-Match', ''):
+            self.send(request, 304, None, etag)
+            return
+
+        key = (request.path, etag)
+        with self.cache_lock:
+            body = self.cache.get(key)
+            if body is not None:
+                self.cache.move_to_end(key)
+        if body is None:
+            params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                with ledger.mutex:
+                    result = route(ledger, params)
+            except (KeyError, ValueError) as e:
+                self.send(request, 400, json.dumps({'error': f"Bad request: {e}"}).encode('utf-8'))
+                return
+            body = json.dumps(result).encode('utf-8')
+            with self.cache_lock:
+                self.cache[key] = body
+                while len(self.cache) > API_CACHE_SIZE:
+                    self.cache.popitem(last=False)
+        self.send(request, 200, body, etag)
+
+    def send(self, request, status, body, etag=None):
+        """Write a JSON response"""
+        request.send_response(status)
+        if etag:
+            request.send_header('ETag', etag)
+            request.send_header('Cache-Control', 'no-cache')
+        if body is not None:
+            request.send_header('Content-Type', 'application/json')
+            request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        if body is not None:
+            request.wfile.write(body)
+
+    def index(self, ledger, params):
+        """API version and endpoint list"""
+        return {'version': ledger.version, 'endpoints': sorted(self.routes)}
+
+    def totals(self, ledger, params):
+        """Totals as shown on the dashboard cards"""
+        return ledger.calculate_totals()
+
+    def accounts(self, ledger, params):
+        """Every account with its category, balance and currency"""
+        return [{'id': aid, 'name': ledger.account_name(aid), 'category': category,
+                 'balance': from_minor(balance, ledger.account_currency(aid)),
+                 'currency': ledger.account_currency(aid)}
+                for category, accounts in ledger.data['categories'].items()
+                for aid, balance in accounts.items()]
+
+    def transactions(self, ledger, params):
+        """Newest first; filters: account, rule_category, since/until (YYYY-MM), q"""
+        offset = max(int(params.get('offset', 0)), 0)
+        limit = min(max(int(params.get('limit', 100)), 0), API_PAGE_LIMIT)
+        account = params.get('account')
+        rule_category = params.get('rule_category')
+        since, until = params.get('since'), params.get('until')
+        query = params.get('q', '').lower()
+
+        page = []
+        matched = 0
+        for trans in reversed(ledger.data['transactions']):
+            if account and trans['account_id'] != account:
+                continue
+            if rule_category and trans.get('rule_category', '-') != rule_category:
+                continue
+            if since or until:
+                period = ledger.transaction_period(trans)
+                if (since and period < since) or (until and period > until):
+                    continue
+            if query and query not in trans['description'].lower():
+                continue
+            if offset <= matched < offset + limit:
+                page.append({**trans, 'account': ledger.account_name(trans['account_id']),
+                             'amount': from_minor(trans['amount'], ledger.account_currency(trans['account_id']))})
+            matched += 1
+        return {'total': matched, 'offset': offset, 'limit': limit,
+                'archived_months': ledger.unloaded_periods(), 'transactions': page}
+
+    def allocation(self, ledger, params):
+        """Rule allocation as shown on the rule tab"""
+        return ledger.rule_allocation()
+
+    def chart(self, ledger, params):
+        """Daily real totals; days defaults to 30"""
+        days = min(max(int(params.get('days', 30)), 1), 3660)
+        return [{'date': date.isoformat(), 'real_total': value}
+                for date, value in ledger.chart_series(days)]
+
+    def goals(self, ledger, params):
+        """Savings goals with their progress and required monthly saving, in LKR"""
+        return [{**goal, **{key: from_minor(goal[key]) for key in ('target', 'saved', 'remaining', 'monthly')}}
+                for goal in ledger.goal_status()]
+
+
+class ProfileManager:
+    """Named ledgers (profiles) sharing one process.
+
+    Open ledgers are kept in least-recently-used order and the oldest
+    inactive ones are unloaded past PROFILE_CACHE_SIZE. Each profile's
+    totals are cached in the registry so consolidated net worth does not
+    need to load every ledger.
+    """
+
+    def __init__(self, registry_file, read_only=False):
+        self.registry_file = registry_file
+        self.read_only = read_only
+        self.ledgers = OrderedDict()
+        self.passphrases = {}
+        if os.path.exists(registry_file):
+            with open(registry_file, 'r') as f:
+                self.registry = json.load(f)
+        else:
+            self.registry = {
+                'active': 'Default',
+                'profiles': {'Default': {'data_file': 'finance_data.json', 'totals': None}}
+            }
+
+    def save_registry(self):
+        """Save the profile registry"""
+        if self.read_only:
+            return
+        with open(self.registry_file, 'w') as f:
+            json.dump(self.registry, f, indent=2)
+
+    def names(self):
+        """Profile names in creation order"""
+        return list(self.registry['profiles'])
+
+    def open(self, name, passphrase=None):
+        """Return the ledger of a profile, loading it if needed, and make it active"""
+        previous = self.registry['active']
+        if previous in self.ledgers and previous != name:
+            self.cache_totals(previous)
+
+        ledger = self.ledgers.get(name)
+        if ledger is None:
+            ledger = Ledger(self.registry['profiles'][name]['data_file'],
+                            passphrase or self.passphrases.get(name), self.read_only)
+            self.ledgers[name] = ledger
+        self.ledgers.move_to_end(name)
+        self.registry['active'] = name
+
+        while len(self.ledgers) > PROFILE_CACHE_SIZE:
+            evicted = next(iter(self.ledgers))
+            self.cache_totals(evicted)
+            self.ledgers.pop(evicted).events.close()
+
+        self.save_registry()
+        return ledger
+
+    def cache_totals(self, name):
+        """Remember an open profile's totals (and passphrase) for when it is unloaded"""
+        ledger = self.ledgers[name]
+        self.registry['profiles'][name]['totals'] = ledger.calculate_totals()
+        if ledger.passphrase:
+            self.passphrases[name] = ledger.passphrase
+
+    def create(self, name):
+        """Register a new profile with its own data file"""
+        if self.read_only:
+            raise LedgerReadOnlyError("Profiles cannot be created in a read-only viewer")
+        slug = ''.join(c if c.isalnum() else '_' for c in name.lower()).strip('_') or 'profile'
+        data_file = f"finance_data_{slug}.json"
+        used = {p['data_file'] for p in self.registry['profiles'].values()}
+        n = 2
+        while data_file in used:
+            data_file = f"finance_data_{slug}_{n}.json"
+            n += 1
+        self.registry['profiles'][name] = {'data_file': data_file, 'totals': None}
+        self.save_registry()
+
+    def consolidated_totals(self):
+        """Sum totals across profiles, live for open ledgers and cached otherwise"""
+        combined = {'cash_bank': 0, 'crypto': 0, 'upcoming': 0, 'real_total': 0, 'total': 0}
+        for name, profile in self.registry['profiles'].items():
+            if name in self.ledgers:
+                totals = self.ledgers[name].calculate_totals()
+            else:
+                totals = profile['totals']
+            if totals:
+                for key in combined:
+                    combined[key] += totals[key]
+        return combined
+
+    def close(self):
+        """Finish pending saves and cache totals of every open profile before exit"""
+        for name, ledger in self.ledgers.items():
+            ledger.events.close()
+            self.cache_totals(name)
+        self.save_registry()
+
+
+class PortfolioChart:
+    """Interactive line chart of the daily real total on a Canvas.
+
+    The visible window is a span of days: range presets set it, the mouse
+    wheel zooms around the pointer and dragging pans. Every item (grid,
+    labels, line, fill, hover marker and tooltip) is created once and
+    moved with coords/itemconfigure; redraws are coalesced to one per
+    frame and the line is thinned to the min and max of each pixel column.
+    Hovering finds the nearest point by binary search over the drawn
+    x-coordinates. The chart is created once; dashboard refreshes hand it
+    the new series through update_series, which keeps the range, zoom
+    and tooltip.
+    """
+
+    RANGES = [('1M', 30), ('3M', 91), ('1Y', 365), ('All', None)]
+    MIN_SPAN = 7
+    FRAME_MS = 16
+    PAD_LEFT, PAD_RIGHT, PAD_TOP, PAD_BOTTOM = 60, 20, 20, 40
+
+    def __init__(self, gui, parent):
+        self.gui = gui
+        self.history = gui.ledger.daily_history()
+        self.days, self.values = self.history
+        self.range = '1M'
+        self.zoomed = False
+        self.view = None
+        self.pointer = None
+        self.xs = []
+        self.lo = 0
+        self.drag = None
+        self.pending = None
+        self.preset_buttons = {}
+
+        canvas = self.canvas = tk.Canvas(parent, bg='#0f172a', height=250, highlightthickness=0)
+        canvas.pack(fill='x', padx=25, pady=(10, 25))
+        self.grid = [canvas.create_line(0, 0, 0, 0, fill='#1e293b', width=1) for _ in range(5)]
+        self.grid_labels = [canvas.create_text(0, 0, fill='#64748b', anchor='e', font=('Segoe UI', 9))
+                            for _ in range(5)]
+        self.date_labels = [canvas.create_text(0, 0, fill='#64748b', font=('Segoe UI', 9)) for _ in range(3)]
+        self.fill = canvas.create_polygon(0, 0, 0, 0, 0, 0, fill='#3b82f6', stipple='gray50', outline='')
+        self.line = canvas.create_line(0, 0, 0, 0, fill='#60a5fa', width=3)
+        self.marker = canvas.create_oval(0, 0, 0, 0, fill='#3b82f6', outline='#ffffff', width=2, state='hidden')
+        self.tip_box = canvas.create_rectangle(0, 0, 0, 0, fill='#334155', outline='#475569', state='hidden')
+        self.tip_text = canvas.create_text(0, 0, fill='#e2e8f0', anchor='nw', font=('Segoe UI', 9),
+                                           state='hidden')
+
+        canvas.bind('<Configure>', lambda e: self.request_draw())
+        canvas.bind('<MouseWheel>', self.on_wheel)
+        canvas.bind('<Button-4>', self.on_wheel)
+        canvas.bind('<Button-5>', self.on_wheel)
+        canvas.bind('<ButtonPress-1>', self.on_press)
+        canvas.bind('<B1-Motion>', self.on_drag)
+        canvas.bind('<ButtonRelease-1>', self.on_release)
+        canvas.bind('<Motion>', self.on_motion)
+        canvas.bind('<Leave>', self.on_leave)
+
+    def set_range(self, label):
+        """Show a preset range ending today"""
+        self.range = label
+        self.zoomed = False
+        span = dict(self.RANGES)[label]
+        last = self.days[-1]
+        self.view = self.clamp(self.days[0] if span is None else last - span + 1, last)
+        for name, button in self.preset_buttons.items():
+            button.configure(bg='#3b82f6' if name == label else '#334155')
+        self.request_draw()
+
+    def update_series(self):
+        """Take the ledger's current history, keeping a zoomed window or following today in a preset"""
+        history = self.gui.ledger.daily_history()
+        if history is self.history:
+            return
+        self.history = history
+        self.days, self.values = history
+        if self.zoomed:
+            self.view = self.clamp(*self.view)
+            self.request_draw()
+        else:
+            self.set_range(self.range)
+
+    def clamp(self, start, end):
+        """Fit a window of days inside the data, keeping at least MIN_SPAN days"""
+        first, last = self.days[0], self.days[-1]
+        span = min(max(end - start, self.MIN_SPAN), last - first)
+        start = min(max(start, first), last - span)
+        return (start, start + span)
+
+    def set_view(self, start, end):
+        """Move to a custom window (zoom or pan)"""
+        self.view = self.clamp(start, end)
+        self.zoomed = True
+        for button in self.preset_buttons.values():
+            button.configure(bg='#334155')
+        self.request_draw()
+
+    def request_draw(self):
+        """Redraw at the next frame; further requests until then are merged"""
+        if self.pending is None:
+            self.pending = self.canvas.after(self.FRAME_MS, self.draw)
+
+    def plot_area(self):
+        """(left, top, right, bottom) of the plotting area in canvas pixels"""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        return (self.PAD_LEFT, self.PAD_TOP, max(width - self.PAD_RIGHT, self.PAD_LEFT + 1),
+                max(height - self.PAD_BOTTOM, self.PAD_TOP + 1))
+
+    def draw(self):
+        """Reposition every item for the current window"""
+        self.pending = None
+        if self.canvas.winfo_width() <= 1:
+            return
+        left, top, right, bottom = self.plot_area()
+        start, end = self.view
+        lo = max(bisect_left(self.days, math.floor(start)), 0)
+        hi = min(bisect_right(self.days, math.ceil(end)), len(self.days))
+        values = self.values[lo:hi]
+        min_val, max_val = min(values), max(values)
+        value_range = max_val - min_val if max_val != min_val else 1
+        x_scale = (right - left) / (end - start)
+        y_scale = (bottom - top) / value_range
+
+        for i, (line, label) in enumerate(zip(self.grid, self.grid_labels)):
+            y = top + (bottom - top) * i / 4
+            self.canvas.coords(line, left, y, right, y)
+            self.canvas.coords(label, left - 10, y)
+            self.canvas.itemconfigure(label, text=f"{(max_val - value_range * i / 4) / 1000:,.0f}K")
+        date_format = '%m/%d' if end - start <= 366 else '%b %Y'
+        for i, label in enumerate(self.date_labels):
+            day = start + (end - start) * i / 2
+            self.canvas.coords(label, left + (right - left) * i / 2, bottom + 20)
+            self.canvas.itemconfigure(label, text=datetime.fromordinal(round(day)).strftime(date_format))
+
+        self.lo = lo
+        self.xs = [left + (day - start) * x_scale for day in self.days[lo:hi]]
+        ys = [bottom - (value - min_val) * y_scale for value in values]
+        points = []
+        if len(self.xs) > 2 * (right - left):
+            # More points than pixels: keep the low and high of each column
+            column, low, high = None, None, None
+            for x, y in zip(self.xs, ys):
+                if int(x) != column:
+                    if column is not None:
+                        points.extend((column, low, column, high))
+                    column, low, high = int(x), y, y
+                else:
+                    low, high = min(low, y), max(high, y)
+            points.extend((column, low, column, high))
+        else:
+            for x, y in zip(self.xs, ys):
+                points.extend((x, y))
+        if len(points) < 4:
+            points = points * 2
+        self.canvas.coords(self.line, *points)
+        self.canvas.coords(self.fill, *points, points[-2], bottom, points[0], bottom)
+        if self.pointer is None or self.drag is not None:
+            self.hide_tooltip()
+        else:
+            self.show_tooltip(self.pointer)
+
+    def on_wheel(self, event):
+        """Zoom in or out around the day under the pointer"""
+        zoom_in = event.num == 4 or event.delta > 0
+        left, top, right, bottom = self.plot_area()
+        start, end = self.view
+        fraction = min(max((event.x - left) / (right - left), 0), 1)
+        anchor = start + (end - start) * fraction
+        span = (end - start) * (0.8 if zoom_in else 1.25)
+        self.set_view(anchor - span * fraction, anchor + span * (1 - fraction))
+        return 'break'
+
+    def on_press(self, event):
+        """Start a pan from the pointer position"""
+        self.drag = (event.x, self.view)
+
+    def on_drag(self, event):
+        """Pan by the distance dragged"""
+        if self.drag is None:
+            return
+        x, (start, end) = self.drag
+        left, top, right, bottom = self.plot_area()
+        shift = (x - event.x) * (end - start) / (right - left)
+        self.set_view(start + shift, end + shift)
+
+    def on_release(self, event):
+        """End a pan"""
+        self.drag = None
+
+    def on_motion(self, event):
+        """Follow the pointer with the tooltip"""
+        self.pointer = event.x
+        if self.drag is None:
+            self.show_tooltip(event.x)
+
+    def on_leave(self, event):
+        """Drop the tooltip when the pointer leaves the chart"""
+        self.pointer = None
+        self.hide_tooltip()
+
+    def show_tooltip(self, pointer_x):
+        """Show the date and value of the point nearest an x-coordinate"""
+        if not self.xs:
+            return
+        i = bisect_left(self.xs, pointer_x)
+        if i == len(self.xs) or (i > 0 and pointer_x - self.xs[i - 1] < self.xs[i] - pointer_x):
+            i -= 1
+        left, top, right, bottom = self.plot_area()
+        start, end = self.view
+        values = self.values[self.lo:self.lo + len(self.xs)]
+        min_val, max_val = min(values), max(values)
+        value_range = max_val - min_val if max_val != min_val else 1
+        x = self.xs[i]
+        y = bottom - (values[i] - min_val) * (bottom - top) / value_range
+        day = datetime.fromordinal(self.days[self.lo + i])
+
+        canvas = self.canvas
+        canvas.coords(self.marker, x - 5, y - 5, x + 5, y + 5)
+        canvas.itemconfigure(self.tip_text, text=f"{day.strftime('%b %d, %Y')}\nLKR {values[i]:,.2f}")
+        x1, y1, x2, y2 = canvas.bbox(self.tip_text)
+        tip_x = x + 12 if x + 12 + (x2 - x1) + 8 < right else x - 12 - (x2 - x1) - 8
+        tip_y = min(max(y - (y2 - y1) - 12, top), bottom - (y2 - y1) - 8)
+        canvas.coords(self.tip_text, tip_x + 4, tip_y + 4)
+        canvas.coords(self.tip_box, tip_x, tip_y, tip_x + (x2 - x1) + 8, tip_y + (y2 - y1) + 8)
+        for item in (self.marker, self.tip_box, self.tip_text):
+            canvas.itemconfigure(item, state='normal')
+            canvas.tag_raise(item)
+
+    def hide_tooltip(self):
+        """Hide the hover marker and tooltip"""
+        for item in (self.marker, self.tip_box, self.tip_text):
+            self.canvas.itemconfigure(item, state='hidden')
+
+
+class DashboardCanvas:
+    """Dashboard category sections and account rows drawn on one Canvas.
+
+    Replaces the per-account Frames, Labels and Buttons for ledgers with
+    many accounts. The layout is a list of fixed-height rows computed once
+    per refresh; only the rows inside the visible part of the scrolling
+    viewport are drawn, and they are redrawn as it scrolls. Buttons are
+    found by hit-testing the pointer against the row layout, and all text
+    uses the GUI's shared named fonts.
+    """
+
+    ROW_HEIGHTS = {'header': 56, 'account': 44, 'add': 56, 'total': 56, 'gap': 20}
+    BUTTON_WIDTH = 40
+    BUTTON_GAP = 6
+    PAD = 25
+
+    def __init__(self, gui, parent, viewport):
+        self.gui = gui
+        self.viewport = viewport
+        self.canvas = tk.Canvas(parent, bg='#0f172a', height=1, highlightthickness=0)
+        self.canvas.pack(fill='x', padx=20, pady=10)
+        self.rows = []
+        self.tops = []
+        self.drawn = None
+        self.canvas.bind('<Configure>', lambda e: self.draw(force=True))
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.canvas.bind('<Motion>', self.on_motion)
+        gui._bind_mousewheel(self.canvas, viewport)
+
+    def layout(self, totals):
+        """Lay out every category and account as rows of (top, height, kind, payload)"""
+        ledger = self.gui.ledger
+        category_totals = {'Cash & Bank': totals['cash_bank'],
+                           'Crypto & Investments': totals['crypto'],
+                           'Upcoming': totals['upcoming']}
+        rows = []
+        y = 0
+        for category, accounts in ledger.data['categories'].items():
+            section = [('header', category)]
+            section += [('account', self.account_row(category, aid, balance)) for aid, balance in accounts.items()]
+            section += [('add', category), ('total', (category, category_totals.get(category, 0))), ('gap', None)]
+            for kind, payload in section:
+                rows.append((y, self.ROW_HEIGHTS[kind], kind, payload))
+                y += self.ROW_HEIGHTS[kind]
+        self.rows = rows
+        self.tops = [row[0] for row in rows]
+        self.canvas.configure(height=y)
+        self.draw(force=True)
+
+    def account_row(self, category, aid, balance):
+        """Display strings and actions for one account row"""
+        ledger = self.gui.ledger
+        notes = []
+        major = from_minor(balance, ledger.account_currency(aid))
+        if ledger.is_usd_account(aid):
+            balance_text = f"$ {major:,.2f}"
+            notes.append((f"(≈ {ledger.to_lkr(balance, aid):,.2f} LKR)", '#94a3b8'))
+        else:
+            balance_text = f"{major:,.2f} LKR"
+
+        limit = ledger.data['budgets']['accounts'].get(aid)
+        if limit and ledger.data['budget_counters']['accounts'].get(aid, 0) > limit:
+            notes.append(("⚠️ Over budget", '#ef4444'))
+        status = ledger.reconciliation_status(aid)
+        if status['reconciled']:
+            notes.append((f"✓ Reconciled {status['date']}", '#10b981'))
+        elif status['statement'] is not None or status['difference']:
+            difference = from_minor(status['difference'], ledger.account_currency(aid))
+            notes.append((f"⚖️ Unreconciled ({difference:+,.2f} untracked)", '#f59e0b'))
+
+        buttons = [("✏️", '#3b82f6', lambda: self.gui.edit_balance(aid)),
+                   ("⚖️", '#475569', lambda: self.gui.reconcile_account(aid))]
+        if category == 'Crypto & Investments':
+            buttons.append(("📈", '#10b981', lambda: self.gui.show_holdings(aid)))
+        return {'name': ledger.account_name(aid), 'balance': balance_text, 'notes': notes, 'buttons': buttons}
+
+    def buttons(self, row, width):
+        """Button boxes (x1, y1, x2, y2, icon, color, action) of a row; used to draw and to hit-test"""
+        top, height, kind, payload = row
+        if kind == 'add':
+            return [(self.PAD, top + 10, self.PAD + 140, top + height - 10, "+ Add Account", '#475569',
+                     lambda: self.gui.add_account(payload))]
+        if kind != 'account':
+            return []
+        boxes = []
+        x = width - self.PAD
+        for icon, color, action in payload['buttons']:
+            boxes.append((x - self.BUTTON_WIDTH, top + 7, x, top + height - 7, icon, color, action))
+            x -= self.BUTTON_WIDTH + self.BUTTON_GAP
+        return boxes
+
+    def row_at(self, y):
+        """The row under a canvas y coordinate, or None"""
+        i = bisect_right(self.tops, y) - 1
+        return self.rows[i] if 0 <= i < len(self.rows) else None
+
+    def draw(self, force=False):
+        """Draw the rows inside the viewport's visible area, if that changed"""
+        if not self.canvas.winfo_exists():
+            return
+        top = self.viewport.canvasy(0) - self.canvas.winfo_y()
+        bottom = top + self.viewport.winfo_height()
+        first = max(bisect_right(self.tops, top) - 1, 0)
+        last = bisect_right(self.tops, bottom)
+        width = self.canvas.winfo_width()
+        if not force and self.drawn == (first, last, width):
+            return
+        self.drawn = (first, last, width)
+        self.canvas.delete('all')
+        for row in self.rows[first:last]:
+            self.draw_row(row, width)
+
+    def draw_row(self, row, width):
+        """Draw one row's items"""
+        canvas, fonts = self.canvas, self.gui.fonts
+        top, height, kind, payload = row
+        middle = top + height / 2
+        if kind == 'gap':
+            return
+        if kind == 'header':
+            icon = {'Cash & Bank': '🏦', 'Crypto & Investments': '₿', 'Upcoming': '📅'}.get(payload, '💼')
+            canvas.create_rectangle(0, top, width, top + height, fill='#334155', outline='')
+            canvas.create_text(self.PAD, middle, text=f"{icon} {payload}", anchor='w',
+                               font=fonts['heading'], fill='#ffffff')
+            return
+        if kind == 'total':
+            category, value = payload
+            canvas.create_rectangle(0, top, width, top + height, fill='#1e293b', outline='')
+            canvas.create_rectangle(self.PAD, top + 6, width - self.PAD, top + height - 6, fill='#0f172a', outline='')
+            canvas.create_text(self.PAD + 10, middle, text=f"TOTAL {category.upper()}", anchor='w',
+                               font=fonts['bold'], fill='#94a3b8')
+            canvas.create_text(width - self.PAD - 10, middle, text=f"{value:,.2f} LKR", anchor='e',
+                               font=fonts['total'], fill='#10b981')
+            return
+
+        canvas.create_rectangle(0, top, width, top + height, fill='#1e293b', outline='')
+        boxes = self.buttons(row, width)
+        for x1, y1, x2, y2, icon, color, _ in boxes:
+            canvas.create_rectangle(x1, y1, x2, y2, fill=color, outline='')
+            canvas.create_text((x1 + x2) / 2, (y1 + y2) / 2, text=icon, font=fonts['button'], fill='white')
+        if kind != 'account':
+            return
+
+        canvas.create_text(self.PAD, middle, text=payload['name'], anchor='w', font=fonts['body'], fill='#e2e8f0')
+        x = (boxes[-1][0] if boxes else width - self.PAD) - 10
+        canvas.create_text(x, middle, text=payload['balance'], anchor='e', font=fonts['bold'], fill='#10b981')
+        x -= fonts['bold'].measure(payload['balance']) + 15
+        for text, color in payload['notes']:
+            canvas.create_text(x, middle, text=text, anchor='e', font=fonts['small'], fill=color)
+            x -= fonts['small'].measure(text) + 15
+
+    def hit(self, event):
+        """The action of the button under the pointer, or None"""
+        row = self.row_at(event.y)
+        if row is None:
+            return None
+        for x1, y1, x2, y2, _, _, action in self.buttons(row, self.canvas.winfo_width()):
+            if x1 <= event.x <= x2 and y1 <= event.y <= y2:
+                return action
+        return None
+
+    def on_click(self, event):
+        action = self.hit(event)
+        if action:
+            action()
+
+    def on_motion(self, event):
+        self.canvas.configure(cursor='hand2' if self.hit(event) else '')
+
 
 class FinanceTrackerGUI:
-    def __init__(self, root):
+    def __init__(self, root, read_only=False, api_port=None):
         self.root = root
-        self.root.title("Finance Tracker Pro")
+        self.root.title("Finance Tracker Pro (read-only)" if read_only else "Finance Tracker Pro")
         self.root.geometry("1400x800")
         self.root.configure(bg='#0f172a')
-
-        self.data_file = 'finance_data.json'
-        self.usd_to_lkr = 290.0
-        self.data = self.load_data()
+        self.root.report_callback_exception = self.report_callback_exception
+
+        self.profiles = ProfileManager('finance_profiles.json', read_only)
+        if not self.open_profile(self.profiles.registry['active']):
+            self.root.destroy()
+            raise SystemExit
+
+        # Shared named fonts for views drawn on a Canvas
+        self.fonts = {
+            'heading': tkfont.Font(root=root, name='DashboardHeading', family='Segoe UI', size=14, weight='bold'),
+            'body': tkfont.Font(root=root, name='DashboardBody', family='Segoe UI', size=11),
+            'bold': tkfont.Font(root=root, name='DashboardBold', family='Segoe UI', size=11, weight='bold'),
+            'small': tkfont.Font(root=root, name='DashboardSmall', family='Segoe UI', size=9),
+            'button': tkfont.Font(root=root, name='DashboardButton', family='Segoe UI', size=10),
+            'total': tkfont.Font(root=root, name='DashboardTotal', family='Segoe UI', size=14, weight='bold')
+        }
 
         # Modern styling
         style = ttk.Style()
@@ -24,6 +4421,8 @@ class FinanceTrackerGUI:
         style.map('TNotebook.Tab', background=[('selected', '#3b82f6')], 
                     foreground=[('selected', 'white')])
 
+        self.build_quick_entry()
+
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill='both', expand=True, padx=0, pady=0)
 
@@ -44,50 +4443,208 @@ class FinanceTrackerGUI:
         self.build_tracker_tab()
         self.build_settings_tab() # This tab is now scrollable
 
+        # Verify the ledger in the background once the window is up
+        self.root.after(1000, lambda: self.check_integrity(quiet=True))
+
+        self.refresh_home()
+        self.refresh_rule_tab()
+
+        # Undo/redo shortcuts for every ledger change
+        self.root.bind('<Control-z>', self.undo)
+        self.root.bind('<Control-y>', self.redo)
+        self.root.bind('<Control-Shift-Z>', self.redo)
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        # Pick up changes saved by another instance of the app, and events from other threads
+        self.root.after(LEDGER_POLL_MS, self.poll_external_changes)
+        self.root.after(EVENT_PUMP_MS, self.pump_events)
+
+        self.api = None
+        if api_port is not None:
+            self.api = LedgerAPI(lambda: self.ledger, api_port)
+
+    def build_quick_entry(self):
+        """One-line transaction entry above the tabs; Ctrl+L focuses it.
+
+        Its widgets are created once: suggestions and results appear in
+        the status label next to it, Tab accepts the first suggestion and
+        Enter adds the transaction.
+        """
+        bar = tk.Frame(self.root, bg='#1e293b')
+        bar.pack(fill='x')
+
+        tk.Label(bar, text="⚡ Quick Entry", font=('Segoe UI', 10, 'bold'),
+                 bg='#1e293b', fg='#94a3b8').pack(side='left', padx=(20, 10), pady=8)
+        self.quick_entry = tk.Entry(bar, font=('Segoe UI', 11), width=45, bg='#0f172a',
+                                    fg='#e2e8f0', insertbackground='white', relief='flat')
+        self.quick_entry.pack(side='left', pady=8, ipady=4)
+        self.quick_status = tk.Label(bar, font=('Segoe UI', 9), bg='#1e293b', fg='#64748b', anchor='w')
+        self.quick_status.pack(side='left', fill='x', expand=True, padx=(10, 20))
+        self.quick_completion = (0, [])
+        self.update_quick_suggestions()
+
+        self.quick_entry.bind('<KeyRelease>', self.update_quick_suggestions)
+        self.quick_entry.bind('<Tab>', self.complete_quick_entry)
+        self.quick_entry.bind('<Return>', self.commit_quick_entry)
+        self.quick_entry.bind('<Escape>', lambda e: (self.quick_entry.delete(0, 'end'),
+                                                     self.update_quick_suggestions()))
+        self.root.bind('<Control-l>', lambda e: self.quick_entry.focus_set())
+
+    def quick_entry_context(self, text):
+        """What the word being typed completes: (trie name or None, index where the completed text starts)"""
+        tokens = list(re.finditer(r'\S+', text))
+        current = tokens.pop() if tokens and not text[-1].isspace() else None
+        if current is not None and current.group()[0] in '#@':
+            return ('rule_category' if current.group()[0] == '#' else None), current.start() + 1
+        words = [token for token in tokens if token.group()[0] not in '#@']
+        if not words or not re.fullmatch(r'[+-]?[\d.,]+', words[0].group()):
+            return None, 0
+        words = words[1:]
+        start = words[0].start() if words else (current.start() if current else len(text))
+        if current is not None and self.ledger.completions()['account'].complete(text[start:], 1):
+            return 'account', start
+        aid, used = self.ledger.match_account([token.group() for token in words])
+        if aid is None:
+            return 'account', start
+        if used < len(words):
+            return 'description', words[used].start()
+        return 'description', current.start() if current else len(text)
+
+    def update_quick_suggestions(self, event=None):
+        """Show completions for the word at the cursor"""
+        if event is not None and event.keysym in ('Tab', 'Return', 'Escape'):
+            return
+        text = self.quick_entry.get()[:self.quick_entry.index('insert')]
+        kind, start = self.quick_entry_context(text)
+        suggestions = []
+        if kind is not None and (text[start:].strip() or kind != 'description'):
+            suggestions = [match for match, _ in self.ledger.completions()[kind].complete(text[start:], 5)]
+        self.quick_completion = (start, suggestions)
+        if suggestions:
+            self.quick_status.config(text="Tab: " + "  ·  ".join(suggestions), fg='#94a3b8')
+        elif not text.strip():
+            self.quick_status.config(text="e.g.  -1500 Sampath groceries #essentials  "
+                                          "(optional @YYYY-MM-DD, Enter to add)", fg='#64748b')
+        elif event is not None:
+            self.quick_status.config(text="")
+
+    def complete_quick_entry(self, event=None):
+        """Replace the word being typed with the first suggestion"""
+        start, suggestions = self.quick_completion
+        if suggestions:
+            cursor = self.quick_entry.index('insert')
+            self.quick_entry.delete(start, cursor)
+            self.quick_entry.insert(start, suggestions[0] + ' ')
+            self.update_quick_suggestions()
+        return 'break'
+
+    def commit_quick_entry(self, event=None):
+        """Add the typed transaction, reporting in the status label instead of a dialog"""
+        try:
+            trans = self.ledger.quick_add(self.quick_entry.get())
+        except (ValueError, LedgerReadOnlyError) as e:
+            self.quick_status.config(text=f"⚠️ {e}", fg='#ef4444')
+            return 'break'
+        currency = self.ledger.account_currency(trans['account_id'])
+        self.quick_status.config(text=f"✓ Added {trans['description']} ({from_minor(trans['amount'], currency):+,.2f}) "
+                                      f"to {self.ledger.account_name(trans['account_id'])} • Ctrl+Z to undo",
+                                 fg='#10b981')
+        self.quick_entry.delete(0, 'end')
+        self.quick_completion = (0, [])
+        return 'break'
+
+    def open_profile(self, name):
+        """Make a profile's ledger current, asking for its passphrase if needed; False if it can't be opened"""
+        passphrase = None
+        while True:
+            try:
+                self.ledger = self.profiles.open(name, passphrase)
+                self.subscribe_views(self.ledger)
+                return True
+            except LedgerPassphraseError as e:
+                passphrase = simpledialog.askstring("Encrypted Ledger", f"{name}: {e}. Enter passphrase:",
+                                                    show='*', parent=self.root)
+                if passphrase is None:
+                    return False
+            except (OSError, ValueError) as e:
+                messagebox.showerror("Error", f"Could not open the {name} ledger:\n{e}", parent=self.root)
+                return False
+
+    def switch_profile(self, name):
+        """Switch the whole app to another profile"""
+        if name == self.profiles.registry['active'] or not self.open_profile(name):
+            self.refresh_home()
+            return
+
         self.refresh_home()
+        self.refresh_tracker()
         self.refresh_rule_tab()
+        for widget in self.settings_frame.winfo_children():
+            widget.destroy()
+        self.build_settings_tab()
 
-    def load_data(self):
-        """Load data from JSON file"""
-        if os.path.exists(self.data_file):
-            with open(self.data_file, 'r') as f:
-                data = json.load(f)
-                self.usd_to_lkr = data.get('exchange_rate', 290.0)
-                return data
+    def new_profile(self):
+        """Create a profile and switch to it"""
+        name = simpledialog.askstring("New Profile", "Enter a name for the new ledger:")
+        if not name or not name.strip():
+            return
+        name = name.strip()
+        if name in self.profiles.registry['profiles']:
+            messagebox.showerror("Error", "Profile already exists!")
+            return
+        self.profiles.create(name)
+        self.switch_profile(name)
+
+    def on_close(self):
+        """Remember profile totals, then quit"""
+        if self.api:
+            self.api.stop()
+        self.profiles.close()
+        self.root.destroy()
+
+    def report_callback_exception(self, exc, value, tb):
+        """Show read-only refusals as a message instead of a traceback"""
+        if isinstance(value, LedgerReadOnlyError):
+            messagebox.showerror("Read-only", str(value))
         else:
-            return {
-                'exchange_rate': 290.0,
-                'rule_percentages': {
-                    'growth': 25,
-                    'stability': 15,
-                    'essentials': 50,
-                    'rewards': 10
-                },
-                'categories': {
-                    'Cash & Bank': {
-                        'Com Bank Main Acc': 0.00,
-                        'MM Acc': 0.00,
-                        'Boc Bank Main Acc': 0.00,
-                        'Sampath Acc': 0.00,
-                        'On Hand': 0.00
-                    },
-                    'Crypto & Investments': {
-                        'Crypto $': 0.00,
-                        'CAL': 0.00,
-                        'CSE': 0.00,
-                        'Ez Cash': 0.00,
-                        'Paynoree Skrill': 0.00
-                    },
-                    'Upcoming': {}
-                },
-                'transactions': []
-            }
+            tk.Tk.report_callback_exception(self.root, exc, value, tb)
 
-    def save_data(self):
-        """Save data to JSON file"""
-        self.data['exchange_rate'] = self.usd_to_lkr
-        with open(self.data_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
+    def subscribe_views(self, ledger):
+        """Route a ledger's events to the views while it is the active profile"""
+        if ledger.events.ui_dispatch is not None:
+            return
+        ledger.events.ui_dispatch = self.root.after_idle
+
+        def on_events(events):
+            if ledger is self.ledger:
+                self.on_ledger_events(events)
+
+        ledger.events.subscribe(on_events)
+
+    def on_ledger_events(self, events):
+        """Refresh only the views a batch of ledger events affects"""
+        if any(isinstance(event, (TransactionAdded, TransactionDeleted, TransactionUpdated,
+                                  AccountRenamed, LedgerReloaded)) for event in events):
+            # The ledger keeps its sort indexes current, so only the rows in view are redrawn
+            self.refresh_tracker()
+
+        if not all(isinstance(event, RulesChanged) for event in events):
+            self.refresh_home()
+        if any(isinstance(event, (BalanceEdited, AccountAdded, AccountDeleted, RateChanged,
+                                  RulesChanged, SettingChanged, LedgerReloaded)) for event in events):
+            self.refresh_rule_tab()
+
+    def poll_external_changes(self):
+        """Merge in changes another instance saved; the views update from the events"""
+        self.ledger.check_external_changes()
+        self.root.after(LEDGER_POLL_MS, self.poll_external_changes)
+
+    def pump_events(self):
+        """Deliver what other threads published or queued for the Tk thread, for every open profile"""
+        for ledger in list(self.profiles.ledgers.values()):
+            ledger.events.deliver_ui()
+        self.root.after(EVENT_PUMP_MS, self.pump_events)
 
     # --- NEW FUNCTION TO HANDLE ALL SCROLLING ---
     def _bind_mousewheel(self, widget, canvas):
@@ -136,7 +4693,19 @@ class FinanceTrackerGUI:
             self.home_canvas.itemconfig(canvas_frame, width=event.width)
 
         self.home_canvas.bind('<Configure>', configure_canvas)
-        self.home_canvas.configure(yscrollcommand=scrollbar.set)
+
+        # A canvas-drawn account list redraws whatever scrolled into view
+        self.dashboard_canvas = None
+
+        # Created by the first refresh, then updated in place
+        self.portfolio_chart = None
+
+        def on_home_scroll(first, last):
+            scrollbar.set(first, last)
+            if self.dashboard_canvas:
+                self.dashboard_canvas.draw()
+
+        self.home_canvas.configure(yscrollcommand=on_home_scroll)
 
         # --- MOUSE WHEEL SCROLLING (FIXED) ---
         # Bind the canvas AND the inner frame for scrolling
@@ -149,8 +4718,13 @@ class FinanceTrackerGUI:
 
     def refresh_home(self):
         """Refresh home dashboard display"""
+        # The portfolio chart is kept and only repacked in its place
+        chart_container = self.portfolio_chart and self.portfolio_chart.canvas.master
         for widget in self.home_content.winfo_children():
-            widget.destroy()
+            if widget is chart_container:
+                widget.pack_forget()
+            else:
+                widget.destroy()
 
         # Modern Header
         header = tk.Frame(self.home_content, bg='#1e293b', height=100)
@@ -166,12 +4740,35 @@ class FinanceTrackerGUI:
         tk.Label(header_inner, text=date_info, font=('Segoe UI', 11),
                  bg='#1e293b', fg='#94a3b8').pack(anchor='w', pady=(5, 0))
 
-        rate_text = f"Exchange Rate: 1 USD = {self.usd_to_lkr} LKR"
+        rate_text = f"Exchange Rate: 1 USD = {self.ledger.usd_to_lkr} LKR"
         tk.Label(header_inner, text=rate_text, font=('Segoe UI', 10),
                  bg='#1e293b', fg='#64748b').pack(anchor='w', pady=(2, 0))
 
+        # Profile switcher
+        profile_frame = tk.Frame(header, bg='#1e293b')
+        profile_frame.place(relx=1.0, x=-30, y=20, anchor='ne')
+
+        tk.Label(profile_frame, text="Profile:", font=('Segoe UI', 10, 'bold'),
+                 bg='#1e293b', fg='#94a3b8').pack(side='left', padx=5)
+
+        profile_var = tk.StringVar(value=self.profiles.registry['active'])
+        profile_combo = ttk.Combobox(profile_frame, textvariable=profile_var,
+                                     values=self.profiles.names(), font=('Segoe UI', 10),
+                                     state='readonly', width=18)
+        profile_combo.pack(side='left', padx=5)
+        profile_combo.bind('<<ComboboxSelected>>', lambda e: self.switch_profile(profile_var.get()))
+
+        tk.Button(profile_frame, text="+ New", font=('Segoe UI', 9),
+                  bg='#475569', fg='white', relief='flat', cursor='hand2',
+                  padx=10, pady=4, command=self.new_profile).pack(side='left', padx=5)
+
+        if len(self.profiles.names()) > 1:
+            combined = self.profiles.consolidated_totals()
+            tk.Label(header_inner, text=f"All profiles net worth: LKR {combined['real_total']:,.2f}",
+                     font=('Segoe UI', 10, 'bold'), bg='#1e293b', fg='#10b981').pack(anchor='w', pady=(2, 0))
+
         # Calculate totals
-        totals = self.calculate_totals()
+        totals = self.ledger.calculate_totals()
 
         # Summary Cards
         cards_frame = tk.Frame(self.home_content, bg='#0f172a')
@@ -193,9 +4790,28 @@ class FinanceTrackerGUI:
         # Portfolio Chart
         self.create_portfolio_chart()
 
+        # Monthly Budgets
+        self.create_budget_section()
+
+        # Savings Goals
+        self.create_goals_section()
+
         # Categories
-        for category, accounts in self.data['categories'].items():
-            self.create_modern_category(category, accounts, totals)
+        if self.use_canvas_dashboard():
+            self.dashboard_canvas = DashboardCanvas(self, self.home_content, self.home_canvas)
+            self.dashboard_canvas.layout(totals)
+        else:
+            self.dashboard_canvas = None
+            for category, accounts in self.ledger.data['categories'].items():
+                self.create_modern_category(category, accounts, totals)
+
+    def use_canvas_dashboard(self):
+        """Whether to draw the account rows on one Canvas instead of with widgets"""
+        renderer = self.ledger.data.get('dashboard_renderer', 'auto')
+        if renderer == 'auto':
+            count = sum(len(accounts) for accounts in self.ledger.data['categories'].values())
+            return count > DASHBOARD_CANVAS_ACCOUNTS
+        return renderer == 'canvas'
 
     def create_modern_card(self, parent, title, value, color, column):
         """Create modern gradient card"""
@@ -216,128 +4832,34 @@ class FinanceTrackerGUI:
                  bg=color, fg='white', anchor='w').pack(fill='x', padx=20, pady=(0, 20))
 
     def create_portfolio_chart(self):
-        """Create portfolio trend chart"""
+        """Create the interactive portfolio trend chart, or repack and update the existing one"""
+        if self.portfolio_chart is not None:
+            self.portfolio_chart.canvas.master.pack(fill='x', padx=20, pady=10)
+            self.portfolio_chart.update_series()
+            return
+
         chart_container = tk.Frame(self.home_content, bg='#1e293b', relief='flat')
         chart_container.pack(fill='x', padx=20, pady=10)
 
         header = tk.Frame(chart_container, bg='#1e293b')
         header.pack(fill='x', padx=25, pady=(20, 10))
 
-        tk.Label(header, text="📊 Portfolio Trend (Last 30 Days)", 
+        tk.Label(header, text="📊 Portfolio Trend",
                  font=('Segoe UI', 16, 'bold'),
-                 bg='#1e293b', fg='#ffffff').pack(anchor='w')
-
-        # Create canvas for chart
-        chart_canvas = tk.Canvas(chart_container, bg='#0f172a', height=250, 
-                                 highlightthickness=0)
-        chart_canvas.pack(fill='x', padx=25, pady=(10, 25))
-
-        # Generate sample data points based on transactions
-        data_points = self.generate_chart_data()
-
-        if len(data_points) > 1:
-            # Draw chart
-            self.draw_line_chart(chart_canvas, data_points)
-        else:
-            tk.Label(chart_canvas, text="Add transactions to see portfolio trends",
-                     font=('Segoe UI', 12), bg='#0f172a', fg='#64748b').place(relx=0.5, rely=0.5, anchor='center')
-
-    def generate_chart_data(self):
-        """Generate chart data from transactions"""
-        current_total = self.calculate_totals()['real_total']
-
-        # Create 30 data points
-        data_points = []
-
-        if not self.data['transactions']:
-            # If no transactions, show flat line
-            for i in range(30):
-                data_points.append(current_total)
-            return data_points
-
-        # Sort transactions by date
-        sorted_trans = sorted(self.data['transactions'], 
-                              key=lambda x: x.get('timestamp', ''), reverse=True)
-
-        # Calculate running balance backwards
-        balance = current_total
-        date_balances = {datetime.now().date(): balance}
-
-        for trans in sorted_trans[:60]: # Last 60 transactions
-            balance -= trans['amount']
-            try:
-                trans_date = datetime.fromisoformat(trans['timestamp']).date()
-                date_balances[trans_date] = balance
-            except:
-                pass
-
-        # Fill 30 days
-        for i in range(29, -1, -1):
-            date = (datetime.now() - timedelta(days=i)).date()
-            if date in date_balances:
-                data_points.append(date_balances[date])
-            else:
-                data_points.append(data_points[-1] if data_points else current_total)
-
-        return data_points
-
-    def draw_line_chart(self, canvas, data_points):
-        """Draw line chart on canvas"""
-        canvas.update()
-        width = canvas.winfo_width()
-        height = canvas.winfo_height()
-
-        if width <= 1 or height <= 1:
-            width = 1000
-            height = 250
-
-        padding = 50
-        chart_width = width - 2 * padding
-        chart_height = height - 2 * padding
-
-        # Find min/max for scaling
-        min_val = min(data_points)
-        max_val = max(data_points)
-        value_range = max_val - min_val if max_val != min_val else 1
-
-        # Draw grid lines
-        for i in range(5):
-            y = padding + (chart_height * i / 4)
-            canvas.create_line(padding, y, width - padding, y,
-                                fill='#1e293b', width=1)
-            value = max_val - (value_range * i / 4)
-            canvas.create_text(padding - 10, y, text=f"{value/1000:.0f}K",
-                                fill='#64748b', anchor='e', font=('Segoe UI', 9))
-
-        # Draw line
-        points = []
-        for i, value in enumerate(data_points):
-            x = padding + (chart_width * i / (len(data_points) - 1))
-            y = padding + chart_height - ((value - min_val) / value_range * chart_height)
-            points.extend([x, y])
-
-        if len(points) >= 4:
-            # Draw gradient fill
-            fill_points = points + [width - padding, height - padding, padding, height - padding]
-            canvas.create_polygon(fill_points, fill='#3b82f6', stipple='gray50', 
-                                  outline='')
-
-            # Draw line
-            canvas.create_line(points, fill='#60a5fa', width=3, smooth=True)
-
-            # Draw points
-            for i in range(0, len(points), 2):
-                canvas.create_oval(points[i]-4, points[i+1]-4,
-                                   points[i]+4, points[i+1]+4,
-                                   fill='#3b82f6', outline='#60a5fa', width=2)
-
-        # X-axis labels
-        for i in [0, len(data_points)//2, len(data_points)-1]:
-            x = padding + (chart_width * i / (len(data_points) - 1))
-            days_ago = len(data_points) - 1 - i
-            date = (datetime.now() - timedelta(days=days_ago)).strftime('%m/%d')
-            canvas.create_text(x, height - padding + 20, text=date,
-                                fill='#64748b', font=('Segoe UI', 9))
+                 bg='#1e293b', fg='#ffffff').pack(side='left')
+        tk.Label(header, text="Scroll to zoom • drag to pan", font=('Segoe UI', 9),
+                 bg='#1e293b', fg='#64748b').pack(side='left', padx=15)
+
+        presets = tk.Frame(header, bg='#1e293b')
+        presets.pack(side='right')
+        chart = self.portfolio_chart = PortfolioChart(self, chart_container)
+        for label, _ in reversed(PortfolioChart.RANGES):
+            button = tk.Button(presets, text=label, font=('Segoe UI', 9, 'bold'), fg='white',
+                               relief='flat', cursor='hand2', padx=10, pady=3,
+                               command=lambda label=label: chart.set_range(label))
+            button.pack(side='right', padx=2)
+            chart.preset_buttons[label] = button
+        chart.set_range(chart.range)
 
     def create_modern_category(self, category, accounts, totals):
         """Create modern category section"""
@@ -353,18 +4875,19 @@ class FinanceTrackerGUI:
                  bg='#334155', fg='#ffffff').pack(side='left', padx=25, pady=15)
 
         # Accounts
-        for account, balance in accounts.items():
+        for aid, balance in accounts.items():
             acc_frame = tk.Frame(section, bg='#1e293b')
             acc_frame.pack(fill='x', padx=25, pady=8)
 
             # Account name
-            tk.Label(acc_frame, text=account, font=('Segoe UI', 11),
+            tk.Label(acc_frame, text=self.ledger.account_name(aid), font=('Segoe UI', 11),
                      bg='#1e293b', fg='#e2e8f0', anchor='w').pack(side='left', fill='x', expand=True)
 
             # Balance
-            if account == 'Crypto $':
+            lkr_value = self.ledger.to_lkr(balance, aid)
+            balance = from_minor(balance, self.ledger.account_currency(aid))
+            if self.ledger.is_usd_account(aid):
                 balance_text = f"$ {balance:,.2f}"
-                lkr_value = balance * self.usd_to_lkr
                 tk.Label(acc_frame, text=f"(≈ {lkr_value:,.2f} LKR)", font=('Segoe UI', 9),
                          bg='#1e293b', fg='#94a3b8').pack(side='right', padx=10)
                 tk.Label(acc_frame, text=balance_text, font=('Segoe UI', 11, 'bold'),
@@ -373,13 +4896,41 @@ class FinanceTrackerGUI:
                 tk.Label(acc_frame, text=f"{balance:,.2f} LKR", font=('Segoe UI', 11, 'bold'),
                          bg='#1e293b', fg='#10b981').pack(side='right', padx=10)
 
+            # Over-budget indicator
+            limit = self.ledger.data['budgets']['accounts'].get(aid)
+            if limit and self.ledger.data['budget_counters']['accounts'].get(aid, 0) > limit:
+                tk.Label(acc_frame, text="⚠️ Over budget", font=('Segoe UI', 9, 'bold'),
+                         bg='#1e293b', fg='#ef4444').pack(side='right', padx=10)
+
+            # Reconciliation state
+            status = self.ledger.reconciliation_status(aid)
+            if status['reconciled']:
+                tk.Label(acc_frame, text=f"✓ Reconciled {status['date']}", font=('Segoe UI', 9),
+                         bg='#1e293b', fg='#10b981').pack(side='right', padx=10)
+            elif status['statement'] is not None or status['difference']:
+                difference = from_minor(status['difference'], self.ledger.account_currency(aid))
+                tk.Label(acc_frame, text=f"⚖️ Unreconciled ({difference:+,.2f} untracked)",
+                         font=('Segoe UI', 9), bg='#1e293b', fg='#f59e0b').pack(side='right', padx=10)
+
             # Edit button
             edit_btn = tk.Button(acc_frame, text="✏️", font=('Segoe UI', 10),
                                   bg='#3b82f6', fg='white', relief='flat',
                                   cursor='hand2', padx=10, pady=4,
-                                  command=lambda c=category, a=account: self.edit_balance(c, a))
+                                  command=lambda a=aid: self.edit_balance(a))
             edit_btn.pack(side='right', padx=5)
 
+            reconcile_btn = tk.Button(acc_frame, text="⚖️", font=('Segoe UI', 10),
+                                      bg='#475569', fg='white', relief='flat',
+                                      cursor='hand2', padx=10, pady=4,
+                                      command=lambda a=aid: self.reconcile_account(a))
+            reconcile_btn.pack(side='right', padx=5)
+
+            if category == 'Crypto & Investments':
+                tk.Button(acc_frame, text="📈", font=('Segoe UI', 10),
+                          bg='#10b981', fg='white', relief='flat',
+                          cursor='hand2', padx=10, pady=4,
+                          command=lambda a=aid: self.show_holdings(a)).pack(side='right', padx=5)
+
         # Add account button
         add_frame = tk.Frame(section, bg='#1e293b')
         add_frame.pack(fill='x', padx=25, pady=15)
@@ -403,28 +4954,276 @@ class FinanceTrackerGUI:
         tk.Label(total_frame, text=f"{total_value:,.2f} LKR", font=('Segoe UI', 14, 'bold'),
                  bg='#0f172a', fg='#10b981').pack(side='right')
 
-    def calculate_totals(self):
-        """Calculate all totals"""
-        cash_bank = sum(self.data['categories']['Cash & Bank'].values())
+    def create_budget_section(self):
+        """Create monthly budget section"""
+        status = self.ledger.get_budget_status()
+        over = [s for s in status if s[3] > s[2]]
 
-        crypto_lkr = sum(v for k, v in self.data['categories']['Crypto & Investments'].items() 
-                         if k != 'Crypto $')
-        crypto_usd = self.data['categories']['Crypto & Investments'].get('Crypto $', 0)
-        crypto_usd_lkr = crypto_usd * self.usd_to_lkr
-        crypto_total = crypto_lkr + crypto_usd_lkr
+        section = tk.Frame(self.home_content, bg='#1e293b', relief='flat')
+        section.pack(fill='x', padx=20, pady=10)
 
-        upcoming = sum(self.data['categories']['Upcoming'].values())
+        header = tk.Frame(section, bg='#334155')
+        header.pack(fill='x')
 
-        real_total = cash_bank + crypto_total
-        total = real_total + upcoming
+        month = datetime.now().strftime('%B %Y')
+        tk.Label(header, text=f"📋 Monthly Budgets ({month})", font=('Segoe UI', 14, 'bold'),
+                 bg='#334155', fg='#ffffff').pack(side='left', padx=25, pady=15)
 
-        return {
-            'cash_bank': cash_bank,
-            'crypto': crypto_total,
-            'upcoming': upcoming,
-            'real_total': real_total,
-            'total': total
+        if over:
+            tk.Label(header, text=f"⚠️ {len(over)} over budget", font=('Segoe UI', 11, 'bold'),
+                     bg='#334155', fg='#ef4444').pack(side='right', padx=25)
+
+        if not status:
+            tk.Label(section, text="No budgets set yet", font=('Segoe UI', 11),
+                     bg='#1e293b', fg='#64748b').pack(anchor='w', padx=25, pady=(15, 0))
+
+        for kind, name, limit, spent in status:
+            row = tk.Frame(section, bg='#1e293b')
+            row.pack(fill='x', padx=25, pady=8)
+
+            label = name if kind == 'rule_categories' else f"{self.ledger.account_name(name)} (account)"
+            tk.Label(row, text=label, font=('Segoe UI', 11),
+                     bg='#1e293b', fg='#e2e8f0', width=28, anchor='w').pack(side='left')
+
+            color = '#ef4444' if spent > limit else '#10b981'
+            bar = tk.Canvas(row, bg='#1e293b', height=14, width=300, highlightthickness=0)
+            bar.pack(side='left', padx=10)
+            bar.create_rectangle(0, 0, 300, 14, fill='#334155', outline='')
+            fill_width = 300 * min(spent / limit, 1) if limit > 0 else 0
+            if fill_width > 0:
+                bar.create_rectangle(0, 0, fill_width, 14, fill=color, outline='')
+
+            tk.Label(row, text=f"{from_minor(spent):,.2f} / {from_minor(limit):,.2f} LKR", font=('Segoe UI', 11, 'bold'),
+                     bg='#1e293b', fg=color).pack(side='right', padx=10)
+
+        btn_frame = tk.Frame(section, bg='#1e293b')
+        btn_frame.pack(fill='x', padx=25, pady=15)
+
+        tk.Button(btn_frame, text="+ Set Budget", font=('Segoe UI', 10),
+                  bg='#475569', fg='white', relief='flat',
+                  cursor='hand2', padx=15, pady=8,
+                  command=self.set_budget).pack(side='left')
+
+    def set_budget(self):
+        """Set or remove a monthly budget"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Set Budget")
+        dialog.geometry("500x320")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        tk.Label(dialog, text="📋 Set Monthly Budget", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=20)
+
+        account_labels, account_ids = self.account_choices()
+        targets = [f"{cat} (Rule Category)" for cat in RULE_CATEGORIES] + account_labels
+        keys = [('rule_categories', cat) for cat in RULE_CATEGORIES]
+        keys += [('accounts', aid) for aid in account_ids]
+
+        target_var = tk.StringVar()
+        combo = ttk.Combobox(dialog, textvariable=target_var, values=targets,
+                             font=('Segoe UI', 11), state='readonly', width=35)
+        combo.pack(pady=5)
+        combo.current(0)
+
+        tk.Label(dialog, text="Monthly limit (0 removes the budget):", font=('Segoe UI', 11, 'bold'),
+                 bg='#1e293b', fg='#e2e8f0').pack(pady=10)
+
+        limit_entry = tk.Entry(dialog, font=('Segoe UI', 11), width=35,
+                               bg='#0f172a', fg='#e2e8f0', insertbackground='white')
+        limit_entry.pack(pady=5)
+
+        def confirm_budget():
+            try:
+                limit = to_minor(limit_entry.get())
+            except ValueError:
+                messagebox.showerror("Error", "Invalid amount!")
+                return
+
+            kind, key = keys[combo.current()]
+            self.ledger.set_budget(kind, key, limit if limit > 0 else None)
+            dialog.destroy()
+
+        btn_frame = tk.Frame(dialog, bg='#1e293b')
+        btn_frame.pack(pady=20)
+
+        tk.Button(btn_frame, text="✓ Save", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=confirm_budget).pack(side='left', padx=10)
+
+        tk.Button(btn_frame, text="Cancel", font=('Segoe UI', 11, 'bold'),
+                   bg='#64748b', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
+
+    def create_goals_section(self):
+        """Create the savings goals section with one card per goal"""
+        status = self.ledger.goal_status()
+
+        section = tk.Frame(self.home_content, bg='#1e293b', relief='flat')
+        section.pack(fill='x', padx=20, pady=10)
+
+        header = tk.Frame(section, bg='#334155')
+        header.pack(fill='x')
+
+        tk.Label(header, text="🎯 Savings Goals", font=('Segoe UI', 14, 'bold'),
+                 bg='#334155', fg='#ffffff').pack(side='left', padx=25, pady=15)
+
+        reached = sum(goal['status'] == 'reached' for goal in status)
+        if status:
+            tk.Label(header, text=f"{reached} of {len(status)} reached", font=('Segoe UI', 11, 'bold'),
+                     bg='#334155', fg='#10b981' if reached else '#94a3b8').pack(side='right', padx=25)
+        else:
+            tk.Label(section, text="No goals set yet", font=('Segoe UI', 11),
+                     bg='#1e293b', fg='#64748b').pack(anchor='w', padx=25, pady=(15, 0))
+
+        cards = tk.Frame(section, bg='#1e293b')
+        cards.pack(fill='x', padx=17, pady=(10, 0))
+        colors = {'reached': '#10b981', 'overdue': '#ef4444', 'active': '#3b82f6'}
+
+        for i, goal in enumerate(status):
+            card = tk.Frame(cards, bg='#334155')
+            card.grid(row=i // 3, column=i % 3, padx=8, pady=8, sticky='nsew')
+            cards.grid_columnconfigure(i % 3, weight=1)
+
+            top = tk.Frame(card, bg='#334155')
+            top.pack(fill='x', padx=15, pady=(12, 0))
+            tk.Label(top, text=goal['name'], font=('Segoe UI', 12, 'bold'),
+                     bg='#334155', fg='#ffffff', anchor='w').pack(side='left')
+            tk.Button(top, text="🗑️", font=('Segoe UI', 9), bg='#334155', fg='#e2e8f0',
+                      relief='flat', cursor='hand2',
+                      command=lambda gid=goal['id'], name=goal['name']: self.delete_goal(gid, name)).pack(side='right')
+            tk.Button(top, text="✏️", font=('Segoe UI', 9), bg='#334155', fg='#e2e8f0',
+                      relief='flat', cursor='hand2',
+                      command=lambda gid=goal['id']: self.edit_goal(gid)).pack(side='right')
+
+            if goal['rule_category']:
+                start = datetime.strptime(goal['start'], '%Y-%m-%d').strftime('%b %d, %Y')
+                tracks = f"{goal['rule_category']} since {start}"
+            else:
+                tracks = ', '.join(self.ledger.account_name(aid) for aid in goal['accounts'])
+            tk.Label(card, text=tracks, font=('Segoe UI', 9), bg='#334155', fg='#94a3b8',
+                     anchor='w').pack(fill='x', padx=15)
+
+            color = colors[goal['status']]
+            bar = tk.Canvas(card, bg='#334155', height=10, width=260, highlightthickness=0)
+            bar.pack(fill='x', padx=15, pady=(10, 5))
+            bar.create_rectangle(0, 0, 260, 10, fill='#475569', outline='')
+            fraction = min(max(goal['saved'] / goal['target'], 0), 1)
+            if fraction > 0:
+                bar.create_rectangle(0, 0, 260 * fraction, 10, fill=color, outline='')
+
+            tk.Label(card, text=f"LKR {from_minor(goal['saved']):,.2f} / {from_minor(goal['target']):,.2f} "
+                                f"({fraction:.0%})",
+                     font=('Segoe UI', 11, 'bold'), bg='#334155', fg=color, anchor='w').pack(fill='x', padx=15)
+
+            deadline = datetime.strptime(goal['deadline'], '%Y-%m-%d').strftime('%b %d, %Y')
+            if goal['status'] == 'reached':
+                detail = "✓ Target reached"
+            elif goal['status'] == 'overdue':
+                detail = f"⚠️ {deadline} passed, LKR {from_minor(goal['remaining']):,.2f} short"
+            else:
+                months = f"{goal['months_left']} month{'s' if goal['months_left'] != 1 else ''}"
+                detail = f"LKR {from_minor(goal['monthly']):,.2f}/month for {months} (by {deadline})"
+            tk.Label(card, text=detail, font=('Segoe UI', 10), bg='#334155',
+                     fg='#e2e8f0' if goal['status'] == 'active' else color,
+                     anchor='w').pack(fill='x', padx=15, pady=(2, 12))
+
+        btn_frame = tk.Frame(section, bg='#1e293b')
+        btn_frame.pack(fill='x', padx=25, pady=15)
+
+        tk.Button(btn_frame, text="+ Add Goal", font=('Segoe UI', 10),
+                  bg='#475569', fg='white', relief='flat',
+                  cursor='hand2', padx=15, pady=8,
+                  command=self.edit_goal).pack(side='left')
+
+    def edit_goal(self, gid=None):
+        """Add a savings goal, or edit the one with id gid"""
+        goal = self.ledger.data.get('goals', {}).get(gid, {})
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Edit Goal" if goal else "Add Goal")
+        dialog.geometry("500x640")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        tk.Label(dialog, text="🎯 Savings Goal", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=20)
+
+        entries = {}
+        initial = {
+            'name': goal.get('name', ''),
+            'target': f"{from_minor(goal['target']):.2f}" if goal else '',
+            'deadline': goal.get('deadline', f"{datetime.now().year}-12-31")
         }
+        for field, label in (('name', "Name:"), ('target', "Target (LKR):"), ('deadline', "Deadline (YYYY-MM-DD):")):
+            tk.Label(dialog, text=label, font=('Segoe UI', 11, 'bold'),
+                     bg='#1e293b', fg='#e2e8f0').pack(pady=(5, 0))
+            entry = tk.Entry(dialog, font=('Segoe UI', 11), width=35,
+                             bg='#0f172a', fg='#e2e8f0', insertbackground='white')
+            entry.insert(0, initial[field])
+            entry.pack(pady=5)
+            entries[field] = entry
+
+        tk.Label(dialog, text="Track:", font=('Segoe UI', 11, 'bold'),
+                 bg='#1e293b', fg='#e2e8f0').pack(pady=(5, 0))
+        sources = ["Balance of the selected accounts"] + [f"{cat} (Rule Category) from today" for cat in RULE_CATEGORIES]
+        combo = ttk.Combobox(dialog, values=sources, font=('Segoe UI', 11), state='readonly', width=35)
+        combo.pack(pady=5)
+        rule_category = goal.get('rule_category')
+        combo.current(RULE_CATEGORIES.index(rule_category) + 1 if rule_category in RULE_CATEGORIES else 0)
+
+        account_labels, account_ids = self.account_choices()
+        accounts = tk.Listbox(dialog, selectmode='multiple', font=('Segoe UI', 10), height=6, width=40,
+                              bg='#0f172a', fg='#e2e8f0', selectbackground='#3b82f6',
+                              highlightthickness=0, relief='flat', exportselection=False)
+        for i, label in enumerate(account_labels):
+            accounts.insert('end', label)
+            if account_ids[i] in goal.get('accounts', []):
+                accounts.selection_set(i)
+        accounts.pack(pady=5)
+
+        def confirm_goal():
+            try:
+                target = to_minor(entries['target'].get())
+            except ValueError:
+                messagebox.showerror("Error", "Invalid amount!")
+                return
+
+            source = combo.current()
+            fields = {
+                'name': entries['name'].get().strip(),
+                'target': target,
+                'deadline': entries['deadline'].get().strip(),
+                'accounts': [account_ids[i] for i in accounts.curselection()] if source == 0 else None,
+                'rule_category': RULE_CATEGORIES[source - 1] if source else None
+            }
+            try:
+                if goal:
+                    self.ledger.update_goal(gid, **fields)
+                else:
+                    self.ledger.add_goal(**fields)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            dialog.destroy()
+
+        btn_frame = tk.Frame(dialog, bg='#1e293b')
+        btn_frame.pack(pady=20)
+
+        tk.Button(btn_frame, text="✓ Save", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=confirm_goal).pack(side='left', padx=10)
+
+        tk.Button(btn_frame, text="Cancel", font=('Segoe UI', 11, 'bold'),
+                   bg='#64748b', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
+
+    def delete_goal(self, gid, name):
+        """Delete a savings goal after confirmation"""
+        if messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete the goal '{name}'?"):
+            self.ledger.delete_goal(gid)
 
     def build_rule_tab(self):
         """Build the 25/15/50/10 Rule tab"""
@@ -465,7 +5264,7 @@ class FinanceTrackerGUI:
             widget.destroy()
 
         # Get rule percentages
-        rules = self.data.get('rule_percentages', {
+        rules = self.ledger.data.get('rule_percentages', {
             'growth': 25,
             'stability': 15,
             'essentials': 50,
@@ -491,7 +5290,7 @@ class FinanceTrackerGUI:
                  bg='#1e293b', fg='#64748b').pack(anchor='w', pady=(2, 0))
 
         # Calculate totals
-        totals = self.calculate_totals()
+        totals = self.ledger.calculate_totals()
         real_total = totals['real_total']
 
         # Overview Card
@@ -509,66 +5308,38 @@ class FinanceTrackerGUI:
         tk.Label(overview_inner, text=f"LKR {real_total:,.2f}", font=('Segoe UI', 18, 'bold'),
                  bg='#0f172a', fg='#10b981').pack(side='left', padx=10)
 
-        # --- UPDATED CALCULATION LOGIC ---
-
-        # 1. Growth Calculation (as before)
-        growth_target = real_total * (rules['growth'] / 100)
-        growth_current = totals['crypto']
-        growth_diff = growth_current - growth_target
-        growth_percent_current = (growth_current / real_total * 100) if real_total > 0 else 0
-
-        # 2. Non-Growth Calculations (Stability, Essentials, Rewards)
-        
-        # Get the total percentage for non-growth rules
-        non_growth_rule_total = rules['stability'] + rules['essentials'] + rules['rewards']
-        total_cash = totals['cash_bank']
-        
-        # Avoid division by zero if all non-growth rules are 0%
-        if non_growth_rule_total == 0:
-            stability_current = 0
-            essentials_current = 0
-            rewards_current = 0
-        else:
-            # Pro-rate the current cash balance across the 3 categories
-            stability_current = total_cash * (rules['stability'] / non_growth_rule_total)
-            essentials_current = total_cash * (rules['essentials'] / non_growth_rule_total)
-            rewards_current = total_cash * (rules['rewards'] / non_growth_rule_total)
-
-        # Calculate targets, diffs, and percentages for the 3 categories
-        stability_target = real_total * (rules['stability'] / 100)
-        stability_diff = stability_current - stability_target
-        stability_percent_current = (stability_current / real_total * 100) if real_total > 0 else 0
-
-        essentials_target = real_total * (rules['essentials'] / 100)
-        essentials_diff = essentials_current - essentials_target
-        essentials_percent_current = (essentials_current / real_total * 100) if real_total > 0 else 0
-
-        rewards_target = real_total * (rules['rewards'] / 100)
-        rewards_diff = rewards_current - rewards_target
-        rewards_percent_current = (rewards_current / real_total * 100) if real_total > 0 else 0
-
-        # --- END OF UPDATED LOGIC ---
+        allocation = self.ledger.rule_allocation()
+        growth = allocation['growth']
+        stability = allocation['stability']
+        essentials = allocation['essentials']
+        rewards = allocation['rewards']
 
         # Growth Section
+        growth_text = "Money that makes you more money (Investments already allocated)"
+        market = self.ledger.valuation()
+        if market['holdings']:
+            growth_text += f"\nHoldings LKR {market['value']:,.2f} • Unrealized P/L {market['pl']:+,.2f}"
+            if market['twr'] is not None:
+                growth_text += f" • Time-weighted return {market['twr'] * 100:+.2f}%"
         self.create_rule_card(
             "🚀 Growth",
             rules['growth'],
-            growth_target,
-            growth_current,
-            growth_diff,
-            growth_percent_current,
+            growth['target'],
+            growth['current'],
+            growth['difference'],
+            growth['percent_current'],
             '#10b981',
-            "Money that makes you more money (Investments already allocated)"
+            growth_text
         )
 
         # Stability Section
         self.create_rule_card(
             "🛡️ Stability",
             rules['stability'],
-            stability_target,
-            stability_current,      # <-- Updated
-            stability_diff,         # <-- Updated
-            stability_percent_current, # <-- Updated
+            stability['target'],
+            stability['current'],
+            stability['difference'],
+            stability['percent_current'],
             '#3b82f6',
             "Emergency fund - Keep accessible for safety"
         )
@@ -577,10 +5348,10 @@ class FinanceTrackerGUI:
         self.create_rule_card(
             "🏠 Essentials",
             rules['essentials'],
-            essentials_target,
-            essentials_current,     # <-- Updated
-            essentials_diff,        # <-- Updated
-            essentials_percent_current, # <-- Updated
+            essentials['target'],
+            essentials['current'],
+            essentials['difference'],
+            essentials['percent_current'],
             '#8b5cf6',
             "Necessary living costs (rent, food, utilities, transport)"
         )
@@ -589,10 +5360,10 @@ class FinanceTrackerGUI:
         self.create_rule_card(
             "🎉 Rewards",
             rules['rewards'],
-            rewards_target,
-            rewards_current,        # <-- Updated
-            rewards_diff,           # <-- Updated
-            rewards_percent_current, # <-- Updated
+            rewards['target'],
+            rewards['current'],
+            rewards['difference'],
+            rewards['percent_current'],
             '#f59e0b',
             "Enjoy life guilt-free (hobbies, travel, social)"
         )
@@ -663,60 +5434,313 @@ how your current assets align with those targets.
         diff_row = tk.Frame(content, bg='#1e293b')
         diff_row.pack(fill='x', pady=5)
 
-        if diff >= 0:
-            status_text = "✅ Exceeded by:"
-            status_color = '#10b981'
-        else:
-            status_text = "⚠️ Need more:"
-            status_color = '#f59e0b'
+        if diff >= 0:
+            status_text = "✅ Exceeded by:"
+            status_color = '#10b981'
+        else:
+            status_text = "⚠️ Need more:"
+            status_color = '#f59e0b'
+
+        tk.Label(diff_row, text=status_text, font=('Segoe UI', 11),
+                 bg='#1e293b', fg='#94a3b8').pack(side='left')
+        tk.Label(diff_row, text=f"LKR {abs(diff):,.2f}", font=('Segoe UI', 11, 'bold'),
+                 bg='#1e293b', fg=status_color).pack(side='right')
+
+        # Progress bar
+        progress_frame = tk.Frame(content, bg='#0f172a', height=30)
+        progress_frame.pack(fill='x', pady=(10, 5))
+
+        progress_percent = min((current / target * 100) if target > 0 else 0, 100)
+
+        # Use a fixed width for the canvas to ensure bar size is consistent
+        bar_width_total = 600
+        canvas = tk.Canvas(progress_frame, bg='#0f172a', height=20, width=bar_width_total, highlightthickness=0)
+        # Center the canvas
+        canvas.pack(pady=5) 
+
+        canvas.create_rectangle(0, 0, bar_width_total, 20, fill='#334155', outline='')
+
+        if progress_percent > 0:
+            bar_width = bar_width_total * (progress_percent / 100)
+            canvas.create_rectangle(0, 0, bar_width, 20, fill=color, outline='')
+
+        canvas.create_text(bar_width_total/2, 10, text=f"{progress_percent:.1f}% Complete",
+                            fill='#ffffff', font=('Segoe UI', 9, 'bold'))
+
+    def edit_balance(self, aid):
+        """Edit account balance"""
+        currency = self.ledger.account_currency(aid)
+        current = self.ledger.data['categories'][self.ledger.account_category(aid)][aid]
+        new_value = simpledialog.askfloat("Edit Balance", 
+                                          f"Enter new balance for {self.ledger.account_name(aid)}:",
+                                          initialvalue=from_minor(current, currency))
+        if new_value is not None:
+            self.ledger.edit_balance(aid, to_minor(new_value, currency))
+
+    def show_holdings(self, aid):
+        """Positions of an investment account with buy/sell controls"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title(f"Holdings - {self.ledger.account_name(aid)}")
+        dialog.geometry("820x560")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        tk.Label(dialog, text=f"📈 {self.ledger.account_name(aid)} Holdings", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=(20, 5))
+        summary = tk.Label(dialog, font=('Segoe UI', 10), bg='#1e293b', fg='#94a3b8')
+        summary.pack(pady=(0, 10))
+
+        columns = ('Symbol', 'Quantity', 'Cost', 'Price', 'Value', 'P/L', 'Return')
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=10)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=105, anchor='e' if col != 'Symbol' else 'w')
+        tree.pack(fill='both', expand=True, padx=20)
+        tree.tag_configure('gain', foreground='#10b981')
+        tree.tag_configure('loss', foreground='#ef4444')
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            market = self.ledger.valuation()
+            for row in market['holdings']:
+                if row['account_id'] != aid:
+                    continue
+                tree.insert('', 'end', iid=row['symbol'], tags=('gain' if row['pl'] >= 0 else 'loss',), values=(
+                    row['symbol'], f"{row['quantity']:,.6g}", f"{row['cost']:,.2f}",
+                    f"{row['price']:,.4f}" if row['price'] is not None else "no price",
+                    f"{row['value']:,.2f}", f"{row['pl']:+,.2f}",
+                    f"{row['twr'] * 100:+.2f}%" if row['twr'] is not None else "-"))
+            totals = market['accounts'].get(aid)
+            if totals:
+                summary.config(text=f"Market value {totals['value']:,.2f} • Cost {totals['cost']:,.2f} • "
+                                    f"Unrealized P/L {totals['pl']:+,.2f}")
+            else:
+                summary.config(text="No positions yet - add a buy below. Prices come from the price CSV in Settings.")
+
+        form = tk.Frame(dialog, bg='#1e293b')
+        form.pack(fill='x', padx=20, pady=15)
+
+        entries = {}
+        for col, (label, initial) in enumerate([("Symbol", ""), ("Quantity", ""), ("Unit cost", ""),
+                                                ("Date", datetime.now().strftime('%Y-%m-%d'))]):
+            tk.Label(form, text=label, font=('Segoe UI', 10, 'bold'),
+                     bg='#1e293b', fg='#e2e8f0').grid(row=0, column=col, sticky='w', padx=5)
+            entry = tk.Entry(form, font=('Segoe UI', 11), width=14, bg='#0f172a',
+                             fg='#e2e8f0', insertbackground='white')
+            entry.insert(0, initial)
+            entry.grid(row=1, column=col, padx=5)
+            entries[label] = entry
+
+        def selected_symbol():
+            return entries["Symbol"].get().strip().upper() or (tree.selection() or [''])[0]
+
+        def buy():
+            try:
+                symbol = selected_symbol()
+                quantity = float(entries["Quantity"].get())
+                unit_cost = float(entries["Unit cost"].get())
+                date = entries["Date"].get().strip()
+                if not symbol or quantity <= 0 or unit_cost < 0 or date_ordinal(date) is None:
+                    raise ValueError
+            except ValueError:
+                messagebox.showerror("Error", "Enter a symbol, a positive quantity, a unit cost and a YYYY-MM-DD date!",
+                                     parent=dialog)
+                return
+            self.ledger.buy(aid, symbol, quantity, unit_cost, date)
+            refresh()
+
+        def sell():
+            try:
+                symbol = selected_symbol()
+                quantity = float(entries["Quantity"].get())
+                if not symbol or quantity <= 0:
+                    raise ValueError("Enter a symbol and a positive quantity")
+                sold = self.ledger.sell(aid, symbol, quantity)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e) or "Invalid quantity!", parent=dialog)
+                return
+            refresh()
+            messagebox.showinfo("Success", f"Sold {quantity:g} {symbol} (cost basis {sold:,.2f})", parent=dialog)
+
+        tk.Button(form, text="+ Buy", font=('Segoe UI', 10, 'bold'), bg='#10b981', fg='white',
+                  relief='flat', cursor='hand2', padx=15, pady=6, command=buy).grid(row=1, column=4, padx=5)
+        tk.Button(form, text="− Sell", font=('Segoe UI', 10, 'bold'), bg='#ef4444', fg='white',
+                  relief='flat', cursor='hand2', padx=15, pady=6, command=sell).grid(row=1, column=5, padx=5)
+
+        refresh()
+
+    def show_backups(self):
+        """List the ledger's snapshots and restore the selected one"""
+        backups = self.ledger.list_backups()
+        if not backups:
+            messagebox.showinfo("Backups", "No snapshots yet. One is taken automatically after your next change.")
+            return
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Restore Backup")
+        dialog.geometry("560x480")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        tk.Label(dialog, text="⏪ Restore a Snapshot", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=(20, 5))
+        tk.Label(dialog, text="The current ledger is backed up before it is replaced.",
+                 font=('Segoe UI', 10), bg='#1e293b', fg='#94a3b8').pack(pady=(0, 10))
+
+        columns = ('Taken', 'Transactions')
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=12, selectmode='browse')
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=240 if col == 'Taken' else 140, anchor='w' if col == 'Taken' else 'e')
+        tree.pack(fill='both', expand=True, padx=20)
+        for backup in backups:
+            taken = datetime.fromisoformat(backup['created']).strftime('%B %d, %Y %H:%M')
+            tree.insert('', 'end', iid=backup['name'], values=(
+                taken + (" 🔒" if backup['encrypted'] else ""), f"{backup['transactions']:,}"))
+        tree.selection_set(backups[0]['name'])
+
+        def restore():
+            selection = tree.selection()
+            if not selection:
+                return
+            taken = tree.item(selection[0], 'values')[0]
+            if not messagebox.askyesno("Confirm", f"Replace the ledger with the snapshot from {taken}? "
+                                                  "Undo history will be cleared.", parent=dialog):
+                return
+            try:
+                count = self.ledger.restore_backup(selection[0])
+            except LedgerPassphraseError:
+                passphrase = simpledialog.askstring("Passphrase", "This snapshot is encrypted. Passphrase:",
+                                                    show='*', parent=dialog)
+                if not passphrase:
+                    return
+                try:
+                    count = self.ledger.restore_backup(selection[0], passphrase)
+                except LedgerPassphraseError as e:
+                    messagebox.showerror("Error", str(e), parent=dialog)
+                    return
+            dialog.destroy()
+            messagebox.showinfo("Success", f"Restored {count:,} transactions!")
+
+        btn_frame = tk.Frame(dialog, bg='#1e293b')
+        btn_frame.pack(pady=20)
+        tk.Button(btn_frame, text="⏪ Restore", font=('Segoe UI', 11, 'bold'),
+                  bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                  padx=30, pady=12, command=restore).pack(side='left', padx=10)
+        tk.Button(btn_frame, text="Close", font=('Segoe UI', 11, 'bold'),
+                  bg='#475569', fg='white', relief='flat', cursor='hand2',
+                  padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
 
-        tk.Label(diff_row, text=status_text, font=('Segoe UI', 11),
-                 bg='#1e293b', fg='#94a3b8').pack(side='left')
-        tk.Label(diff_row, text=f"LKR {abs(diff):,.2f}", font=('Segoe UI', 11, 'bold'),
-                 bg='#1e293b', fg=status_color).pack(side='right')
+    def check_integrity(self, quiet=False):
+        """Run the integrity check on a background thread and report when it finishes.
 
-        # Progress bar
-        progress_frame = tk.Frame(content, bg='#0f172a', height=30)
-        progress_frame.pack(fill='x', pady=(10, 5))
+        With quiet=True (the startup check) nothing is shown unless errors are found.
+        """
+        ledger = self.ledger
+        result = {}
 
-        progress_percent = min((current / target * 100) if target > 0 else 0, 100)
+        def run():
+            try:
+                result['report'] = ledger.check_integrity()
+            except Exception as e:
+                result['error'] = e
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+        def wait():
+            if thread.is_alive():
+                self.root.after(200, wait)
+            elif 'error' in result:
+                if not quiet:
+                    messagebox.showerror("Error", f"Integrity check failed: {result['error']}")
+            else:
+                self.show_integrity_report(ledger, result['report'], quiet)
 
-        # Use a fixed width for the canvas to ensure bar size is consistent
-        bar_width_total = 600
-        canvas = tk.Canvas(progress_frame, bg='#0f172a', height=20, width=bar_width_total, highlightthickness=0)
-        # Center the canvas
-        canvas.pack(pady=5) 
+        self.root.after(200, wait)
 
-        canvas.create_rectangle(0, 0, bar_width_total, 20, fill='#334155', outline='')
+    def show_integrity_report(self, ledger, report, quiet=False):
+        """Summarize an integrity report and offer to apply its repairs"""
+        errors = [issue for issue in report['issues'] if issue['severity'] == 'error']
+        if quiet and not errors:
+            return
+        if not report['issues']:
+            messagebox.showinfo("Success", f"Checked {report['checked']:,} transactions, no problems found!")
+            return
+        plan = ledger.write_repair_plan(report)
 
-        if progress_percent > 0:
-            bar_width = bar_width_total * (progress_percent / 100)
-            canvas.create_rectangle(0, 0, bar_width, 20, fill=color, outline='')
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Integrity Check")
+        dialog.geometry("700x520")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
 
-        canvas.create_text(bar_width_total/2, 10, text=f"{progress_percent:.1f}% Complete",
-                            fill='#ffffff', font=('Segoe UI', 9, 'bold'))
+        tk.Label(dialog, text="🩺 Ledger Integrity Check", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=(20, 5))
+        tk.Label(dialog, text=f"Checked {report['checked']:,} transactions • {len(errors)} error(s), "
+                              f"{len(report['issues']) - len(errors)} warning(s)",
+                 font=('Segoe UI', 10), bg='#1e293b', fg='#94a3b8').pack()
+
+        kinds = {}
+        for issue in report['issues']:
+            kinds.setdefault(issue['kind'], []).append(issue)
+        listing = tk.Text(dialog, font=('Segoe UI', 10), height=14, bg='#0f172a', fg='#e2e8f0',
+                          relief='flat', wrap='word')
+        listing.pack(fill='both', expand=True, padx=20, pady=10)
+        for kind, group in kinds.items():
+            listing.insert('end', f"{kind.replace('_', ' ').capitalize()} ({len(group)}):\n")
+            for issue in group[:5]:
+                listing.insert('end', f"    • {issue['detail']}\n")
+            if len(group) > 5:
+                listing.insert('end', f"    … and {len(group) - 5} more\n")
+        listing.insert('end', f"\nFull repair plan: {plan}\n")
+        listing.config(state='disabled')
+
+        def apply():
+            if not messagebox.askyesno("Confirm", "Apply the automatic repairs? Balance mismatches are fixed by "
+                                                  "posting reconciliation adjustments.", parent=dialog):
+                return
+            applied = ledger.apply_repairs(report)
+            dialog.destroy()
+            messagebox.showinfo("Success", f"Applied {applied:,} repair(s)!")
 
-    def edit_balance(self, category, account):
-        """Edit account balance"""
-        current = self.data['categories'][category][account]
-        new_value = simpledialog.askfloat("Edit Balance", 
-                                          f"Enter new balance for {account}:",
-                                          initialvalue=current)
-        if new_value is not None:
-            self.data['categories'][category][account] = new_value
-            self.save_data()
-            self.refresh_home()
-            self.refresh_rule_tab()
+        btn_frame = tk.Frame(dialog, bg='#1e293b')
+        btn_frame.pack(pady=(0, 20))
+        if not ledger.read_only and any(issue['repair'] != 'manual' for issue in report['issues']):
+            tk.Button(btn_frame, text="🛠️ Apply Repairs", font=('Segoe UI', 11, 'bold'),
+                      bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                      padx=30, pady=12, command=apply).pack(side='left', padx=10)
+        tk.Button(btn_frame, text="Close", font=('Segoe UI', 11, 'bold'),
+                  bg='#475569', fg='white', relief='flat', cursor='hand2',
+                  padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
+
+    def reconcile_account(self, aid):
+        """Reconcile an account against a statement balance"""
+        currency = self.ledger.account_currency(aid)
+        status = self.ledger.reconciliation_status(aid)
+        statement = simpledialog.askfloat(
+            "Reconcile Account",
+            f"Enter the statement balance for {self.ledger.account_name(aid)}:\n"
+            f"(its transactions add up to {from_minor(status['derived'], currency):,.2f})",
+            initialvalue=from_minor(status['balance'], currency))
+        if statement is None:
+            return
+        adjustment = self.ledger.reconcile(aid, to_minor(statement, currency))
+        if adjustment:
+            messagebox.showinfo("Success", f"Account reconciled with an adjustment of "
+                                           f"{from_minor(adjustment, currency):+,.2f}!")
+        else:
+            messagebox.showinfo("Success", "Account reconciled, no adjustment needed!")
 
     def add_account(self, category):
         """Add new account"""
         name = simpledialog.askstring("Add Account", 
                                       f"Enter account name for {category}:")
         if name and name.strip():
-            self.data['categories'][category][name.strip()] = 0.00
-            self.save_data()
-            self.refresh_home()
-            self.refresh_rule_tab()
+            self.ledger.add_account(category, name.strip())
 
     def build_tracker_tab(self):
         """Build transaction tracker"""
@@ -734,22 +5758,61 @@ how your current assets align with those targets.
                    bg='#10b981', fg='white', relief='flat', cursor='hand2',
                    padx=25, pady=12, command=self.add_transaction).pack(side='right')
 
+        tk.Button(header_inner, text="⇄ Transfer", font=('Segoe UI', 11, 'bold'),
+                   bg='#8b5cf6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=12, command=self.transfer_funds).pack(side='right', padx=(10, 0))
+
+        tk.Button(header_inner, text="✂ Split", font=('Segoe UI', 11, 'bold'),
+                   bg='#8b5cf6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=12, command=self.split_transaction).pack(side='right', padx=(10, 0))
+
+        tk.Button(header_inner, text="📥 Import CSV", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=12, command=self.import_transactions).pack(side='right', padx=(10, 0))
+
+        tk.Button(header_inner, text="↷ Redo", font=('Segoe UI', 11, 'bold'),
+                   bg='#475569', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=12, command=self.redo).pack(side='right', padx=10)
+
+        tk.Button(header_inner, text="↶ Undo", font=('Segoe UI', 11, 'bold'),
+                   bg='#475569', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=12, command=self.undo).pack(side='right')
+
+        # Archive status bar (older months are loaded on demand)
+        archive_bar = tk.Frame(self.tracker_frame, bg='#1e293b')
+        archive_bar.pack(side='bottom', fill='x', padx=20, pady=(0, 20))
+
+        self.archive_label = tk.Label(archive_bar, font=('Segoe UI', 10),
+                                      bg='#1e293b', fg='#94a3b8')
+        self.archive_label.pack(side='left', padx=30, pady=10)
+
+        tk.Button(archive_bar, text="📦 Load Older Month", font=('Segoe UI', 10),
+                  bg='#475569', fg='white', relief='flat', cursor='hand2',
+                  padx=15, pady=6, command=self.load_older_transactions).pack(side='right', padx=30)
+
         # Transaction list
         list_frame = tk.Frame(self.tracker_frame, bg='#1e293b')
-        list_frame.pack(fill='both', expand=True, padx=20, pady=(0, 20))
+        list_frame.pack(fill='both', expand=True, padx=20, pady=(0, 10))
 
-        scrollbar = ttk.Scrollbar(list_frame)
-        scrollbar.pack(side='right', fill='y')
+        # The tree only holds the rows in view; the scrollbar moves that
+        # window over the whole (sorted) list
+        self.tracker_top = 0
+        self.tracker_window = 20
+        self.tracker_sort = []
+        self.tracker_descending = True
+        # Selected transaction ids, including rows scrolled out of the window
+        self.tracker_selection = set()
 
-        columns = ('Date', 'Account', 'Description', 'Category', 'Amount')
+        self.tracker_scrollbar = ttk.Scrollbar(list_frame, command=self.scroll_tracker)
+        self.tracker_scrollbar.pack(side='right', fill='y')
+
+        columns = tuple(TRACKER_COLUMNS)
         self.transaction_tree = ttk.Treeview(list_frame, columns=columns, 
-                                             show='headings', yscrollcommand=scrollbar.set)
+                                             show='headings', selectmode='extended')
 
-        self.transaction_tree.heading('Date', text='DATE')
-        self.transaction_tree.heading('Account', text='ACCOUNT')
-        self.transaction_tree.heading('Description', text='DESCRIPTION')
-        self.transaction_tree.heading('Category', text='RULE CATEGORY')
-        self.transaction_tree.heading('Amount', text='AMOUNT')
+        for column in columns:
+            self.transaction_tree.heading(column, command=lambda c=column: self.sort_tracker(c))
+        self.update_sort_headings()
 
         self.transaction_tree.column('Date', width=150)
         self.transaction_tree.column('Account', width=180)
@@ -757,24 +5820,73 @@ how your current assets align with those targets.
         self.transaction_tree.column('Category', width=150)
         self.transaction_tree.column('Amount', width=150)
 
-        scrollbar.config(command=self.transaction_tree.yview)
         self.transaction_tree.pack(fill='both', expand=True)
 
-        # Right-click menu for deleting transactions - NEW
+        def on_heading_shift_click(event):
+            # Shift-click on a heading adds (or drops) a tie-breaking sort column
+            if self.transaction_tree.identify_region(event.x, event.y) == 'heading':
+                column = self.transaction_tree.column(self.transaction_tree.identify_column(event.x), 'id')
+                self.sort_tracker(column, add=True)
+                return "break"
+
+        self.transaction_tree.bind("<Shift-Button-1>", on_heading_shift_click)
+
+        def on_resize(event):
+            # Rows are 35px high (see the Treeview style below), plus the heading
+            window = max(1, (event.height - 40) // 35)
+            if window != self.tracker_window:
+                self.tracker_window = window
+                self.refresh_tracker()
+
+        self.transaction_tree.bind("<Configure>", on_resize, add='+')
+
+        # Right-click menu for batch operations on the selected transactions
         context_menu = tk.Menu(self.tracker_frame, tearoff=0, bg='#1e293b', fg='#ffffff')
-        context_menu.add_command(label="🗑️ Delete Transaction", command=self.delete_transaction)
+        context_menu.add_command(label="🗑️ Delete Selected", command=self.delete_transaction)
+
+        retag_menu = tk.Menu(context_menu, tearoff=0, bg='#1e293b', fg='#ffffff')
+        for rule_cat in ["-"] + RULE_CATEGORIES:
+            retag_menu.add_command(label=rule_cat,
+                                   command=lambda r=rule_cat: self.retag_transactions(r))
+        context_menu.add_cascade(label="🏷️ Set Rule Category", menu=retag_menu)
+        context_menu.add_command(label="➡️ Move to Account...", command=self.move_transactions)
+        context_menu.add_separator()
+        context_menu.add_command(label="☑️ Select All", command=self.select_all_transactions)
 
         def show_context_menu(event):
             try:
                 item = self.transaction_tree.identify_row(event.y)
                 if item:
-                    self.transaction_tree.selection_set(item)
+                    # Keep a multi-row selection if the click lands inside it
+                    if int(item) not in self.tracker_selection:
+                        self.tracker_selection = {int(item)}
+                        self.transaction_tree.selection_set(item)
                     context_menu.post(event.x_root, event.y_root)
             except:
                 pass
 
         self.transaction_tree.bind("<Button-3>", show_context_menu)
 
+        def on_row_click(event):
+            # A plain click starts a new selection; Ctrl/Shift-click extend it
+            if not event.state & 0x0005 and self.transaction_tree.identify_row(event.y):
+                self.tracker_selection.clear()
+
+        self.transaction_tree.bind("<Button-1>", on_row_click)
+        self.transaction_tree.bind("<<TreeviewSelect>>", self.sync_tracker_selection)
+        self.transaction_tree.bind("<Control-a>", self.select_all_transactions)
+
+        def on_wheel(event):
+            self.scroll_tracker('scroll', -3 if event.num == 4 or event.delta > 0 else 3, 'units')
+            return "break"
+
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.transaction_tree.bind(sequence, on_wheel)
+        self.transaction_tree.bind("<Prior>", lambda e: self.scroll_tracker('scroll', -1, 'pages'))
+        self.transaction_tree.bind("<Next>", lambda e: self.scroll_tracker('scroll', 1, 'pages'))
+        self.transaction_tree.bind("<Home>", lambda e: self.scroll_tracker('moveto', 0))
+        self.transaction_tree.bind("<End>", lambda e: self.scroll_tracker('moveto', 1))
+
         style = ttk.Style()
         style.configure("Treeview", 
                         background='#1e293b',
@@ -791,56 +5903,398 @@ how your current assets align with those targets.
         self.refresh_tracker()
 
     def refresh_tracker(self):
-        """Refresh transaction list"""
-        for item in self.transaction_tree.get_children():
-            self.transaction_tree.delete(item)
+        """Render the rows in view, in the current sort order"""
+        tree = self.transaction_tree
+        total = len(self.ledger.data['transactions'])
+        self.tracker_top = max(0, min(self.tracker_top, total - self.tracker_window))
+        rows = self.ledger.sorted_transactions(self.tracker_sort, self.tracker_descending,
+                                               self.tracker_top, self.tracker_top + self.tracker_window)
+
+        tree.delete(*tree.get_children())
+        for trans in rows:
+            values, tags = self.transaction_row(trans)
+            tree.insert('', 'end', iid=str(trans['id']), values=values, tags=tags)
+        tree.selection_set([str(trans['id']) for trans in rows if trans['id'] in self.tracker_selection])
+
+        if total:
+            self.tracker_scrollbar.set(self.tracker_top / total,
+                                       min((self.tracker_top + self.tracker_window) / total, 1.0))
+        else:
+            self.tracker_scrollbar.set(0.0, 1.0)
 
-        for trans in reversed(self.data['transactions']):
-            amount = trans['amount']
-            amount_str = f"+{amount:,.2f} LKR" if amount >= 0 else f"{amount:,.2f} LKR"
-            tag = 'income' if amount >= 0 else 'expense'
+        self.transaction_tree.tag_configure('income', foreground='#10b981')
+        self.transaction_tree.tag_configure('expense', foreground='#ef4444')
+        self.transaction_tree.tag_configure('unusual', background='#3b0764')
+        self.transaction_tree.tag_configure('duplicate', background='#422006')
+        self.update_archive_label()
+
+    def transaction_row(self, trans):
+        """Treeview values and tags (colour plus any duplicate/unusual flags) for a transaction"""
+        amount = from_minor(trans['amount'], self.ledger.account_currency(trans['account_id']))
+        amount_str = f"+{amount:,.2f} LKR" if amount >= 0 else f"{amount:,.2f} LKR"
+        tags = ('income' if amount >= 0 else 'expense',)
+
+        description = trans['description']
+        if 'group' in trans:
+            description = f"{'⇄' if trans.get('transfer') else '✂'} {description}"
+        flags = self.ledger.anomaly_flags().get(trans['id'])
+        if flags:
+            tags += tuple(sorted(flags))
+            description = f"⚠️ {description}"
+
+        rule_cat = trans.get('rule_category', '-')
+        values = (trans['date'], self.ledger.account_name(trans['account_id']),
+                  description, rule_cat, amount_str)
+        return values, tags
+
+    def scroll_tracker(self, *args):
+        """Scrollbar command ('moveto' fraction or 'scroll' n units/pages) for the row window"""
+        total = len(self.ledger.data['transactions'])
+        if args[0] == 'moveto':
+            self.tracker_top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            self.tracker_top += int(args[1]) * (self.tracker_window if args[2] == 'pages' else 1)
+        self.refresh_tracker()
 
-            rule_cat = trans.get('rule_category', '-')
+        # Scrolling to the end pulls in the next archived month
+        if self.tracker_top + self.tracker_window >= total and self.ledger.unloaded_periods():
+            self.load_older_transactions()
+
+    def sort_tracker(self, column, add=False):
+        """Sort by a column; clicking it again reverses, Shift-click adds a tie-breaker"""
+        key = TRACKER_COLUMNS[column][1]
+        if add:
+            if key in self.tracker_sort[1:]:
+                self.tracker_sort.remove(key)
+            elif key not in self.tracker_sort:
+                self.tracker_sort.append(key)
+        elif self.tracker_sort[:1] == [key]:
+            self.tracker_descending = not self.tracker_descending
+        else:
+            self.tracker_sort = [key]
+            self.tracker_descending = False
+        self.tracker_top = 0
+        self.update_sort_headings()
+        self.refresh_tracker()
 
-            self.transaction_tree.insert('', 'end', 
-                                         values=(trans['date'], trans['account'], 
-                                                 trans['description'], rule_cat, amount_str),
-                                         tags=(tag,))
+    def update_sort_headings(self):
+        """Mark the sort columns in the headings: arrow on the first, rank on the rest"""
+        for column, (heading, key) in TRACKER_COLUMNS.items():
+            if key not in self.tracker_sort:
+                text = heading
+            elif key == self.tracker_sort[0]:
+                text = f"{heading} {'▼' if self.tracker_descending else '▲'}"
+            else:
+                text = f"{heading} ({self.tracker_sort.index(key) + 1})"
+            self.transaction_tree.heading(column, text=text)
+
+    def update_archive_label(self):
+        """Show how many transactions are loaded and how many are still archived"""
+        unloaded = self.ledger.unloaded_periods()
+        if unloaded:
+            archived = sum(self.ledger.data['archive'][p]['count'] for p in unloaded)
+            self.archive_label.config(
+                text=f"Showing {len(self.ledger.data['transactions']):,} transactions • "
+                     f"{archived:,} more in {len(unloaded)} archived month(s), "
+                     f"scroll down to load")
+        else:
+            self.archive_label.config(
+                text=f"Showing all {len(self.ledger.data['transactions']):,} transactions")
+        flagged = len(self.ledger.anomaly_flags())
+        if flagged:
+            self.archive_label.config(
+                text=self.archive_label.cget('text') + f" • ⚠️ {flagged:,} possible duplicate or unusual")
+        if len(self.tracker_selection) > 1:
+            self.archive_label.config(
+                text=self.archive_label.cget('text') + f" • {len(self.tracker_selection):,} selected")
+
+    def load_older_transactions(self):
+        """Load the newest archived month into the transaction list"""
+        if self.ledger.load_next_period() is None:
+            return
+        # The window stays at the same position, so the rows in view stay put
+        self.refresh_tracker()
 
-        self.transaction_tree.tag_configure('income', foreground='#10b981')
-        self.transaction_tree.tag_configure('expense', foreground='#ef4444')
+    def account_choices(self):
+        """Return combobox labels and the matching account ids"""
+        labels = []
+        ids = []
+        for category, accounts in self.ledger.data['categories'].items():
+            for aid in accounts.keys():
+                labels.append(f"{self.ledger.account_name(aid)} ({category})")
+                ids.append(aid)
+        return labels, ids
+
+    def sync_tracker_selection(self, event=None):
+        """Take the selection of the rows in view into tracker_selection, keeping the rest"""
+        tree = self.transaction_tree
+        shown = {int(item) for item in tree.get_children()}
+        self.tracker_selection -= shown
+        self.tracker_selection |= {int(item) for item in tree.selection()}
+        self.update_archive_label()
+
+    def select_all_transactions(self, event=None):
+        """Select every loaded transaction, not only the rows in view"""
+        self.tracker_selection = {trans['id'] for trans in self.ledger.data['transactions']}
+        self.refresh_tracker()
+        return "break"
+
+    def selected_transaction_ids(self):
+        """Return the ids of the selected transactions that still exist, in view or not"""
+        trans = self.ledger.find_transactions(self.tracker_selection)
+        self.tracker_selection = {t['id'] for t in trans}
+        return set(self.tracker_selection)
+
+    def finish_batch(self, message):
+        """Confirm a batch mutation; the views refresh from its ledger events"""
+        messagebox.showinfo("Success", message)
+
+    def undo(self, event=None):
+        """Undo the last ledger change"""
+        if self.ledger.undo() is None:
+            messagebox.showinfo("Undo", "Nothing to undo!")
+
+    def redo(self, event=None):
+        """Redo the last undone ledger change"""
+        if self.ledger.redo() is None:
+            messagebox.showinfo("Redo", "Nothing to redo!")
+
+    def import_transactions(self):
+        """Import transactions from a CSV file as one undoable batch"""
+        path = filedialog.askopenfilename(parent=self.root, title="Import Transactions",
+                                          filetypes=[("CSV", '*.csv'), ("All files", '*.*')])
+        if not path:
+            return
+        try:
+            rows, skipped = read_import_csv(self.ledger, path)
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            messagebox.showerror("Error", f"Could not read {path}: {e}")
+            return
+        if not rows:
+            messagebox.showwarning("Warning", "No transactions with a known account were found!")
+            return
+
+        added = self.ledger.import_transactions(rows)
+        message = f"Imported {added:,} transaction(s)"
+        if skipped:
+            message += f", skipped {skipped:,} row(s) with an unknown account or invalid values"
+        self.finish_batch(message + "!")
 
     def delete_transaction(self):
-        """Delete selected transaction - NEW"""
-        selected = self.transaction_tree.selection()
-        if not selected:
+        """Delete all selected transactions as one batch"""
+        ids = self.selected_transaction_ids()
+        if not ids:
             messagebox.showwarning("Warning", "Please select a transaction to delete!")
             return
-        
-        if messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this transaction?"):
-            item = selected[0]
-            values = self.transaction_tree.item(item)['values']
-            
-            # Find and remove the transaction
-            for i, trans in enumerate(self.data['transactions']):
-                if (trans['date'] == values[0] and 
-                    trans['account'] == values[1] and 
-                    trans['description'] == values[2]):
-                    
-                    # Reverse the transaction amount from account
-                    for category, accounts in self.data['categories'].items():
-                        if trans['account'] in accounts:
-                            self.data['categories'][category][trans['account']] -= trans['amount']
-                            break
-                    
-                    # Remove transaction
-                    self.data['transactions'].pop(i)
-                    self.save_data()
-                    self.refresh_home()
-                    self.refresh_tracker()
-                    self.refresh_rule_tab()
-                    messagebox.showinfo("Success", "Transaction deleted successfully!")
-                    break
+
+        # Legs of a transfer or split are deleted together, so count them too
+        ids = self.ledger.with_linked_legs(ids)
+        noun = "this transaction" if len(ids) == 1 else f"these {len(ids)} transactions"
+        if not messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete {noun}?"):
+            return
+
+        self.ledger.delete_transactions(ids)
+        self.finish_batch(f"{len(ids)} transaction(s) deleted successfully!")
+
+    def retag_transactions(self, rule_category):
+        """Set the rule category of all selected transactions"""
+        ids = self.selected_transaction_ids()
+        if not ids:
+            messagebox.showwarning("Warning", "Please select transactions first!")
+            return
+
+        self.ledger.retag_transactions(ids, rule_category)
+        self.finish_batch(f"{len(ids)} transaction(s) re-tagged as {rule_category}!")
+
+    def move_transactions(self):
+        """Move all selected transactions to another account"""
+        ids = self.selected_transaction_ids()
+        if not ids:
+            messagebox.showwarning("Warning", "Please select transactions first!")
+            return
+
+        all_accounts, account_ids = self.account_choices()
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Move Transactions")
+        dialog.geometry("500x250")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        tk.Label(dialog, text=f"➡️ Move {len(ids)} Transaction(s)", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=20)
+
+        tk.Label(dialog, text="Select target account:", font=('Segoe UI', 11),
+                 bg='#1e293b', fg='#e2e8f0').pack(pady=10)
+
+        account_var = tk.StringVar()
+        combo = ttk.Combobox(dialog, textvariable=account_var, values=all_accounts,
+                             font=('Segoe UI', 11), state='readonly', width=35)
+        combo.pack(pady=10)
+        if all_accounts:
+            combo.current(0)
+
+        def confirm_move():
+            if combo.current() < 0:
+                return
+            target = account_ids[combo.current()]
+
+            self.ledger.move_transactions(ids, target)
+            dialog.destroy()
+            self.finish_batch(f"{len(ids)} transaction(s) moved to {self.ledger.account_name(target)}!")
+
+        btn_frame = tk.Frame(dialog, bg='#1e293b')
+        btn_frame.pack(pady=20)
+
+        tk.Button(btn_frame, text="➡️ Move", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=confirm_move).pack(side='left', padx=10)
+
+        tk.Button(btn_frame, text="Cancel", font=('Segoe UI', 11, 'bold'),
+                   bg='#64748b', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
+
+    def transfer_funds(self):
+        """Transfer dialog: one posting that debits one account and credits another"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Transfer")
+        dialog.geometry("550x420")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        tk.Label(dialog, text="⇄ Transfer Between Accounts", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=20)
+
+        form = tk.Frame(dialog, bg='#1e293b')
+        form.pack(fill='both', expand=True, padx=40)
+
+        all_accounts, account_ids = self.account_choices()
+        combos = []
+        for row, label in enumerate(["From", "To"]):
+            tk.Label(form, text=label, font=('Segoe UI', 11, 'bold'),
+                     bg='#1e293b', fg='#e2e8f0').grid(row=row, column=0, sticky='w', pady=10)
+            combo = ttk.Combobox(form, values=all_accounts, font=('Segoe UI', 11),
+                                 state='readonly', width=33)
+            if len(all_accounts) > row:
+                combo.current(row)
+            combo.grid(row=row, column=1, pady=10)
+            combos.append(combo)
+
+        entries = {}
+        for row, (label, initial) in enumerate([("Date", datetime.now().strftime('%B %d, %Y')),
+                                                ("Description", ""), ("Amount", "")], start=2):
+            tk.Label(form, text=label, font=('Segoe UI', 11, 'bold'),
+                     bg='#1e293b', fg='#e2e8f0').grid(row=row, column=0, sticky='w', pady=10)
+            entry = tk.Entry(form, font=('Segoe UI', 11), width=35, bg='#0f172a',
+                             fg='#e2e8f0', insertbackground='white')
+            entry.insert(0, initial)
+            entry.grid(row=row, column=1, pady=10)
+            entries[label] = entry
+
+        def save_transfer():
+            if combos[0].current() < 0 or combos[1].current() < 0:
+                messagebox.showwarning("Warning", "Please choose both accounts!")
+                return
+            source, target = account_ids[combos[0].current()], account_ids[combos[1].current()]
+            try:
+                amount = abs(to_minor(entries["Amount"].get(), self.ledger.account_currency(source)))
+                if not amount:
+                    raise ValueError("Invalid amount!")
+                self.ledger.transfer(source, target, amount, entries["Date"].get().strip(),
+                                     entries["Description"].get().strip() or None)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e), parent=dialog)
+                return
+            messagebox.showinfo("Success", "Transfer added successfully!")
+            dialog.destroy()
+
+        btn_frame = tk.Frame(dialog, bg='#1e293b')
+        btn_frame.pack(pady=20)
+
+        tk.Button(btn_frame, text="✓ Transfer", font=('Segoe UI', 11, 'bold'),
+                   bg='#8b5cf6', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=save_transfer).pack(side='left', padx=10)
+
+        tk.Button(btn_frame, text="Cancel", font=('Segoe UI', 11, 'bold'),
+                   bg='#475569', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
+
+    def split_transaction(self):
+        """Split dialog: one account's transaction divided across rule categories"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Split Transaction")
+        dialog.geometry("550x600")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        tk.Label(dialog, text="✂ Split Transaction", font=('Segoe UI', 18, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(pady=20)
+
+        form = tk.Frame(dialog, bg='#1e293b')
+        form.pack(fill='both', expand=True, padx=40)
+
+        all_accounts, account_ids = self.account_choices()
+        tk.Label(form, text="Account", font=('Segoe UI', 11, 'bold'),
+                 bg='#1e293b', fg='#e2e8f0').grid(row=0, column=0, sticky='w', pady=10)
+        account_combo = ttk.Combobox(form, values=all_accounts, font=('Segoe UI', 11),
+                                     state='readonly', width=33)
+        if all_accounts:
+            account_combo.current(0)
+        account_combo.grid(row=0, column=1, pady=10)
+
+        type_var = tk.StringVar(value="expense")
+        type_frame = tk.Frame(form, bg='#1e293b')
+        type_frame.grid(row=1, column=1, sticky='w', pady=10)
+        tk.Radiobutton(type_frame, text="💸 Expense", variable=type_var, value="expense",
+                        font=('Segoe UI', 11), bg='#1e293b', fg='#e2e8f0',
+                        selectcolor='#0f172a').pack(side='left', padx=15)
+        tk.Radiobutton(type_frame, text="💰 Income", variable=type_var, value="income",
+                        font=('Segoe UI', 11), bg='#1e293b', fg='#e2e8f0',
+                        selectcolor='#0f172a').pack(side='left', padx=15)
+
+        entries = {}
+        labels = [("Date", datetime.now().strftime('%B %d, %Y')), ("Description", "")]
+        labels += [(f"{category} amount", "") for category in RULE_CATEGORIES]
+        for row, (label, initial) in enumerate(labels, start=2):
+            tk.Label(form, text=label, font=('Segoe UI', 11, 'bold'),
+                     bg='#1e293b', fg='#e2e8f0').grid(row=row, column=0, sticky='w', pady=8)
+            entry = tk.Entry(form, font=('Segoe UI', 11), width=35, bg='#0f172a',
+                             fg='#e2e8f0', insertbackground='white')
+            entry.insert(0, initial)
+            entry.grid(row=row, column=1, pady=8)
+            entries[label] = entry
+
+        def save_split():
+            description = entries["Description"].get().strip()
+            if account_combo.current() < 0 or not description:
+                messagebox.showwarning("Warning", "Please fill all fields!")
+                return
+            aid = account_ids[account_combo.current()]
+            sign = -1 if type_var.get() == "expense" else 1
+            try:
+                parts = {category: sign * abs(to_minor(entries[f"{category} amount"].get(),
+                                                       self.ledger.account_currency(aid)))
+                         for category in RULE_CATEGORIES if entries[f"{category} amount"].get().strip()}
+                self.ledger.split(aid, entries["Date"].get().strip(), description, parts)
+            except ValueError as e:
+                messagebox.showerror("Error", f"{e} - enter amounts for at least two categories!", parent=dialog)
+                return
+            messagebox.showinfo("Success", "Split transaction added successfully!")
+            dialog.destroy()
+
+        btn_frame = tk.Frame(dialog, bg='#1e293b')
+        btn_frame.pack(pady=20)
+
+        tk.Button(btn_frame, text="✓ Save", font=('Segoe UI', 11, 'bold'),
+                   bg='#8b5cf6', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=save_split).pack(side='left', padx=10)
+
+        tk.Button(btn_frame, text="Cancel", font=('Segoe UI', 11, 'bold'),
+                   bg='#475569', fg='white', relief='flat', cursor='hand2',
+                   padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
 
     def add_transaction(self):
         """Add transaction dialog"""
@@ -869,10 +6323,7 @@ how your current assets align with those targets.
         tk.Label(form, text="Account", font=('Segoe UI', 11, 'bold'),
                  bg='#1e293b', fg='#e2e8f0').grid(row=1, column=0, sticky='w', pady=10)
 
-        all_accounts = []
-        for category, accounts in self.data['categories'].items():
-            for account in accounts.keys():
-                all_accounts.append(f"{account} ({category})")
+        all_accounts, account_ids = self.account_choices()
 
         account_var = tk.StringVar()
         account_combo = ttk.Combobox(form, textvariable=account_var, 
@@ -908,8 +6359,8 @@ how your current assets align with those targets.
         tk.Label(form, text="Rule Category", font=('Segoe UI', 11, 'bold'),
                  bg='#1e293b', fg='#e2e8f0').grid(row=4, column=0, sticky='w', pady=10)
 
-        rule_var = tk.StringVar(value="-")
-        rule_categories = ["-", "Growth", "Stability", "Essentials", "Rewards"]
+        rule_var = tk.StringVar(value="Auto")
+        rule_categories = ["Auto", "-"] + RULE_CATEGORIES
 
         rule_combo = ttk.Combobox(form, textvariable=rule_var, 
                                   values=rule_categories, font=('Segoe UI', 11), 
@@ -927,42 +6378,33 @@ how your current assets align with those targets.
         def save_transaction():
             try:
                 date = date_entry.get().strip()
-                account_full = account_var.get()
-                account = account_full.split(' (')[0] if account_full else ""
+                account = account_ids[account_combo.current()] if account_var.get() else ""
                 description = desc_entry.get().strip()
-                amount = float(amount_entry.get())
                 rule_category = rule_var.get()
 
                 if not account or not description:
                     messagebox.showwarning("Warning", "Please fill all fields!")
                     return
+                amount = to_minor(amount_entry.get(), self.ledger.account_currency(account))
 
                 if type_var.get() == "expense":
                     amount = -abs(amount)
                 else:
                     amount = abs(amount)
 
-                category = None
-                for cat, accounts in self.data['categories'].items():
-                    if account in accounts:
-                        category = cat
-                        break
-
-                if category:
-                    self.data['categories'][category][account] += amount
-                    self.data['transactions'].append({
-                        'date': date,
-                        'account': account,
-                        'description': description,
-                        'amount': amount,
-                        'rule_category': rule_category,
-                        'timestamp': datetime.now().isoformat()
-                    })
-
-                    self.save_data()
-                    self.refresh_home()
-                    self.refresh_tracker()
-                    self.refresh_rule_tab()
+                trans = {
+                    'date': date,
+                    'account_id': account,
+                    'description': description,
+                    'amount': amount,
+                    'rule_category': rule_category,
+                    'timestamp': datetime.now().isoformat()
+                }
+                if rule_category == "Auto":
+                    # Let the ledger's categorizer pick one
+                    del trans['rule_category']
+
+                if self.ledger.add_transaction(trans):
 
                     messagebox.showinfo("Success", "Transaction added successfully!")
                     dialog.destroy()
@@ -1040,7 +6482,7 @@ how your current assets align with those targets.
                  font=('Segoe UI', 10),
                  bg='#1e293b', fg='#94a3b8').pack(anchor='w', padx=30, pady=(0, 15))
 
-        rules = self.data.get('rule_percentages', {
+        rules = self.ledger.data.get('rule_percentages', {
             'growth': 25,
             'stability': 15,
             'essentials': 50,
@@ -1111,15 +6553,13 @@ how your current assets align with those targets.
                     messagebox.showerror("Error", f"Percentages must total 100%! Current total: {total}%")
                     return
 
-                self.data['rule_percentages'] = {
+                self.ledger.set_rule_percentages({
                     'growth': growth,
                     'stability': stability,
                     'essentials': essentials,
                     'rewards': rewards
-                }
+                })
 
-                self.save_data()
-                self.refresh_rule_tab()
                 messagebox.showinfo("Success", "Rule percentages updated successfully!")
 
             except ValueError:
@@ -1147,16 +6587,13 @@ how your current assets align with those targets.
 
         rate_entry = tk.Entry(rate_frame, font=('Segoe UI', 12), width=15,
                               bg='#0f172a', fg='#e2e8f0', insertbackground='white')
-        rate_entry.insert(0, str(self.usd_to_lkr))
+        rate_entry.insert(0, str(self.ledger.usd_to_lkr))
         rate_entry.pack(side='left', padx=10)
 
         def update_rate():
             try:
                 new_rate = float(rate_entry.get())
-                self.usd_to_lkr = new_rate
-                self.save_data()
-                self.refresh_home()
-                self.refresh_rule_tab()
+                self.ledger.set_exchange_rate(new_rate)
                 messagebox.showinfo("Success", f"Exchange rate updated to {new_rate} LKR")
             except ValueError:
                 messagebox.showerror("Error", "Invalid rate!")
@@ -1165,6 +6602,277 @@ how your current assets align with those targets.
                    bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
                    padx=20, pady=10, command=update_rate).pack(side='left', padx=10)
 
+        # Storage section
+        storage_section = tk.Frame(content, bg='#1e293b')
+        storage_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(storage_section, text="💾 Storage", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 15))
+
+        def storage_text():
+            if self.ledger.storage_format == 'binary':
+                lock = ", encrypted" if self.ledger.passphrase else ""
+                return f"Current format: Binary ledger ({self.ledger.codec}{lock}) - {self.ledger.binary_file}"
+            return f"Current format: JSON - {self.ledger.data_file}"
+
+        storage_var = tk.StringVar(value=storage_text())
+        tk.Label(storage_section, textvariable=storage_var, font=('Segoe UI', 10),
+                 bg='#1e293b', fg='#94a3b8').pack(anchor='w', padx=30, pady=(0, 10))
+
+        storage_frame = tk.Frame(storage_section, bg='#1e293b')
+        storage_frame.pack(fill='x', padx=30, pady=(0, 20))
+
+        tk.Label(storage_frame, text="Compression:", font=('Segoe UI', 11),
+                 bg='#1e293b', fg='#e2e8f0').grid(row=0, column=0, sticky='w', padx=10, pady=5)
+        codec_var = tk.StringVar(value=self.ledger.codec)
+        ttk.Combobox(storage_frame, textvariable=codec_var, values=['zlib', 'lzma'],
+                     font=('Segoe UI', 11), state='readonly', width=12).grid(row=0, column=1, sticky='w', padx=10)
+
+        tk.Label(storage_frame, text="Passphrase (optional):", font=('Segoe UI', 11),
+                 bg='#1e293b', fg='#e2e8f0').grid(row=1, column=0, sticky='w', padx=10, pady=5)
+        passphrase_entry = tk.Entry(storage_frame, font=('Segoe UI', 11), width=25, show='*',
+                                    bg='#0f172a', fg='#e2e8f0', insertbackground='white')
+        passphrase_entry.grid(row=1, column=1, sticky='w', padx=10)
+
+        def use_binary():
+            passphrase = passphrase_entry.get()
+            if not passphrase and self.ledger.passphrase:
+                if not messagebox.askyesno("Confirm", "Remove the passphrase and store the ledger unencrypted?"):
+                    return
+            self.ledger.set_storage('binary', codec_var.get(), passphrase)
+            passphrase_entry.delete(0, 'end')
+            storage_var.set(storage_text())
+            messagebox.showinfo("Success", "Ledger saved in binary format!")
+
+        def use_json():
+            if messagebox.askyesno("Confirm", "Store the ledger as plain, unencrypted JSON?"):
+                self.ledger.set_storage('json')
+                storage_var.set(storage_text())
+                messagebox.showinfo("Success", "Ledger saved as JSON!")
+
+        storage_btns = tk.Frame(storage_frame, bg='#1e293b')
+        storage_btns.grid(row=2, column=0, columnspan=2, sticky='w', pady=(10, 0))
+
+        tk.Button(storage_btns, text="✓ Use Binary Format", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=use_binary).pack(side='left', padx=10)
+
+        tk.Button(storage_btns, text="Use JSON", font=('Segoe UI', 11, 'bold'),
+                   bg='#475569', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=use_json).pack(side='left', padx=10)
+
+        # Dashboard renderer section
+        dashboard_section = tk.Frame(content, bg='#1e293b')
+        dashboard_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(dashboard_section, text="🖥️ Dashboard", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 5))
+        tk.Label(dashboard_section, text=f"Auto draws the account list on a single canvas above "
+                                         f"{DASHBOARD_CANVAS_ACCOUNTS} accounts, which keeps large ledgers responsive.",
+                 font=('Segoe UI', 10), bg='#1e293b', fg='#94a3b8').pack(anchor='w', padx=30, pady=(0, 10))
+
+        renderer_var = tk.StringVar(value=self.ledger.data.get('dashboard_renderer', 'auto'))
+        renderer_frame = tk.Frame(dashboard_section, bg='#1e293b')
+        renderer_frame.pack(anchor='w', padx=30, pady=(0, 20))
+        for value, label in [('auto', "Auto"), ('widgets', "Widgets"), ('canvas', "Canvas")]:
+            tk.Radiobutton(renderer_frame, text=label, variable=renderer_var, value=value,
+                           font=('Segoe UI', 11), bg='#1e293b', fg='#e2e8f0', selectcolor='#0f172a',
+                           command=lambda: self.ledger.set_dashboard_renderer(renderer_var.get())
+                           ).pack(side='left', padx=15)
+
+        # Auto-categorization section
+        categorize_section = tk.Frame(content, bg='#1e293b')
+        categorize_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(categorize_section, text="🏷️ Auto-Categorization", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 5))
+        tk.Label(categorize_section,
+                 text="One rule per line as 'Category: pattern' (a regular expression matched against the\n"
+                      "description). Descriptions no rule matches are categorized from your tagged history.",
+                 font=('Segoe UI', 10), bg='#1e293b', fg='#94a3b8', justify='left').pack(anchor='w', padx=30, pady=(0, 10))
+
+        rules_text = tk.Text(categorize_section, font=('Consolas', 10), height=6, width=90,
+                             bg='#0f172a', fg='#e2e8f0', insertbackground='white', relief='flat')
+        rules_text.insert('1.0', '\n'.join(f"{category}: {pattern}" for pattern, category in
+                                           self.ledger.data.get('category_rules', DEFAULT_CATEGORY_RULES)))
+        rules_text.pack(anchor='w', padx=30, pady=(0, 10))
+
+        def save_category_rules():
+            rules = []
+            for line in rules_text.get('1.0', 'end').splitlines():
+                if not line.strip():
+                    continue
+                category, _, pattern = line.partition(':')
+                category, pattern = category.strip(), pattern.strip()
+                if category not in RULE_CATEGORIES or not pattern:
+                    messagebox.showerror("Error", f"Invalid rule: {line}\nUse one of {', '.join(RULE_CATEGORIES)}")
+                    return
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    messagebox.showerror("Error", f"Invalid pattern '{pattern}': {e}")
+                    return
+                rules.append([pattern, category])
+            self.ledger.set_category_rules(rules)
+            messagebox.showinfo("Success", "Categorization rules updated successfully!")
+
+        def categorize_untagged():
+            count = self.ledger.auto_categorize()
+            messagebox.showinfo("Success", f"Categorized {count:,} untagged transaction(s)!")
+
+        categorize_btns = tk.Frame(categorize_section, bg='#1e293b')
+        categorize_btns.pack(anchor='w', padx=30, pady=(0, 20))
+
+        tk.Button(categorize_btns, text="✓ Save Rules", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=save_category_rules).pack(side='left', padx=(0, 10))
+
+        tk.Button(categorize_btns, text="🏷️ Categorize Untagged", font=('Segoe UI', 11, 'bold'),
+                   bg='#475569', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=categorize_untagged).pack(side='left', padx=10)
+
+        # Price table section
+        prices_section = tk.Frame(content, bg='#1e293b')
+        prices_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(prices_section, text="📈 Investment Prices", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 15))
+
+        def prices_text():
+            path = self.ledger.data.get('price_file')
+            if not path:
+                return "No price file - holdings count at cost. Use a CSV with date, symbol and price columns."
+            return f"Price file: {path} ({len(self.ledger.price_table())} symbols)"
+
+        prices_var = tk.StringVar(value=prices_text())
+        tk.Label(prices_section, textvariable=prices_var, font=('Segoe UI', 10),
+                 bg='#1e293b', fg='#94a3b8').pack(anchor='w', padx=30, pady=(0, 10))
+
+        def choose_price_file():
+            path = filedialog.askopenfilename(parent=self.root, title="Price Table",
+                                              filetypes=[("CSV", '*.csv'), ("All files", '*.*')])
+            if path:
+                self.ledger.set_price_file(path)
+                prices_var.set(prices_text())
+
+        tk.Button(prices_section, text="📂 Choose Price CSV...", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=choose_price_file).pack(anchor='w', padx=40, pady=(0, 20))
+
+        # Integrity check section
+        integrity_section = tk.Frame(content, bg='#1e293b')
+        integrity_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(integrity_section, text="🩺 Integrity Check", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 5))
+        tk.Label(integrity_section, text="Verifies every transaction, including archived months, against "
+                                         "the account balances and writes a repair plan.",
+                 font=('Segoe UI', 10), bg='#1e293b', fg='#94a3b8').pack(anchor='w', padx=30, pady=(0, 10))
+        tk.Button(integrity_section, text="🩺 Check Now", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=self.check_integrity).pack(anchor='w', padx=40, pady=(0, 20))
+
+        # Backups section
+        backup_section = tk.Frame(content, bg='#1e293b')
+        backup_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(backup_section, text="🗄️ Backups", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 5))
+        tk.Label(backup_section, text="Snapshots are taken every 10 minutes while you make changes. Only changed "
+                                      "blocks are stored, and hourly, daily and monthly snapshots are kept.",
+                 font=('Segoe UI', 10), bg='#1e293b', fg='#94a3b8').pack(anchor='w', padx=30, pady=(0, 10))
+        backup_buttons = tk.Frame(backup_section, bg='#1e293b')
+        backup_buttons.pack(anchor='w', padx=40, pady=(0, 20))
+
+        def backup_now():
+            name = self.ledger.backup(force=True)
+            if name:
+                messagebox.showinfo("Success", "Snapshot saved!")
+
+        tk.Button(backup_buttons, text="💾 Back Up Now", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=backup_now).pack(side='left', padx=(0, 10))
+        tk.Button(backup_buttons, text="⏪ Restore...", font=('Segoe UI', 11, 'bold'),
+                   bg='#475569', fg='white', relief='flat', cursor='hand2',
+                   padx=20, pady=10, command=self.show_backups).pack(side='left')
+
+        # Export section
+        export_section = tk.Frame(content, bg='#1e293b')
+        export_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(export_section, text="📤 Export", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 15))
+
+        export_frame = tk.Frame(export_section, bg='#1e293b')
+        export_frame.pack(fill='x', padx=30, pady=(0, 20))
+
+        datasets = {'Transactions': 'transactions', 'Account Balances': 'balances',
+                    'Rule Allocation': 'allocation', 'Portfolio Chart': 'chart'}
+        tk.Label(export_frame, text="Data:", font=('Segoe UI', 11),
+                 bg='#1e293b', fg='#e2e8f0').grid(row=0, column=0, sticky='w', padx=10, pady=5)
+        dataset_var = tk.StringVar(value='Transactions')
+        ttk.Combobox(export_frame, textvariable=dataset_var, values=list(datasets),
+                     font=('Segoe UI', 11), state='readonly', width=18).grid(row=0, column=1, sticky='w', padx=10)
+
+        formats = {label: fmt for fmt, (label, _, _) in EXPORT_FORMATS.items()}
+        tk.Label(export_frame, text="Format:", font=('Segoe UI', 11),
+                 bg='#1e293b', fg='#e2e8f0').grid(row=1, column=0, sticky='w', padx=10, pady=5)
+        format_var = tk.StringVar(value='CSV')
+        ttk.Combobox(export_frame, textvariable=format_var, values=list(formats),
+                     font=('Segoe UI', 11), state='readonly', width=18).grid(row=1, column=1, sticky='w', padx=10)
+
+        tk.Button(export_frame, text="📤 Export...", font=('Segoe UI', 11, 'bold'),
+                   bg='#3b82f6', fg='white', relief='flat', cursor='hand2', padx=20, pady=10,
+                   command=lambda: self.export_data(datasets[dataset_var.get()], formats[format_var.get()])
+                   ).grid(row=2, column=0, columnspan=2, sticky='w', padx=10, pady=(10, 0))
+
+        # Local API section
+        api_section = tk.Frame(content, bg='#1e293b')
+        api_section.pack(fill='x', padx=0, pady=10)
+
+        tk.Label(api_section, text="🔌 Local API", font=('Segoe UI', 16, 'bold'),
+                 bg='#1e293b', fg='#ffffff').pack(anchor='w', padx=30, pady=(20, 15))
+
+        def api_text():
+            if self.api:
+                return f"Serving read-only JSON at http://127.0.0.1:{self.api.port}/"
+            return "Stopped - scripts can read totals, accounts and transactions once started"
+
+        api_var = tk.StringVar(value=api_text())
+        tk.Label(api_section, textvariable=api_var, font=('Segoe UI', 10),
+                 bg='#1e293b', fg='#94a3b8').pack(anchor='w', padx=30, pady=(0, 10))
+
+        api_frame = tk.Frame(api_section, bg='#1e293b')
+        api_frame.pack(fill='x', padx=30, pady=(0, 20))
+
+        tk.Label(api_frame, text="Port:", font=('Segoe UI', 11),
+                 bg='#1e293b', fg='#e2e8f0').pack(side='left', padx=10)
+        port_entry = tk.Entry(api_frame, font=('Segoe UI', 11), width=8,
+                              bg='#0f172a', fg='#e2e8f0', insertbackground='white')
+        port_entry.insert(0, str(self.api.port if self.api else API_PORT))
+        port_entry.pack(side='left', padx=10)
+
+        def toggle_api():
+            if self.api:
+                self.api.stop()
+                self.api = None
+            else:
+                try:
+                    self.api = LedgerAPI(lambda: self.ledger, int(port_entry.get()))
+                except ValueError:
+                    messagebox.showerror("Error", "Please enter a valid port number!")
+                    return
+                except OSError as e:
+                    messagebox.showerror("Error", f"Could not start the API: {e}")
+                    return
+            api_var.set(api_text())
+            api_button.config(text="■ Stop API" if self.api else "▶ Start API")
+
+        api_button = tk.Button(api_frame, text="■ Stop API" if self.api else "▶ Start API",
+                               font=('Segoe UI', 11, 'bold'), bg='#3b82f6', fg='white', relief='flat',
+                               cursor='hand2', padx=20, pady=10, command=toggle_api)
+        api_button.pack(side='left', padx=10)
+
         # Account management section
         acc_section = tk.Frame(content, bg='#1e293b')
         acc_section.pack(fill='x', padx=0, pady=10)
@@ -1196,19 +6904,70 @@ how your current assets align with those targets.
         info_text.pack(anchor='w', padx=30, pady=(0, 20))
     # --- END OF SETTINGS TAB FIX ---
 
+    def export_data(self, dataset, fmt):
+        """Export a dataset to a file, showing progress while the mainloop keeps running"""
+        label, ext, _ = EXPORT_FORMATS[fmt]
+        path = filedialog.asksaveasfilename(parent=self.root, title="Export", defaultextension=ext,
+                                            initialfile=dataset + ext,
+                                            filetypes=[(label, '*' + ext), ("All files", '*.*')])
+        if not path:
+            return
+
+        job = export_dataset(self.ledger, dataset, fmt, path)
+
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Exporting")
+        dialog.geometry("400x170")
+        dialog.configure(bg='#1e293b')
+        dialog.transient(self.root)
+        dialog.grab_set()
+
+        status = tk.Label(dialog, text="Starting export...", font=('Segoe UI', 11),
+                          bg='#1e293b', fg='#e2e8f0')
+        status.pack(pady=(25, 10))
+        progress = ttk.Progressbar(dialog, length=340, mode='determinate')
+        progress.pack(pady=5)
+
+        def cancel():
+            job.close()
+            dialog.destroy()
+
+        tk.Button(dialog, text="Cancel", font=('Segoe UI', 10, 'bold'),
+                  bg='#475569', fg='white', relief='flat', cursor='hand2',
+                  padx=20, pady=6, command=cancel).pack(pady=10)
+        dialog.protocol("WM_DELETE_WINDOW", cancel)
+
+        counts = [0, 0]
+
+        def step():
+            # Write rows for one time slice, then give the mainloop a turn
+            deadline = time.perf_counter() + EXPORT_SLICE
+            try:
+                while time.perf_counter() < deadline:
+                    counts[:] = next(job)
+            except StopIteration:
+                dialog.destroy()
+                messagebox.showinfo("Success", f"Exported {counts[0]:,} rows to {path}")
+                return
+            except OSError as e:
+                dialog.destroy()
+                messagebox.showerror("Error", f"Export failed: {e}")
+                return
+            written, total = counts
+            progress.config(maximum=max(total, 1), value=written)
+            status.config(text=f"Exported {written:,} of {total:,} rows")
+            dialog.after(1, step)
+
+        dialog.after(1, step)
+
     def delete_account(self):
         """Delete an account"""
-        all_accounts = []
-        for category, accounts in self.data['categories'].items():
-            for account in accounts.keys():
-                all_accounts.append((account, category))
+        account_names, account_ids = self.account_choices()
 
-        if not all_accounts:
+        if not account_ids:
             messagebox.showinfo("Info", "No accounts to delete!")
             return
 
-        account_names = [f"{acc} ({cat})" for acc, cat in all_accounts]
-
         dialog = tk.Toplevel(self.root)
         dialog.title("Delete Account")
         dialog.geometry("500x250")
@@ -1230,16 +6989,12 @@ how your current assets align with those targets.
             combo.current(0)
 
         def confirm_delete():
-            selected = account_var.get()
-            if selected:
-                account = selected.split(' (')[0]
-                category = selected.split('(')[1].rstrip(')')
+            if combo.current() >= 0:
+                aid = account_ids[combo.current()]
+                account = self.ledger.account_name(aid)
 
                 if messagebox.askyesno("Confirm", f"Are you sure you want to delete {account}?"):
-                    del self.data['categories'][category][account]
-                    self.save_data()
-                    self.refresh_home()
-                    self.refresh_rule_tab()
+                    self.ledger.delete_account(aid)
                     messagebox.showinfo("Success", "Account deleted successfully!")
                     dialog.destroy()
 
@@ -1256,17 +7011,12 @@ how your current assets align with those targets.
 
     def rename_account(self):
         """Rename an account"""
-        all_accounts = []
-        for category, accounts in self.data['categories'].items():
-            for account in accounts.keys():
-                all_accounts.append((account, category))
+        account_names, account_ids = self.account_choices()
 
-        if not all_accounts:
+        if not account_ids:
             messagebox.showinfo("Info", "No accounts to rename!")
             return
 
-        account_names = [f"{acc} ({cat})" for acc, cat in all_accounts]
-
         dialog = tk.Toplevel(self.root)
         dialog.title("Rename Account")
         dialog.geometry("500x300")
@@ -1295,29 +7045,18 @@ how your current assets align with those targets.
         new_name_entry.pack(pady=5)
 
         def confirm_rename():
-            selected = account_var.get()
             new_name = new_name_entry.get().strip()
 
-            if selected and new_name:
-                old_name = selected.split(' (')[0]
-                category = selected.split('(')[1].rstrip(')')
+            if combo.current() >= 0 and new_name:
+                aid = account_ids[combo.current()]
+                category = self.ledger.account_category(aid)
 
-                if new_name in self.data['categories'][category]:
+                if any(self.ledger.account_name(other) == new_name
+                       for other in self.ledger.data['categories'][category]):
                     messagebox.showerror("Error", "Account name already exists!")
                     return
 
-                balance = self.data['categories'][category][old_name]
-                del self.data['categories'][category][old_name]
-                self.data['categories'][category][new_name] = balance
-
-                for trans in self.data['transactions']:
-                    if trans['account'] == old_name:
-                        trans['account'] = new_name
-
-                self.save_data()
-                self.refresh_home()
-                self.refresh_tracker()
-                self.refresh_rule_tab()
+                self.ledger.rename_account(aid, new_name)
                 messagebox.showinfo("Success", "Account renamed successfully!")
                 dialog.destroy()
             else:
@@ -1335,6 +7074,65 @@ how your current assets align with those targets.
                    padx=30, pady=12, command=dialog.destroy).pack(side='left', padx=10)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Finance Tracker Pro")
+    parser.add_argument('--read-only', action='store_true',
+                        help="open the ledger as a viewer that never writes or locks it")
+    parser.add_argument('--api', type=int, nargs='?', const=API_PORT, metavar='PORT',
+                        help=f"serve the local JSON API (default port {API_PORT})")
+    parser.add_argument('--fsck', action='store_true',
+                        help="check the active profile's ledger, write a repair plan and exit")
+    parser.add_argument('--repair', action='store_true',
+                        help="with --fsck, also apply the automatic repairs")
+    parser.add_argument('--backups', action='store_true',
+                        help="list the active profile's backup snapshots and exit")
+    parser.add_argument('--restore', metavar='SNAPSHOT',
+                        help="restore the active profile from a snapshot (see --backups) and exit")
+    args = parser.parse_args()
+
+    def open_active_ledger(read_only):
+        """Open the active profile's ledger for a command-line action, asking for its passphrase if needed"""
+        profiles = ProfileManager('finance_profiles.json', read_only=read_only)
+        name = profiles.registry['active']
+        passphrase = None
+        while True:
+            try:
+                return profiles, profiles.open(name, passphrase)
+            except LedgerPassphraseError as e:
+                passphrase = getpass.getpass(f"{name}: {e}. Passphrase: ")
+            except (OSError, ValueError) as e:
+                raise SystemExit(f"Could not open the {name} ledger: {e}")
+
+    if args.backups or args.restore:
+        profiles, ledger = open_active_ledger(read_only=not args.restore)
+        if args.restore:
+            try:
+                count = ledger.restore_backup(args.restore)
+            except LedgerPassphraseError:
+                count = ledger.restore_backup(args.restore, getpass.getpass("Snapshot passphrase: "))
+            print(f"{ledger.data_file}: restored {count:,} transactions from {args.restore}")
+        else:
+            for backup in ledger.list_backups():
+                print(f"{backup['name']}  {backup['created']}  {backup['transactions']:>10,} transactions"
+                      f"{'  (encrypted)' if backup['encrypted'] else ''}")
+        profiles.close()
+        raise SystemExit(0)
+
+    if args.fsck:
+        profiles, ledger = open_active_ledger(read_only=not args.repair)
+        report = ledger.check_integrity()
+        print(f"{ledger.data_file}: checked {report['checked']:,} transactions, "
+              f"{len(report['issues'])} issue(s)")
+        for issue in report['issues']:
+            print(f"  [{issue['severity']}] {issue['kind']}: {issue['detail']} (repair: "
+                  f"{issue['repair'] if isinstance(issue['repair'], str) else 'fix'})")
+        if report['issues']:
+            print(f"Repair plan saved to {ledger.write_repair_plan(report)}")
+            if args.repair:
+                print(f"Applied {ledger.apply_repairs(report)} repair(s)")
+                report = ledger.check_integrity()
+        profiles.close()
+        raise SystemExit(1 if any(issue['severity'] == 'error' for issue in report['issues']) else 0)
+
     root = tk.Tk()
-    app = FinanceTrackerGUI(root)
+    app = FinanceTrackerGUI(root, read_only=args.read_only, api_port=args.api)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from FT import Ledger  # noqa: E402
+
+
+@pytest.fixture
+def ledger_path(tmp_path):
+    """Path of a fresh ledger file in a temporary directory"""
+    return str(tmp_path / 'finance_data.json')
+
+
+@pytest.fixture
+def ledger(ledger_path):
+    """A new ledger with the default accounts; its save worker is drained afterwards"""
+    ledger = Ledger(ledger_path)
+    yield ledger
+    ledger.events.close()
+
+
+@pytest.fixture
+def account(ledger):
+    """Id of the 'Sampath' account from the default ledger"""
+    return ledger.match_account(['Sampath'])[0]
+
+
+@pytest.fixture
+def archived_ledger(ledger_path, ledger, account):
+    """The ledger reopened with only archived history: two January 2020 rent payments.
+
+    Months it reads from the archive are recorded in partition_reads.
+    """
+    for day in ('05', '06'):
+        ledger.add_transaction({'date': f'January {day}, 2020', 'account_id': account,
+                                'description': 'rent', 'amount': -50000, 'rule_category': 'Essentials'})
+    ledger.events.close()
+
+    reopened = Ledger(ledger_path)
+    reopened.partition_reads = []
+    read_partition = reopened.read_partition
+
+    def recording_read(period, *args, **kwargs):
+        reopened.partition_reads.append(period)
+        return read_partition(period, *args, **kwargs)
+
+    reopened.read_partition = recording_read
+    yield reopened
+    reopened.events.close()
@@ -0,0 +1,30 @@
+def account_order(ledger):
+    rows = ledger.sorted_transactions(['account'], False, 0, 10)
+    return [ledger.account_name(trans['account_id']) for trans in rows]
+
+
+def test_rename_keeps_transaction_links_and_budget_keys(ledger, account):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.set_budget('accounts', account, 50000)
+    ledger.rename_account(account, 'Savings')
+
+    assert ledger.data['transactions'][0]['account_id'] == account
+    assert ledger.account_name(account) == 'Savings'
+    assert ledger.data['budgets']['accounts'] == {account: 50000}
+    assert ledger.data['budget_counters']['accounts'] == {account: 10000}
+    assert ledger.parse_quick_entry("-5 Savings tea")['account_id'] == account
+
+
+def test_rename_rebuilds_the_account_sort_order(ledger, account):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.quick_add("-200 Com dinner")
+    assert account_order(ledger) == ['Com Bank Main Acc', 'Sampath Acc']
+    ledger.sort_index(('amount',))
+
+    ledger.rename_account(account, 'Abc Savings')
+    assert ('account',) not in ledger.sort_indexes
+    assert ('amount',) in ledger.sort_indexes
+    assert account_order(ledger) == ['Abc Savings', 'Com Bank Main Acc']
+
+    ledger.undo()
+    assert account_order(ledger) == ['Com Bank Main Acc', 'Sampath Acc']
@@ -0,0 +1,59 @@
+from FT import ANOMALY_MIN_SAMPLES, AnomalyDetector
+
+
+def trans(tid, amount, date='October 10, 2026', account='a1', description='lunch'):
+    return {'id': tid, 'date': date, 'account_id': account, 'description': description, 'amount': amount}
+
+
+def test_near_duplicate_within_window():
+    detector = AnomalyDetector()
+    detector.add(trans(1, -500))
+    assert detector.add(trans(2, -500, date='October 12, 2026', description='Lunch!')) == {'duplicate'}
+    assert detector.add(trans(3, -500, date='October 20, 2026')) == set()
+
+
+def test_remove_clears_duplicate_index():
+    detector = AnomalyDetector()
+    detector.add(trans(1, -500))
+    detector.remove(trans(1, -500))
+    assert detector.add(trans(2, -500)) == set()
+    assert 1 not in detector.flags
+
+
+def test_unusual_amount_after_enough_samples():
+    detector = AnomalyDetector()
+    for i in range(ANOMALY_MIN_SAMPLES):
+        detector.add(trans(i, -1000 - i, description=f"shop {i}", date=f"October {i + 1:02d}, 2026"))
+    assert 'unusual' in detector.add(trans(99, -100000, description='shop big'))
+    assert detector.add(trans(100, -1004, description='shop again')) == set()
+
+
+def test_remove_undoes_statistics():
+    detector = AnomalyDetector()
+    detector.add(trans(1, -100))
+    detector.add(trans(2, -300, description='dinner'))
+    detector.remove(trans(2, -300, description='dinner'))
+    count, mean, m2 = detector.stats[('a1', True)]
+    assert (count, mean, m2) == (1, -100.0, 0.0)
+
+
+def test_move_before_ui_delivery_updates_both_accounts(ledger, account):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.anomaly_flags()
+    ledger.events.ui_dispatch = lambda callback: None
+    ledger.quick_add("-300 Sampath dinner")
+    target = ledger.match_account(['Com'])[0]
+    ledger.move_transactions([ledger.data['transactions'][-1]['id']], target)
+    stats = ledger.detector.stats
+    assert stats[(account, True)][:2] == (1, -10000.0)
+    assert stats[(target, True)][:2] == (1, -30000.0)
+
+
+
+def test_flags_cover_archived_months_only_once_loaded(archived_ledger):
+    assert archived_ledger.anomaly_flags() == {}
+    assert archived_ledger.partition_reads == []
+
+    assert archived_ledger.load_next_period() == '2020-01'
+    second = archived_ledger.data['transactions'][1]['id']
+    assert archived_ledger.anomaly_flags() == {second: {'duplicate'}}
@@ -0,0 +1,64 @@
+import json
+import os
+import urllib.error
+import urllib.request
+
+import pytest
+
+from FT import LedgerAPI
+
+
+@pytest.fixture
+def api(ledger):
+    api = LedgerAPI(lambda: ledger, port=0)
+    yield api
+    api.stop()
+
+
+def get(api, path, etag=None):
+    """(status, ETag, decoded body or None) of a GET request"""
+    request = urllib.request.Request(f"http://127.0.0.1:{api.port}{path}")
+    if etag:
+        request.add_header('If-None-Match', etag)
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers['ETag'], json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        return e.code, e.headers['ETag'], json.loads(body) if body else None
+
+
+def test_unchanged_ledger_answers_not_modified(api):
+    status, etag, body = get(api, '/accounts')
+    assert status == 200
+    assert get(api, '/accounts')[1] == etag
+    assert {account['name'] for account in body} >= {'Sampath Acc', 'Crypto $'}
+    assert get(api, '/accounts', etag) == (304, etag, None)
+
+
+def test_changes_give_a_new_etag(api, ledger):
+    _, etag, _ = get(api, '/transactions')
+    ledger.quick_add("-100 Sampath lunch")
+    status, new_etag, body = get(api, '/transactions', etag)
+    assert status == 200
+    assert new_etag != etag
+    assert [trans['description'] for trans in body['transactions']] == ['lunch']
+
+
+def test_price_file_changes_give_a_new_etag(api, ledger, tmp_path):
+    prices = tmp_path / 'prices.csv'
+    prices.write_text("date,symbol,price\n2026-01-02,BTC,100\n")
+    ledger.set_price_file(str(prices))
+    _, etag, _ = get(api, '/chart')
+    version = ledger.version
+    prices.write_text("date,symbol,price\n2026-01-02,BTC,100\n2026-01-03,BTC,120\n")
+    os.utime(prices, ns=(0, 0))
+    assert ledger.version == version
+    assert get(api, '/chart', etag)[0] == 200
+
+
+def test_bad_requests(api):
+    assert get(api, '/nothing')[0] == 404
+    status, _, body = get(api, '/transactions?limit=many')
+    assert status == 400
+    assert body['error'].startswith("Bad request")
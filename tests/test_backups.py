@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from FT import Ledger, LedgerPassphraseError
+
+
+@pytest.fixture(autouse=True)
+def no_automatic_backups(ledger):
+    """Keep the save worker from taking (and pruning) snapshots of its own"""
+    ledger.last_backup = time.time()
+
+
+def descriptions(ledger):
+    return sorted(trans['description'] for trans in ledger.data['transactions'])
+
+
+def test_restore_brings_back_transactions(ledger_path, ledger, account):
+    ledger.quick_add("-100 Sampath lunch")
+    name = ledger.backup(force=True)
+    ledger.quick_add("-50 Sampath coffee")
+
+    assert ledger.restore_backup(name) == 1
+    assert descriptions(ledger) == ['lunch']
+    assert ledger.data['categories']['Cash & Bank'][account] == -10000
+    ledger.events.close()
+    assert descriptions(Ledger(ledger_path, read_only=True)) == ['lunch']
+
+
+def test_restore_keeps_a_snapshot_of_the_replaced_state(ledger):
+    ledger.quick_add("-100 Sampath lunch")
+    first = ledger.backup(force=True)
+    ledger.quick_add("-50 Sampath coffee")
+    ledger.restore_backup(first)
+
+    backups = ledger.list_backups()
+    assert first in [backup['name'] for backup in backups]
+    latest = backups[0]
+    assert latest['name'] != first
+    assert latest['transactions'] == 2
+
+    ledger.restore_backup(latest['name'])
+    assert descriptions(ledger) == ['coffee', 'lunch']
+
+
+def test_unchanged_blocks_reuse_their_chunks(ledger):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.backup(force=True)
+    chunks = dict(ledger.backup_chunks)
+    ledger.backup(force=True)
+    assert ledger.backup_chunks == chunks
+
+
+def test_encrypted_backup_needs_the_passphrase(ledger_path, ledger):
+    ledger.set_storage('binary', passphrase='secret')
+    ledger.quick_add("-100 Sampath lunch")
+    name = ledger.backup(force=True)
+    assert ledger.list_backups()[0]['encrypted']
+    ledger.events.close()
+
+    reopened = Ledger(ledger_path, passphrase='secret')
+    reopened.passphrase = None
+    with pytest.raises(LedgerPassphraseError):
+        reopened.restore_backup(name)
+    assert reopened.restore_backup(name, passphrase='secret') == 1
+    reopened.events.close()
+
+
+def test_snapshots_in_the_same_second_get_distinct_names(ledger):
+    names = [ledger.backup(force=True, prune=False) for _ in range(3)]
+    assert len(set(names)) == 3
+    assert [backup['name'] for backup in ledger.list_backups()] == names[::-1]
+    ledger.prune_backups()
+    assert [backup['name'] for backup in ledger.list_backups()] == names[-1:]
+
+
+def test_backup_is_skipped_until_the_interval_passes(ledger):
+    assert ledger.backup() is None
+    assert ledger.backup(force=True)
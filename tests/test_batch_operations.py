@@ -0,0 +1,66 @@
+def balance(ledger, aid):
+    return ledger.data['categories'][ledger.account_category(aid)][aid]
+
+
+def test_move_between_lkr_accounts_keeps_amounts(ledger, account):
+    target = ledger.match_account(['Com'])[0]
+    ledger.quick_add("-1500 Sampath groceries")
+    tid = ledger.data['transactions'][-1]['id']
+    ledger.move_transactions([tid], target)
+
+    assert ledger.find_transactions([tid])[0]['amount'] == -150000
+    assert ledger.find_transactions([tid])[0]['account_id'] == target
+    assert balance(ledger, account) == 0
+    assert balance(ledger, target) == -150000
+
+
+def test_move_into_usd_account_converts_at_the_rate(ledger, account):
+    crypto = ledger.match_account(['Crypto'])[0]
+    ledger.quick_add("-1450 Sampath groceries")
+    tid = ledger.data['transactions'][-1]['id']
+    crypto_total = ledger.calculate_totals()['crypto']
+    ledger.move_transactions([tid], crypto)
+
+    assert ledger.find_transactions([tid])[0]['amount'] == -500
+    assert balance(ledger, account) == 0
+    assert balance(ledger, crypto) == -500
+    assert ledger.calculate_totals()['crypto'] == crypto_total - 1450
+
+    ledger.move_transactions([tid], account)
+    assert ledger.find_transactions([tid])[0]['amount'] == -145000
+    assert balance(ledger, account) == -145000
+    assert balance(ledger, crypto) == 0
+
+
+def test_undoing_a_move_restores_amount_and_balances(ledger, account):
+    crypto = ledger.match_account(['Crypto'])[0]
+    ledger.quick_add("-1450 Sampath groceries")
+    tid = ledger.data['transactions'][-1]['id']
+    ledger.move_transactions([tid], crypto)
+    ledger.undo()
+
+    trans = ledger.find_transactions([tid])[0]
+    assert (trans['account_id'], trans['amount']) == (account, -145000)
+    assert balance(ledger, account) == -145000
+    assert balance(ledger, crypto) == 0
+
+
+def test_delete_removes_every_leg_and_reverses_balances(ledger, account):
+    target = ledger.match_account(['Com'])[0]
+    ledger.quick_add("-100 Sampath lunch")
+    ids = ledger.transfer(account, target, 5000, 'October 01, 2026')
+    ledger.delete_transactions(ids[:1])
+
+    assert [trans['description'] for trans in ledger.data['transactions']] == ['lunch']
+    assert balance(ledger, account) == -10000
+    assert balance(ledger, target) == 0
+
+
+def test_retag_many_is_one_undo_step(ledger):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.quick_add("-200 Sampath dinner")
+    ids = [trans['id'] for trans in ledger.data['transactions']]
+    ledger.retag_transactions(ids, 'Rewards')
+    assert {trans['rule_category'] for trans in ledger.data['transactions']} == {'Rewards'}
+    assert ledger.undo() == "Re-tag transactions"
+    assert {trans['rule_category'] for trans in ledger.data['transactions']} == {'-'}
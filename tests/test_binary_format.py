@@ -0,0 +1,59 @@
+import pytest
+
+from FT import (Ledger, LedgerFileReader, LedgerPassphraseError, date_period, is_ledger_file,
+                write_ledger_file)
+
+
+ROWS = [
+    {'id': 1, 'date': 'September 30, 2026', 'account_id': 'a1', 'description': 'rent', 'amount': -5000,
+     'rule_category': 'Essentials'},
+    {'id': 2, 'date': 'October 01, 2026', 'account_id': 'a2', 'description': 'salary', 'amount': 90000,
+     'rule_category': '-', 'group': 'g1', 'transfer': True},
+    {'id': 3, 'date': 'October 02, 2026', 'account_id': 'a1', 'description': 'café', 'amount': -1,
+     'rule_category': 'Rewards'}
+]
+
+
+def period_of(trans):
+    return date_period(trans['date'])
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'lzma'])
+def test_round_trip(tmp_path, codec):
+    path = str(tmp_path / 'ledger.ftl')
+    write_ledger_file(path, {'exchange_rate': 300.0}, ROWS, period_of, codec=codec)
+    assert is_ledger_file(path)
+    reader = LedgerFileReader(path)
+    try:
+        assert reader.read_meta() == {'exchange_rate': 300.0}
+        assert reader.read_transactions() == ROWS
+        assert [entry['period'] for entry in reader.transaction_blocks()] == ['2026-09', '2026-10']
+    finally:
+        reader.close()
+
+
+def test_encrypted_round_trip(tmp_path):
+    path = str(tmp_path / 'ledger.ftl')
+    write_ledger_file(path, {}, ROWS, period_of, passphrase='secret')
+    with pytest.raises(LedgerPassphraseError):
+        LedgerFileReader(path)
+    with pytest.raises(LedgerPassphraseError):
+        LedgerFileReader(path, 'wrong')
+    reader = LedgerFileReader(path, 'secret')
+    try:
+        assert reader.read_transactions() == ROWS
+    finally:
+        reader.close()
+
+
+def test_ledger_switches_to_binary_and_back(ledger_path, ledger):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.set_storage('binary', passphrase='secret')
+    ledger.events.close()
+    with pytest.raises(LedgerPassphraseError):
+        Ledger(ledger_path)
+    reopened = Ledger(ledger_path, passphrase='secret')
+    assert reopened.data['transactions'] == ledger.data['transactions']
+    reopened.set_storage('json')
+    reopened.events.close()
+    assert Ledger(ledger_path, read_only=True).data['transactions'] == ledger.data['transactions']
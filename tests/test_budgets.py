@@ -0,0 +1,24 @@
+from FT import to_minor
+
+
+def test_counters_follow_adds_and_undo(ledger, account):
+    ledger.set_budget('rule_categories', 'Essentials', to_minor(1000))
+    ledger.set_budget('accounts', account, to_minor(500))
+    ledger.quick_add("-100 Sampath groceries #essentials")
+    ledger.quick_add("+50 Sampath refund #essentials")
+    status = {(kind, name): (limit, spent) for kind, name, limit, spent in ledger.get_budget_status()}
+    assert status[('rule_categories', 'Essentials')] == (100000, 10000)
+    assert status[('accounts', account)] == (50000, 10000)
+    ledger.undo()
+    ledger.undo()
+    assert ledger.get_budget_status()[0][3] == 0
+
+
+def test_recount_only_touches_the_given_data(ledger):
+    own = ledger.data
+    this_month = own['budget_counters']['period'] + '-01'
+    other = {'transactions': [{'id': 1, 'date': this_month, 'account_id': 'a1', 'amount': -500,
+                               'rule_category': 'Rewards'}]}
+    ledger.recount_budget_counters(other)
+    assert ledger.data is own
+    assert other['budget_counters']['rule_categories'] == {'Rewards': 500}
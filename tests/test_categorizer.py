@@ -0,0 +1,51 @@
+from FT import DEFAULT_CATEGORY_RULES, Categorizer
+
+
+def test_rules_come_first():
+    model = Categorizer(DEFAULT_CATEGORY_RULES)
+    assert model.classify("Keells supermarket") == 'Essentials'
+    assert model.classify("something else") == '-'
+
+
+def test_learns_from_tagged_descriptions():
+    model = Categorizer([])
+    for _ in range(3):
+        model.learn("gym membership", 'Rewards')
+        model.learn("bond coupon", 'Growth')
+    assert model.classify("monthly gym") == 'Rewards'
+    assert model.classify("coupon") == 'Growth'
+
+
+def test_unlearning_restores_counts():
+    model = Categorizer([])
+    model.learn("gym membership", 'Rewards')
+    model.learn("gym membership", 'Rewards', -1)
+    assert model.doc_counts['Rewards'] == 0
+    assert model.classify("gym") == '-'
+
+
+def test_retags_before_ui_delivery_are_learned_in_order(ledger):
+    ledger.quick_add("-100 Sampath lunch #essentials")
+    model = ledger.categorizer()
+    # Hold UI delivery, as the Tk loop does until it is idle
+    ledger.events.ui_dispatch = lambda callback: None
+    tid = ledger.data['transactions'][-1]['id']
+    ledger.retag_transactions([tid], 'Growth')
+    ledger.retag_transactions([tid], 'Stability')
+    assert model.doc_counts == {'Growth': 0, 'Stability': 1, 'Essentials': 0, 'Rewards': 0}
+
+
+def test_add_tags_untagged_transactions(ledger, account):
+    ledger.add_transaction({'date': 'October 01, 2026', 'account_id': account,
+                            'description': 'Netflix subscription', 'amount': -1500})
+    assert ledger.data['transactions'][-1]['rule_category'] == 'Rewards'
+
+
+def test_archived_months_are_learned_as_they_load(archived_ledger):
+    model = archived_ledger.categorizer()
+    assert archived_ledger.partition_reads == []
+    assert model.doc_counts['Essentials'] == 0
+
+    archived_ledger.load_next_period()
+    assert model.doc_counts['Essentials'] == 2
+    assert model.word_counts['Essentials']['rent'] == 2
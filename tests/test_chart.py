@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from FT import PortfolioChart
+
+WIDTH = 200
+
+
+class Canvas:
+    """Stands in for the Tk canvas: a plot area WIDTH pixels wide, draws only queued"""
+
+    def __init__(self):
+        self.frames = []
+
+    def after(self, ms, callback):
+        self.frames.append(callback)
+        return len(self.frames)
+
+    def winfo_width(self):
+        return PortfolioChart.PAD_LEFT + WIDTH + PortfolioChart.PAD_RIGHT
+
+    def winfo_height(self):
+        return 250
+
+
+def chart(ledger):
+    view = PortfolioChart.__new__(PortfolioChart)
+    view.gui = SimpleNamespace(ledger=ledger)
+    view.canvas = Canvas()
+    view.history = ledger.daily_history()
+    view.days, view.values = view.history
+    view.range, view.zoomed, view.view = '1M', False, None
+    view.pointer, view.drag, view.pending, view.preset_buttons = None, None, None, {}
+    view.set_range('1M')
+    return view
+
+
+def spend(ledger, account, days_ago):
+    ledger.add_transaction({'date': (date.today() - timedelta(days=days_ago)).strftime('%B %d, %Y'),
+                            'account_id': account, 'description': 'lunch', 'amount': -10000})
+
+
+def test_presets_end_today_and_fit_the_data(ledger, account):
+    spend(ledger, account, 60)
+    view = chart(ledger)
+    today = date.today().toordinal()
+    assert view.view == (today - 29, today)
+    view.set_range('1Y')
+    assert view.view == (view.days[0], today)
+    view.set_range('All')
+    assert view.view == (today - 61, today)
+    # Redraws wait for the next frame and are merged until then
+    assert len(view.canvas.frames) == 1
+
+
+def test_wheel_zooms_around_the_pointer(ledger):
+    view = chart(ledger)
+    start, end = view.view
+    view.on_wheel(SimpleNamespace(num=4, delta=0, x=PortfolioChart.PAD_LEFT + WIDTH // 4))
+    anchor = start + (end - start) / 4
+    new_start, new_end = view.view
+    assert view.zoomed
+    assert new_end - new_start == pytest.approx((end - start) * 0.8)
+    assert new_start + (new_end - new_start) / 4 == pytest.approx(anchor)
+
+    for _ in range(20):
+        view.on_wheel(SimpleNamespace(num=4, delta=0, x=PortfolioChart.PAD_LEFT))
+    assert view.view[1] - view.view[0] == PortfolioChart.MIN_SPAN
+
+
+def test_drag_pans_within_the_data(ledger, account):
+    spend(ledger, account, 60)
+    view = chart(ledger)
+    start, end = view.view
+    view.on_press(SimpleNamespace(x=100))
+    view.on_drag(SimpleNamespace(x=200))
+    assert view.view == pytest.approx((start - 14.5, end - 14.5))
+    view.on_drag(SimpleNamespace(x=100 + 10 * WIDTH))
+    assert view.view == (view.days[0], view.days[0] + 29)
+    view.on_release(None)
+    view.on_drag(SimpleNamespace(x=0))
+    assert view.view == (view.days[0], view.days[0] + 29)
+
+
+def test_new_history_keeps_a_zoom_and_follows_a_preset(ledger, account):
+    spend(ledger, account, 60)
+    view = chart(ledger)
+    view.set_range('All')
+    spend(ledger, account, 90)
+    view.update_series()
+    assert view.view[0] == view.days[0] == date.today().toordinal() - 91
+
+    view.set_view(view.days[0] + 10, view.days[0] + 40)
+    spend(ledger, account, 5)
+    view.update_series()
+    assert view.view == (view.days[0] + 10, view.days[0] + 40)
+    assert view.values[-1] == -300
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from FT import DashboardCanvas
+
+
+class Canvas:
+    """Stands in for the Tk canvas: a fixed width, and nothing is drawn"""
+
+    def __init__(self, width=800):
+        self.width = width
+        self.options = {}
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def winfo_exists(self):
+        return False
+
+    def winfo_width(self):
+        return self.width
+
+
+def dashboard(ledger, **actions):
+    view = DashboardCanvas.__new__(DashboardCanvas)
+    view.gui = SimpleNamespace(ledger=ledger, **actions)
+    view.canvas = Canvas()
+    view.rows, view.tops, view.drawn = [], [], None
+    view.layout(ledger.calculate_totals())
+    return view
+
+
+def account_row(view, name):
+    return next(row for row in view.rows if row[2] == 'account' and row[3]['name'] == name)
+
+
+def test_layout_has_a_row_per_account_and_section(ledger):
+    view = dashboard(ledger)
+    accounts = sum(len(accounts) for accounts in ledger.data['categories'].values())
+    assert len(view.rows) == accounts + 4 * len(ledger.data['categories'])
+    assert view.canvas.options['height'] == sum(row[1] for row in view.rows)
+    assert view.row_at(0)[2:] == ('header', 'Cash & Bank')
+    assert view.row_at(DashboardCanvas.ROW_HEIGHTS['header'])[2] == 'account'
+    assert view.row_at(view.canvas.options['height'] - 1)[2] == 'gap'
+    assert view.row_at(-1) is None
+
+
+def test_account_rows_show_currency_budget_and_reconciliation(ledger, account):
+    crypto = ledger.match_account(['Crypto'])[0]
+    ledger.edit_balance(crypto, 1000)
+    ledger.set_budget('accounts', account, 5000)
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.reconcile(ledger.match_account(['Com'])[0], 0)
+    view = dashboard(ledger)
+
+    usd = account_row(view, 'Crypto $')[3]
+    assert usd['balance'] == "$ 10.00"
+    assert usd['notes'][0][0] == "(≈ 2,900.00 LKR)"
+    assert [icon for icon, _, _ in usd['buttons']] == ["✏️", "⚖️", "📈"]
+    assert "⚖️ Unreconciled (+10.00 untracked)" in [text for text, _ in usd['notes']]
+    assert [text for text, _ in account_row(view, 'Sampath Acc')[3]['notes']] == ["⚠️ Over budget"]
+    assert account_row(view, 'Com Bank Main Acc')[3]['notes'][0][0].startswith("✓ Reconciled ")
+
+
+def test_clicks_hit_the_button_under_the_pointer(ledger, account):
+    clicked = []
+    view = dashboard(ledger, reconcile_account=clicked.append, add_account=clicked.append)
+    top = account_row(view, 'Sampath Acc')[0]
+    right = view.canvas.width - DashboardCanvas.PAD
+
+    view.on_click(SimpleNamespace(x=right - 60, y=top + 20))
+    assert clicked == [account]
+    assert view.hit(SimpleNamespace(x=right - 43, y=top + 20)) is None
+    assert view.hit(SimpleNamespace(x=right - 60, y=top + 2)) is None
+
+    add = next(row for row in view.rows if row[2:] == ('add', 'Upcoming'))
+    view.on_click(SimpleNamespace(x=DashboardCanvas.PAD + 1, y=add[0] + 20))
+    assert clicked == [account, 'Upcoming']
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+
+import pytest
+
+import FT
+from FT import Ledger, export_dataset, read_import_csv
+
+
+@pytest.fixture
+def history(archived_ledger):
+    """The archived ledger plus this month's payments in LKR and USD (no automatic backups)"""
+    archived_ledger.last_backup = time.time()
+    archived_ledger.quick_add("-1,500.50 Sampath groceries #essentials")
+    archived_ledger.quick_add("+12.34 Crypto coins")
+    return archived_ledger
+
+
+def exported(ledger, fmt, path):
+    list(export_dataset(ledger, 'transactions', fmt, path))
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_export_streams_one_row_at_a_time(history, tmp_path, monkeypatch):
+    monkeypatch.setattr(FT, 'EXPORT_CHUNK_ROWS', 1)
+    path = str(tmp_path / 'out.csv')
+    export = export_dataset(history, 'transactions', 'csv', path)
+    assert next(export) == (1, 4)
+    assert os.path.exists(path + '.tmp') and not os.path.exists(path)
+    assert list(export) == [(2, 4), (3, 4), (4, 4), (4, 4)]
+    assert os.path.exists(path) and not os.path.exists(path + '.tmp')
+    # Archived months are streamed from disk, not loaded
+    assert history.unloaded_periods() == ['2020-01']
+    assert history.partition_reads == ['2020-01']
+
+
+def test_cancelled_export_leaves_nothing_behind(history, tmp_path, monkeypatch):
+    monkeypatch.setattr(FT, 'EXPORT_CHUNK_ROWS', 1)
+    path = str(tmp_path / 'out.csv')
+    export = export_dataset(history, 'transactions', 'csv', path)
+    next(export)
+    export.close()
+    assert not os.path.exists(path + '.tmp')
+    assert not os.path.exists(path)
+
+
+def test_csv_round_trips_through_import(history, tmp_path):
+    path = str(tmp_path / 'out.csv')
+    exported(history, 'csv', path)
+    target = Ledger(str(tmp_path / 'copy.json'))
+    try:
+        rows, skipped = read_import_csv(target, path)
+        assert skipped == 0
+        target.import_transactions(rows)
+        fields = ('date', 'description', 'amount', 'rule_category')
+        copied = sorted((target.account_name(trans['account_id']),) + tuple(trans[field] for field in fields)
+                        for trans in target.iter_transactions())
+        original = sorted((history.account_name(trans['account_id']),) + tuple(trans[field] for field in fields)
+                          for trans in history.iter_transactions())
+        assert copied == original
+    finally:
+        target.events.close()
+
+
+def test_jsonl_rows_match_the_ledger(history, tmp_path):
+    lines = exported(history, 'jsonl', str(tmp_path / 'out.jsonl')).splitlines()
+    rows = {row['id']: row for row in map(json.loads, lines)}
+    assert len(rows) == 4
+    for trans in history.iter_transactions():
+        row = rows[trans['id']]
+        assert row['account'] == history.account_name(trans['account_id'])
+        assert (row['date'], row['description'], row['rule_category']) == (
+            trans['date'], trans['description'], trans['rule_category'])
+        assert round(row['amount'] * 100) == trans['amount']
+    assert sorted(row['amount'] for row in rows.values()) == [-1500.5, -500.0, -500.0, 12.34]
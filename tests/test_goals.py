@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def in_days(days):
+    return (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def statuses(ledger):
+    return {goal['id']: goal for goal in ledger.goal_status()}
+
+
+def test_account_goal_follows_balances(ledger, account):
+    gid = ledger.add_goal("Holiday", 100000, in_days(90), accounts=[account])
+    assert statuses(ledger)[gid]['saved'] == 0
+    ledger.edit_balance(account, 30000)
+    ledger.quick_add("+200 Sampath gift")
+    goal = statuses(ledger)[gid]
+    assert goal['saved'] == 50000
+    assert goal['remaining'] == 50000
+    assert goal['status'] == 'active'
+    assert goal['monthly'] == -(-50000 // goal['months_left'])
+
+
+def test_rule_goal_counts_tagged_transactions_since_its_start(ledger):
+    ledger.add_transaction({'date': 'January 01, 2020', 'account_id': ledger.match_account(['Sampath'])[0],
+                            'description': 'old', 'amount': 90000, 'rule_category': 'Growth'})
+    gid = ledger.add_goal("Invest", 50000, in_days(30), rule_category='Growth')
+    ledger.quick_add("+300 Sampath bond #growth")
+    ledger.quick_add("+100 Sampath lunch #essentials")
+    assert statuses(ledger)[gid]['saved'] == 30000
+
+    tid = ledger.data['transactions'][-1]['id']
+    ledger.retag_transactions([tid], 'Growth')
+    assert statuses(ledger)[gid]['saved'] == 40000
+    ledger.undo()
+    assert statuses(ledger)[gid]['saved'] == 30000
+
+
+def test_usd_accounts_count_at_the_current_rate(ledger):
+    crypto = ledger.match_account(['Crypto'])[0]
+    gid = ledger.add_goal("Coins", 100000, in_days(30), accounts=[crypto])
+    ledger.edit_balance(crypto, 100)
+    assert statuses(ledger)[gid]['saved'] == 29000
+    ledger.set_exchange_rate(300.0)
+    assert statuses(ledger)[gid]['saved'] == 30000
+
+
+def test_incremental_progress_matches_a_rebuild(ledger, account):
+    ledger.add_goal("Holiday", 100000, in_days(90), accounts=[account])
+    ledger.add_goal("Invest", 50000, in_days(30), rule_category='Growth')
+    ledger.goal_status()
+    # Hold UI delivery, as the Tk loop does until it is idle
+    ledger.events.ui_dispatch = lambda callback: None
+    ledger.quick_add("+300 Sampath bond #growth")
+    ledger.quick_add("-120 Sampath lunch #growth")
+    ledger.move_transactions([ledger.data['transactions'][-1]['id']], ledger.match_account(['On'])[0])
+    ledger.delete_transactions([ledger.data['transactions'][0]['id']])
+    ledger.edit_balance(account, 5000)
+    incremental = ledger.goal_status()
+    ledger.goal_tracker = None
+    assert ledger.goal_status() == incremental
+
+
+def test_reached_and_overdue(ledger, account):
+    ledger.edit_balance(account, 100000)
+    reached = ledger.add_goal("Done", 100000, in_days(30), accounts=[account])
+    overdue = ledger.add_goal("Late", 200000, in_days(-1), accounts=[account])
+    goals = statuses(ledger)
+    assert goals[reached]['status'] == 'reached'
+    assert goals[reached]['monthly'] == 0
+    assert goals[overdue]['status'] == 'overdue'
+    assert goals[overdue]['months_left'] == 0
+
+
+def test_update_and_delete_goal(ledger, account):
+    gid = ledger.add_goal("Holiday", 100000, in_days(90), accounts=[account])
+    ledger.update_goal(gid, accounts=None, rule_category='Rewards')
+    goal = statuses(ledger)[gid]
+    assert goal['rule_category'] == 'Rewards'
+    assert goal['accounts'] is None
+    ledger.delete_goal(gid)
+    assert ledger.goal_status() == []
+    with pytest.raises(ValueError, match="Unknown goal"):
+        ledger.delete_goal(gid)
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'name': ' '}, "name"),
+    ({'target': 0}, "positive"),
+    ({'target': 10.5}, "positive"),
+    ({'deadline': '31/12/2030'}, "YYYY-MM-DD"),
+    ({'deadline': '2030-02-30'}, "YYYY-MM-DD"),
+    ({'accounts': None}, "Choose"),
+    ({'accounts': ['a999']}, "Unknown account"),
+    ({'rule_category': 'Fun'}, "Unknown rule category"),
+    ({'rule_category': 'Growth'}, "either"),
+])
+def test_invalid_goals_are_rejected(ledger, account, kwargs, message):
+    goal = {'name': "Holiday", 'target': 100000, 'deadline': in_days(30), 'accounts': [account], **kwargs}
+    with pytest.raises(ValueError, match=message):
+        ledger.add_goal(**goal)
+    assert not ledger.data.get('goals')
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+import pytest
+
+
+def day(offset):
+    return (date.today() + timedelta(days=offset)).strftime('%Y-%m-%d')
+
+
+@pytest.fixture
+def prices(ledger, tmp_path):
+    """Write date,symbol,price rows (day offsets from today) and use them as the price file"""
+    def write(*rows):
+        path = tmp_path / 'prices.csv'
+        path.write_text("date,symbol,price\n" + "".join(f"{day(offset)},{symbol},{price}\n"
+                                                       for offset, symbol, price in rows))
+        ledger.set_price_file(str(path))
+    return write
+
+
+def test_valuation_counts_unpriced_positions_at_cost(ledger, prices):
+    cse, crypto = ledger.match_account(['CSE'])[0], ledger.match_account(['Crypto'])[0]
+    prices((-10, 'ABC', 100), (-5, 'ABC', 120))
+    ledger.buy(cse, 'ABC', 10, 100.0, day(-10))
+    ledger.buy(crypto, 'BTC', 2, 50.0, day(-3))
+    result = ledger.valuation()
+
+    rows = {row['symbol']: row for row in result['holdings']}
+    assert rows['ABC']['value'] == 1200
+    assert rows['ABC']['pl'] == 200
+    assert rows['ABC']['twr'] == pytest.approx(0.2)
+    assert rows['BTC']['price'] is None
+    assert rows['BTC']['value'] == rows['BTC']['cost'] == 100
+    assert rows['BTC']['twr'] is None
+    assert result['accounts'][crypto] == {'value': 100, 'cost': 100, 'pl': 0}
+    # USD positions are converted at the rate for the portfolio totals
+    assert result['value'] == pytest.approx(1200 + 100 * 290)
+    assert result['cost'] == pytest.approx(1000 + 100 * 290)
+    assert result['pl'] == pytest.approx(200)
+    assert ledger.calculate_totals()['crypto'] == pytest.approx(1200 + 100 * 290)
+
+
+def test_twr_ignores_the_size_of_later_purchases(ledger, prices):
+    cse = ledger.match_account(['CSE'])[0]
+    prices((-20, 'ABC', 100), (-10, 'ABC', 200), (0, 'ABC', 100))
+    ledger.buy(cse, 'ABC', 10, 100.0, day(-20))
+    ledger.buy(cse, 'ABC', 30, 200.0, day(-10))
+    result = ledger.valuation()
+
+    # Doubled, then halved: no time-weighted gain, though most money was lost
+    assert result['twr'] == pytest.approx(0.0)
+    assert result['pl'] == pytest.approx(4000 - 7000)
+
+
+def test_history_values_holdings_at_each_days_price(ledger, account, prices):
+    cse = ledger.match_account(['CSE'])[0]
+    prices((-10, 'ABC', 100), (-5, 'ABC', 150), (0, 'ABC', 200))
+    ledger.buy(cse, 'ABC', 10, 100.0, day(-10))
+    ledger.add_transaction({'date': (date.today() - timedelta(days=3)).strftime('%B %d, %Y'),
+                            'account_id': account, 'description': 'lunch', 'amount': -50000})
+    days, values = ledger.daily_history()
+    value = dict(zip(days, values))
+    today = date.today().toordinal()
+
+    assert value[today] == pytest.approx(ledger.calculate_totals()['real_total'])
+    assert value[today] == pytest.approx(2000 - 500)
+    assert value[today - 4] == pytest.approx(1500)
+    assert value[today - 6] == pytest.approx(1000)
+    assert value[today - 11] == 0
+    assert days[0] <= today - 30
@@ -0,0 +1,125 @@
+import json
+
+from FT import Ledger
+
+
+def corrupt(ledger_path, ledger, account):
+    """Save three transactions, then damage two of them on disk: a NaN amount and a lost date"""
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.quick_add("-200 Sampath dinner")
+    ledger.quick_add("-300 Sampath taxi")
+    ledger.events.close()
+    with open(ledger_path) as f:
+        data = json.load(f)
+    data['transactions'][0]['amount'] = float('nan')
+    data['transactions'][1]['timestamp'] = '2026-10-02T20:15:00'
+    data['transactions'][1]['date'] = None
+    with open(ledger_path, 'w') as f:
+        json.dump(data, f)
+    reopened = Ledger(ledger_path)
+    return reopened
+
+
+def test_corrupted_ledger_loads_with_bad_rows_set_aside(ledger_path, ledger, account):
+    reopened = corrupt(ledger_path, ledger, account)
+    assert [trans['description'] for trans in reopened.data['transactions']] == ['taxi']
+    assert len(reopened.data['rejected_transactions']) == 2
+    reopened.events.close()
+
+    # Set-aside rows are saved with the ledger, not dropped
+    again = Ledger(ledger_path, read_only=True)
+    assert [trans['description'] for trans in again.data['rejected_transactions']] == ['lunch', 'dinner']
+
+
+def test_fsck_reports_and_repairs_set_aside_rows(ledger_path, ledger, account):
+    reopened = corrupt(ledger_path, ledger, account)
+    report = reopened.check_integrity()
+    kinds = {issue['kind']: issue for issue in report['issues']}
+    assert report['checked'] == 3
+    assert kinds['bad_amount']['repair'] == 'manual'
+    assert kinds['bad_amount']['row']['description'] == 'lunch'
+    assert kinds['bad_date']['repair'] == {'set': {'date': 'October 02, 2026'}}
+    assert kinds['balance_mismatch']['repair'] == 'manual'
+
+    assert reopened.apply_repairs(report) == 1
+    assert [trans['description'] for trans in reopened.data['transactions']] == ['dinner', 'taxi']
+    dinner = reopened.data['transactions'][0]
+    assert (dinner['id'], dinner['date'], dinner['amount']) == (2, 'October 02, 2026', -20000)
+    assert [trans['description'] for trans in reopened.data['rejected_transactions']] == ['lunch']
+    assert reopened.data['categories']['Cash & Bank'][account] == -60000
+
+    assert reopened.undo() == "Repair ledger"
+    assert [trans['description'] for trans in reopened.data['transactions']] == ['taxi']
+    assert len(reopened.data['rejected_transactions']) == 2
+    reopened.events.close()
+
+
+def test_repaired_row_gets_a_fresh_id_when_its_own_is_taken(ledger_path, ledger, account):
+    reopened = corrupt(ledger_path, ledger, account)
+    reopened.quick_add("-400 Sampath bus")
+    reopened.data['rejected_transactions'][1]['id'] = reopened.data['transactions'][-1]['id']
+    report = reopened.check_integrity()
+    assert 'duplicate_id' in {issue['kind'] for issue in report['issues']}
+
+    reopened.apply_repairs(report)
+    ids = [trans['id'] for trans in reopened.data['transactions']]
+    assert len(ids) == len(set(ids)) == 3
+    assert reopened.data['transactions'][-1]['description'] == 'dinner'
+    reopened.events.close()
+
+
+def test_clean_ledger_has_no_issues(ledger):
+    ledger.quick_add("-100 Sampath lunch")
+    report = ledger.check_integrity()
+    assert report['checked'] == 1
+    assert report['issues'] == []
+    assert 'rejected_transactions' not in ledger.data
+
+
+def damaged_archive(ledger_path, ledger, account, **damage):
+    """Archive two January 2020 payments, damage the first one on disk and reopen the ledger"""
+    for day in ('05', '06'):
+        ledger.add_transaction({'date': f'January {day}, 2020', 'account_id': account,
+                                'description': f'rent {day}', 'amount': -50000})
+    ledger.events.close()
+    path = ledger.partition_path('2020-01')
+    with open(path) as f:
+        rows = json.load(f)
+    rows[0].update(damage)
+    with open(path, 'w') as f:
+        json.dump(rows, f)
+    return Ledger(ledger_path)
+
+
+def test_bad_row_in_an_archived_month_is_set_aside(ledger_path, ledger, account):
+    reopened = damaged_archive(ledger_path, ledger, account, amount='lots')
+    assert reopened.load_next_period() == '2020-01'
+    assert [trans['description'] for trans in reopened.data['transactions']] == ['rent 06']
+    assert reopened.data['rejected_transactions'][0]['amount'] == 'lots'
+
+    reopened.save_data()
+    with open(reopened.partition_path('2020-01')) as f:
+        assert [trans['description'] for trans in json.load(f)] == ['rent 06']
+    reopened.events.close()
+    again = Ledger(ledger_path, read_only=True)
+    assert again.data['rejected_transactions'][0]['description'] == 'rent 05'
+
+
+def test_fsck_repairs_a_bad_row_in_an_unloaded_month(ledger_path, ledger, account):
+    reopened = damaged_archive(ledger_path, ledger, account, date=None, timestamp='2020-01-05T09:00:00')
+    report = reopened.check_integrity()
+    bad_date = next(issue for issue in report['issues'] if issue['kind'] == 'bad_date')
+    assert bad_date['period'] == '2020-01'
+    assert bad_date['repair'] == {'set': {'date': 'January 05, 2020'}}
+    assert 'rejected_transactions' not in reopened.data
+
+    reopened.apply_repairs(report)
+    assert [trans['description'] for trans in reopened.data['transactions']] == ['rent 05', 'rent 06']
+    assert not reopened.data.get('rejected_transactions')
+    reopened.events.close()
+
+    again = Ledger(ledger_path, read_only=True)
+    again.load_next_period()
+    assert [trans['description'] for trans in again.data['transactions']] == ['rent 05', 'rent 06']
+    assert not again.data.get('rejected_transactions')
+    assert again.check_integrity()['issues'] == []
@@ -0,0 +1,74 @@
+import threading
+
+from FT import Ledger, LedgerReloaded
+
+
+def descriptions(ledger):
+    return sorted(trans['description'] for trans in ledger.data['transactions'])
+
+
+def test_concurrent_saves_are_merged(ledger_path, ledger, account):
+    other = Ledger(ledger_path)
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.events.close()
+    other.quick_add("-50 Sampath coffee")
+    other.events.close()
+
+    assert descriptions(other) == ['coffee', 'lunch']
+    assert other.data['categories']['Cash & Bank'][account] == -15000
+    assert len({trans['id'] for trans in other.data['transactions']}) == 2
+    assert other.data['budget_counters']['accounts'][account] == 15000
+    assert descriptions(Ledger(ledger_path, read_only=True)) == ['coffee', 'lunch']
+
+
+def test_external_changes_are_picked_up(ledger_path, ledger):
+    other = Ledger(ledger_path)
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.events.close()
+    changes = other.check_external_changes()
+    other.events.close()
+    assert len(changes['added']) == 1
+    assert descriptions(other) == ['lunch']
+
+
+def test_settings_changed_on_one_side_win(ledger_path, ledger):
+    other = Ledger(ledger_path)
+    ledger.set_exchange_rate(310.0)
+    ledger.events.close()
+    other.quick_add("-50 Sampath coffee")
+    other.events.close()
+    assert other.usd_to_lkr == 310.0
+
+
+def test_events_published_off_the_ui_thread_wait_for_delivery(ledger):
+    scheduled = []
+    ledger.events.ui_dispatch = scheduled.append
+    seen = []
+    ledger.events.subscribe(seen.extend, (LedgerReloaded,))
+    thread = threading.Thread(target=ledger.events.publish, args=([LedgerReloaded({})],))
+    thread.start()
+    thread.join()
+    assert (scheduled, seen) == ([], [])
+    ledger.events.deliver_ui()
+    assert seen == [LedgerReloaded({})]
+
+
+def test_background_save_leaves_the_merge_to_the_ui_thread(ledger_path, ledger):
+    other = Ledger(ledger_path)
+    # A Tk loop that has not got round to its idle callbacks yet
+    other.events.ui_dispatch = lambda callback: None
+    seen = []
+    other.events.subscribe(seen.extend, (LedgerReloaded,))
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.events.close()
+
+    other.quick_add("-50 Sampath coffee")
+    other.events.worker.submit(lambda: None).result()
+    assert descriptions(other) == ['coffee']
+    assert other.merge_queued
+
+    other.events.deliver_ui()
+    assert descriptions(other) == ['coffee', 'lunch']
+    assert len(seen) == 1
+    other.events.close()
+    assert descriptions(Ledger(ledger_path, read_only=True)) == ['coffee', 'lunch']
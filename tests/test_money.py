@@ -0,0 +1,42 @@
+import pytest
+
+from FT import from_minor, to_minor
+
+
+def test_to_minor_rounds_half_even():
+    assert to_minor(0.125) == 12
+    assert to_minor('10.005') == 1000
+    assert to_minor('10.015') == 1002
+    assert to_minor(-0.01) == -1
+
+
+def test_to_minor_parses_strings():
+    assert to_minor('1,234.56') == 123456
+    assert to_minor(' 7 ') == 700
+
+
+def test_to_minor_rejects_bad_amounts():
+    for bad in ('abc', 'nan', 'inf', float('nan')):
+        with pytest.raises(ValueError):
+            to_minor(bad)
+
+
+def test_round_trip():
+    for units in (0, 1, -1, 123456789):
+        assert to_minor(from_minor(units)) == units
+
+
+def test_balances_are_exact_integers(ledger, account):
+    for _ in range(10):
+        ledger.quick_add("-0.10 Sampath coffee")
+    ledger.quick_add("+1 Sampath refund")
+    assert ledger.data['categories']['Cash & Bank'][account] == 0
+    assert ledger.calculate_totals()['cash_bank'] == 0
+
+
+def test_reconciled_needs_exact_match(ledger, account):
+    ledger.quick_add("+100 Sampath salary")
+    ledger.reconcile(account, to_minor(100))
+    assert ledger.reconciliation_status(account)['reconciled']
+    ledger.quick_add("-0.01 Sampath fee")
+    assert not ledger.reconciliation_status(account)['reconciled']
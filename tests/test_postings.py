@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+TODAY = datetime.now().strftime('%B %d, %Y')
+
+
+def balance(ledger, aid):
+    return ledger.data['categories'][ledger.account_category(aid)][aid]
+
+
+def test_transfer_moves_money_without_spending(ledger, account):
+    target = ledger.match_account(['Com'])[0]
+    ledger.set_budget('accounts', account, 100000)
+    ids = ledger.transfer(account, target, 25000, TODAY)
+
+    legs = ledger.find_transactions(ids)
+    assert [(trans['account_id'], trans['amount']) for trans in legs] == [(account, -25000), (target, 25000)]
+    assert all(trans['transfer'] for trans in legs)
+    assert legs[0]['group'] == legs[1]['group']
+    assert legs[0]['description'] == "Transfer Sampath Acc → Com Bank Main Acc"
+    assert (balance(ledger, account), balance(ledger, target)) == (-25000, 25000)
+    assert ledger.get_budget_status() == [('accounts', account, 100000, 0)]
+    assert ledger.calculate_totals()['real_total'] == 0
+
+
+def test_transfer_into_usd_converts_at_the_rate(ledger, account):
+    crypto = ledger.match_account(['Crypto'])[0]
+    ledger.transfer(account, crypto, 58000, TODAY, "Buy dollars")
+    assert balance(ledger, crypto) == 200
+    assert ledger.data['transactions'][-1]['description'] == "Buy dollars"
+    assert ledger.calculate_totals()['real_total'] == 0
+
+
+def test_posting_is_one_undo_step(ledger, account):
+    target = ledger.match_account(['Com'])[0]
+    ids = ledger.transfer(account, target, 25000, TODAY)
+    group = ledger.find_transactions(ids)[0]['group']
+    assert ledger.undo() == "Transfer"
+    assert ledger.data['transactions'] == []
+    assert (balance(ledger, account), balance(ledger, target)) == (0, 0)
+    assert ledger.linked_legs(group) == set()
+
+    ledger.redo()
+    assert ledger.linked_legs(group) == set(ids)
+    assert balance(ledger, target) == 25000
+
+
+def test_split_tags_each_leg_and_counts_in_budgets(ledger, account):
+    ledger.set_budget('rule_categories', 'Essentials', 100000)
+    ids = ledger.split(account, TODAY, "Supermarket", {'Essentials': -30000, 'Rewards': -5000, 'Growth': 0})
+
+    legs = ledger.find_transactions(ids)
+    assert [(trans['rule_category'], trans['amount']) for trans in legs] == [('Essentials', -30000),
+                                                                           ('Rewards', -5000)]
+    assert not any('transfer' in trans for trans in legs)
+    assert balance(ledger, account) == -35000
+    assert ledger.get_budget_status()[0] == ('rule_categories', 'Essentials', 100000, 30000)
+    assert ledger.with_linked_legs(ids[:1]) == set(ids)
+
+
+def test_editing_one_leg_keeps_the_group(ledger, account):
+    ids = ledger.split(account, TODAY, "Supermarket", {'Essentials': -30000, 'Rewards': -5000})
+    ledger.quick_add("-100 Sampath lunch")
+    lunch = ledger.data['transactions'][-1]['id']
+    ledger.retag_transactions(ids[1:], 'Essentials')
+    assert ledger.with_linked_legs([ids[1], lunch]) == set(ids) | {lunch}
+
+
+@pytest.mark.parametrize('legs, message', [
+    ([{'account_id': 'a4', 'amount': -100}], "at least two legs"),
+    ([{'account_id': 'a4', 'amount': -100}, {'account_id': 'a999', 'amount': 100}], "Unknown account"),
+])
+def test_invalid_postings_are_rejected(ledger, legs, message):
+    with pytest.raises(ValueError, match=message):
+        ledger.add_posting(TODAY, "Bad", legs)
+    assert ledger.data['transactions'] == []
+
+
+def test_transfer_needs_two_accounts(ledger, account):
+    with pytest.raises(ValueError, match="two different accounts"):
+        ledger.transfer(account, account, 100, TODAY)
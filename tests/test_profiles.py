@@ -0,0 +1,71 @@
+import json
+import subprocess
+import sys
+import time
+
+import pytest
+
+from FT import PROFILE_CACHE_SIZE, ProfileManager
+
+
+HOLD_LOCK = """
+import fcntl, sys
+with open(sys.argv[1], 'a') as f:
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    print('locked', flush=True)
+    sys.stdin.readline()
+"""
+
+
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    """A profile registry in a temporary directory, with PROFILE_CACHE_SIZE profiles besides Default"""
+    monkeypatch.chdir(tmp_path)
+    profiles = ProfileManager('finance_profiles.json')
+    for i in range(PROFILE_CACHE_SIZE):
+        profiles.create(f"Profile {i}")
+    yield profiles
+    profiles.close()
+
+
+def test_least_recently_used_profile_is_unloaded(profiles):
+    names = profiles.names()
+    first = {name: profiles.open(name) for name in names[:PROFILE_CACHE_SIZE]}
+    # Using the oldest profile again makes the second one the least recently used
+    profiles.open(names[0]).quick_add("-100 Sampath lunch")
+    profiles.open(names[-1])
+
+    assert list(profiles.ledgers) == names[2:PROFILE_CACHE_SIZE] + [names[0], names[-1]]
+    assert profiles.registry['active'] == names[-1]
+    assert profiles.registry['profiles'][names[1]]['totals'] is not None
+    assert profiles.open(names[1]) is not first[names[1]]
+    assert names[2] not in profiles.ledgers
+
+
+def test_unloaded_profiles_count_with_their_cached_totals(profiles):
+    names = profiles.names()
+    profiles.open(names[0]).edit_balance(profiles.ledgers[names[0]].match_account(['Sampath'])[0], 100000)
+    for name in names[1:]:
+        profiles.open(name)
+    assert names[0] not in profiles.ledgers
+    assert profiles.consolidated_totals()['cash_bank'] == 1000.0
+
+
+def test_writer_waits_for_a_lock_held_by_another_process(ledger_path, ledger):
+    pytest.importorskip('fcntl')
+    ledger.save_data()
+    holder = subprocess.Popen([sys.executable, '-c', HOLD_LOCK, ledger.lock_file],
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline() == 'locked\n'
+        ledger.set_exchange_rate(300.0)
+        time.sleep(0.3)
+        with open(ledger_path) as f:
+            assert json.load(f)['exchange_rate'] == 290.0
+    finally:
+        holder.stdin.write('\n')
+        holder.stdin.close()
+        holder.wait()
+    ledger.events.close()
+    with open(ledger_path) as f:
+        assert json.load(f)['exchange_rate'] == 300.0
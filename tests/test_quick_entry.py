@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from FT import PrefixTrie
+
+
+def test_trie_lookup_ignores_case():
+    trie = PrefixTrie()
+    trie.add("Sampath Acc", 'a4')
+    assert trie.lookup("sampath acc") == ("Sampath Acc", 'a4')
+    assert trie.lookup("sampath") is None
+
+
+def test_trie_completes_most_used_first():
+    trie = PrefixTrie()
+    trie.add("coffee")
+    trie.add("cake", count=3)
+    trie.add("coconut", count=3)
+    trie.add("bread", count=5)
+    assert [text for text, _ in trie.complete("c")] == ["cake", "coconut", "coffee"]
+    assert [text for text, _ in trie.complete("co", 1)] == ["coconut"]
+    assert trie.complete("x") == []
+
+
+def test_trie_removal_prunes_unused_paths():
+    trie = PrefixTrie()
+    trie.add("tea", count=2)
+    trie.add("te")
+    trie.remove("tea")
+    assert trie.lookup("tea") == ("tea", None)
+    trie.remove("tea")
+    trie.remove("te")
+    trie.remove("missing")
+    assert trie.root == {}
+
+
+def test_parse_quick_entry(ledger, account):
+    trans = ledger.parse_quick_entry("-1,500.50 Samp groceries #ess @2024-03-05")
+    assert trans['account_id'] == account
+    assert trans['amount'] == -150050
+    assert trans['description'] == 'groceries'
+    assert trans['rule_category'] == 'Essentials'
+    assert trans['date'] == 'March 05, 2024'
+
+
+def test_parse_quick_entry_dates_and_longest_account_name(ledger):
+    trans = ledger.parse_quick_entry("@yesterday 250 Com Bank Main Acc salary")
+    assert trans['account_id'] == ledger.match_account(['Com'])[0]
+    assert trans['description'] == 'salary'
+    assert 'rule_category' not in trans
+    assert trans['date'] == (datetime.now() - timedelta(days=1)).strftime('%B %d, %Y')
+
+
+@pytest.mark.parametrize('text, message', [
+    ("Sampath lunch", "Start with an amount"),
+    ("-100", "Name an account"),
+    ("-100 C lunch", "No single account matches 'C'"),
+    ("-100 Sampath", "Add a description"),
+    ("-100 Sampath lunch #x", "Unknown rule category '#x'"),
+    ("-100 Sampath lunch @31/12/2024", "Unknown date"),
+])
+def test_parse_quick_entry_errors(ledger, text, message):
+    with pytest.raises(ValueError, match=message):
+        ledger.parse_quick_entry(text)
+
+
+def test_tries_follow_changes_before_ui_delivery(ledger):
+    tries = ledger.completions()
+    # Hold UI delivery, as the Tk loop does until it is idle
+    ledger.events.ui_dispatch = lambda callback: None
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.delete_transactions([ledger.data['transactions'][-1]['id']])
+    aid = ledger.add_account('Cash & Bank', 'Wallet')
+    ledger.rename_account(aid, 'Purse')
+
+    assert tries['description'].complete("l") == [("lunch", None)]
+    assert tries['account'].lookup("purse") == ("Purse", aid)
+    assert tries['account'].lookup("wallet") is None
+    assert ledger.match_account(['Pur']) == (aid, 1)
+
+    ledger.delete_transactions([ledger.data['transactions'][-1]['id']])
+    assert tries['description'].complete("l") == []
+
+
+def test_descriptions_of_archived_months_complete_once_loaded(archived_ledger):
+    tries = archived_ledger.completions()
+    assert tries['description'].complete("re") == []
+    archived_ledger.load_next_period()
+    assert tries['description'].complete("re") == [("rent", None)]
+    assert archived_ledger.partition_reads == ['2020-01']
@@ -0,0 +1,55 @@
+def status(ledger, aid):
+    return ledger.reconciliation_status(aid)
+
+
+def test_reconcile_posts_the_gap_as_an_adjustment(ledger, account):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.edit_balance(account, 40000)
+    assert status(ledger, account)['difference'] == 50000
+
+    assert ledger.reconcile(account, 45000) == 55000
+    adjustment = ledger.data['transactions'][-1]
+    assert adjustment['adjustment'] and adjustment['amount'] == 55000
+    result = status(ledger, account)
+    assert (result['balance'], result['derived'], result['difference']) == (45000, 45000, 0)
+    assert result['statement'] == 45000
+    assert result['reconciled']
+
+
+def test_adjustments_are_not_spending(ledger, account):
+    ledger.set_budget('accounts', account, 100000)
+    ledger.reconcile(account, -20000)
+    assert ledger.data['transactions'][-1]['amount'] == -20000
+    assert ledger.get_budget_status() == [('accounts', account, 100000, 0)]
+
+
+def test_matching_statement_posts_nothing(ledger, account):
+    ledger.quick_add("-100 Sampath lunch")
+    assert ledger.reconcile(account, -10000) == 0
+    assert len(ledger.data['transactions']) == 1
+    assert status(ledger, account)['reconciled']
+
+    ledger.quick_add("-50 Sampath coffee")
+    assert not status(ledger, account)['reconciled']
+
+
+def test_undo_restores_balance_and_last_statement(ledger, account):
+    ledger.reconcile(account, 10000)
+    ledger.reconcile(account, 30000)
+    assert ledger.undo() == "Reconcile account"
+    result = status(ledger, account)
+    assert (result['balance'], result['derived'], result['statement']) == (10000, 10000, 10000)
+
+    ledger.undo()
+    assert status(ledger, account)['statement'] is None
+    assert ledger.data['transactions'] == []
+    assert not ledger.data.get('reconciliations')
+
+
+def test_archived_months_count_without_loading_them(archived_ledger, account):
+    assert status(archived_ledger, account)['derived'] == -100000
+    archived_ledger.reconcile(account, -100000)
+    assert status(archived_ledger, account)['reconciled']
+    archived_ledger.load_next_period()
+    assert status(archived_ledger, account)['derived'] == -100000
+    assert archived_ledger.partition_reads == ['2020-01']
@@ -0,0 +1,106 @@
+import copy
+import json
+
+import pytest
+
+from FT import DATA_SCHEMA_VERSION, Ledger, coerce_transactions
+
+
+LEGACY = {
+    'categories': {'Cash & Bank': {'Sampath': 10.5}, 'Crypto & Investments': {'Crypto $': 2.25}},
+    'transactions': [
+        {'date': 'October 01, 2026', 'account': 'Sampath', 'description': 'salary', 'amount': 12.5},
+        {'date': 'October 02, 2026', 'account': 'Crypto $', 'description': 'buy', 'amount': '-0.5'}
+    ],
+    'exchange_rate': 300
+}
+
+
+def load(path, data):
+    with open(path, 'w') as f:
+        json.dump(data, f)
+    ledger = Ledger(path)
+    ledger.events.close()
+    return ledger
+
+
+def test_legacy_file_is_migrated(ledger_path):
+    ledger = load(ledger_path, copy.deepcopy(LEGACY))
+    data = ledger.data
+    assert data['schema'] == DATA_SCHEMA_VERSION
+    assert [trans['id'] for trans in data['transactions']] == [1, 2]
+    sampath, crypto = (ledger.match_account([name])[0] for name in ('Sampath', 'Crypto'))
+    assert data['categories']['Cash & Bank'][sampath] == 1050
+    assert data['transactions'][0]['amount'] == 1250
+    assert data['transactions'][1]['account_id'] == crypto
+    assert data['transactions'][1]['amount'] == -50
+    assert data['transactions'][0]['rule_category'] == '-'
+    assert ledger.usd_to_lkr == 300.0
+
+
+@pytest.mark.parametrize('amount', [None, 'abc', [1], float('nan')])
+def test_bad_amount_is_set_aside(ledger_path, ledger, amount):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.quick_add("-200 Sampath dinner")
+    ledger.events.close()
+    with open(ledger_path) as f:
+        data = json.load(f)
+    data['transactions'][0]['amount'] = amount
+    reopened = load(ledger_path, copy.deepcopy(data))
+    assert [trans['description'] for trans in reopened.data['transactions']] == ['dinner']
+    assert json.dumps(reopened.data['rejected_transactions']) == json.dumps(data['transactions'][:1])
+    assert reopened.data['next_transaction_id'] == 3
+
+
+def test_missing_required_field_is_set_aside(ledger_path, ledger):
+    ledger.quick_add("-100 Sampath lunch")
+    ledger.events.close()
+    with open(ledger_path) as f:
+        data = json.load(f)
+    del data['transactions'][0]['account_id']
+    reopened = load(ledger_path, data)
+    assert reopened.data['transactions'] == []
+    assert reopened.data['rejected_transactions'][0]['description'] == 'lunch'
+
+
+@pytest.mark.parametrize('amount', [None, 'abc'])
+def test_bad_legacy_amount_is_set_aside(ledger_path, amount):
+    data = copy.deepcopy(LEGACY)
+    data['transactions'][0]['amount'] = amount
+    ledger = load(ledger_path, data)
+    assert [trans['description'] for trans in ledger.data['transactions']] == ['buy']
+    assert ledger.data['rejected_transactions'][0]['amount'] == amount
+
+
+def test_rows_that_are_not_objects_are_set_aside(ledger_path):
+    data = copy.deepcopy(LEGACY)
+    data['transactions'].append(None)
+    ledger = load(ledger_path, data)
+    assert len(ledger.data['transactions']) == 2
+    assert ledger.data['rejected_transactions'] == [None]
+
+
+def test_newer_schema_is_rejected(ledger_path):
+    with pytest.raises(ValueError, match='newer'):
+        load(ledger_path, {'schema': DATA_SCHEMA_VERSION + 1})
+
+
+def test_coerce_fills_defaults_and_converts():
+    rows = [{'id': '3', 'date': 'October 01, 2026', 'account_id': 'a1', 'amount': 5.0}]
+    coerce_transactions(rows)
+    assert rows == [{'id': 3, 'date': 'October 01, 2026', 'account_id': 'a1', 'amount': 5,
+                     'description': '', 'rule_category': '-'}]
+
+
+def test_coerce_rejects_fractional_minor_units():
+    with pytest.raises(ValueError, match="transaction 1: 'amount'"):
+        coerce_transactions([{'id': 1, 'date': 'x', 'account_id': 'a1', 'amount': 1.5}])
+
+
+def test_coerce_can_set_bad_rows_aside():
+    good = {'id': 1, 'date': 'x', 'account_id': 'a1', 'amount': 5}
+    fractional = {'id': 2, 'date': 'x', 'account_id': 'a1', 'amount': 1.5}
+    unnamed = {'id': 3, 'date': 'x', 'amount': 5}
+    rejected = []
+    assert coerce_transactions([good, fractional, 'row', unnamed], rejected) == [good]
+    assert rejected == [fractional, 'row', unnamed]
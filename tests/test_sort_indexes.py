@@ -0,0 +1,73 @@
+import pytest
+
+
+ORDERS = [('amount',), ('date', 'description'), ('account',), ('rule_category', 'amount')]
+
+
+def assert_indexes_current(ledger):
+    """Every maintained index equals one built from scratch"""
+    maintained = {columns: list(ledger.sort_index(columns)) for columns in ORDERS}
+    ledger.sort_indexes.clear()
+    for columns in ORDERS:
+        assert ledger.sort_index(columns) == maintained[columns], columns
+
+
+def by_amount(ledger):
+    return [trans['description'] for trans in ledger.sorted_transactions(['amount'], False, 0, 10)]
+
+
+@pytest.fixture
+def indexed(ledger):
+    """The ledger with a few transactions and every order in ORDERS built"""
+    ledger.quick_add("-1,000 Sampath lunch #essentials")
+    ledger.quick_add("+5,000 Com salary")
+    ledger.quick_add("-20 Crypto fees")
+    for columns in ORDERS:
+        ledger.sort_index(columns)
+    return ledger
+
+
+def test_inserts_and_deletes_keep_indexes_sorted(indexed, account):
+    indexed.quick_add("-250 Sampath dinner #rewards")
+    assert_indexes_current(indexed)
+    rows = [{'date': f'October {day:02d}, 2026', 'account_id': account, 'description': f'bulk {day}',
+             'amount': -day * 100} for day in list(range(1, 29)) * 2]
+    indexed.import_transactions(rows)
+    assert_indexes_current(indexed)
+    indexed.delete_transactions([indexed.data['transactions'][1]['id']])
+    assert_indexes_current(indexed)
+    indexed.delete_transactions([trans['id'] for trans in indexed.data['transactions'][-40:]])
+    assert_indexes_current(indexed)
+
+
+def test_updates_undo_and_redo_keep_indexes_sorted(indexed, account):
+    ids = [trans['id'] for trans in indexed.data['transactions']]
+    indexed.retag_transactions(ids[:2], 'Growth')
+    assert_indexes_current(indexed)
+    indexed.move_transactions(ids[:1], indexed.match_account(['Crypto'])[0])
+    assert_indexes_current(indexed)
+    for _ in range(2):
+        indexed.undo()
+        assert_indexes_current(indexed)
+    indexed.redo()
+    assert_indexes_current(indexed)
+
+
+def test_amounts_sort_in_lkr_at_the_current_rate(indexed):
+    # 20 USD is 5,800 LKR at 290 but 4,000 LKR at 200
+    assert by_amount(indexed) == ['fees', 'lunch', 'salary']
+    indexed.quick_add("+18 Crypto refund")
+    assert by_amount(indexed) == ['fees', 'lunch', 'salary', 'refund']
+    indexed.set_exchange_rate(200.0)
+    assert by_amount(indexed) == ['fees', 'lunch', 'refund', 'salary']
+    indexed.undo()
+    assert by_amount(indexed) == ['fees', 'lunch', 'salary', 'refund']
+    assert_indexes_current(indexed)
+
+
+def test_renaming_the_usd_account_re_sorts_amounts(indexed):
+    crypto = indexed.match_account(['Crypto'])[0]
+    indexed.rename_account(crypto, 'Wallet')
+    # Now an LKR account: -20 LKR is the smallest outflow
+    assert by_amount(indexed) == ['lunch', 'fees', 'salary']
+    assert_indexes_current(indexed)
@@ -0,0 +1,80 @@
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def state(ledger):
+    """Everything an undo has to put back.
+
+    Id counters only move forward, the name table keeps the ids of
+    removed accounts and a budget counter back at zero is as good as
+    none, so those are left out.
+    """
+    data = copy.deepcopy(ledger.data)
+    del data['next_transaction_id'], data['next_account_id']
+    for kind in ('rule_categories', 'accounts'):
+        counters = data['budget_counters'][kind]
+        data['budget_counters'][kind] = {key: spent for key, spent in counters.items() if spent}
+    live = {aid for group in data['categories'].values() for aid in group}
+    data['accounts'] = {aid: entry for aid, entry in data['accounts'].items() if aid in live}
+    return data
+
+
+def first_id(ledger):
+    return ledger.data['transactions'][0]['id']
+
+
+def in_days(days):
+    return (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+COMMANDS = {
+    'set_balance': lambda ledger, aid: ledger.edit_balance(aid, 5000),
+    'insert_transactions': lambda ledger, aid: ledger.quick_add("-250 Sampath dinner #rewards"),
+    'remove_transactions': lambda ledger, aid: ledger.delete_transactions([first_id(ledger)]),
+    'update_transactions': lambda ledger, aid: ledger.retag_transactions([first_id(ledger)], 'Growth'),
+    'add_account': lambda ledger, aid: ledger.add_account('Cash & Bank', 'Wallet'),
+    'remove_account': lambda ledger, aid: ledger.delete_account(aid),
+    'rename_account': lambda ledger, aid: ledger.rename_account(aid, 'Purse'),
+    'set_budget': lambda ledger, aid: ledger.set_budget('rule_categories', 'Essentials', 10000),
+    'set_setting': lambda ledger, aid: ledger.set_exchange_rate(300.0),
+    'set_entry': lambda ledger, aid: ledger.add_goal("Holiday", 100000, in_days(90), accounts=[aid]),
+}
+
+
+@pytest.mark.parametrize('kind', COMMANDS)
+def test_each_op_kind_applies_undoes_and_redoes(ledger, account, kind):
+    ledger.quick_add("-100 Sampath lunch #essentials")
+    ledger.set_budget('accounts', account, 50000)
+    before = state(ledger)
+    COMMANDS[kind](ledger, account)
+    after = state(ledger)
+    assert after != before
+
+    ledger.undo()
+    assert state(ledger) == before
+    # The redo log holds the command's own ops again
+    assert kind in [op[0] for op in ledger.redo_log[-1][1]]
+    ledger.redo()
+    assert state(ledger) == after
+
+
+def test_per_entry_settings_keep_only_the_entry_for_undo(ledger, account):
+    ledger.add_goal("Holiday", 100000, in_days(90), accounts=[account])
+    gid = ledger.add_goal("Invest", 50000, in_days(30), rule_category='Growth')
+    ledger.update_goal(gid, target=60000)
+    assert ledger.undo_log[-1][1] == [('set_entry', 'goals', gid, {**ledger.data['goals'][gid], 'target': 50000})]
+
+    ledger.reconcile(account, 0)
+    assert ('set_entry', 'reconciliations', account, None) in ledger.undo_log[-1][1]
+    ledger.buy(account, 'BTC', 2, 1000, '2026-01-02')
+    assert ledger.undo_log[-1][1] == [('set_entry', 'holdings', account, None)]
+
+
+def test_removing_the_last_entry_removes_the_setting(ledger, account):
+    gid = ledger.add_goal("Holiday", 100000, in_days(90), accounts=[account])
+    ledger.delete_goal(gid)
+    assert 'goals' not in ledger.data
+    ledger.undo()
+    assert list(ledger.data['goals']) == [gid]